@@ -0,0 +1,271 @@
+# ambiente.py
+# Amostragem das condições ambientais (BME280) em segundo plano
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# A leitura do BME280 era feita uma vez por repetição, na thread da medição,
+# após o cálculo da diferença ac-dc: o registro guardava uma única amostra,
+# e não as condições durante o ciclo (cerca de 5 x wait_time).
+#
+# O Amostrador lê a fonte das condições ambientais numa thread própria, a
+# cada 'intervalo' segundos, e guarda as amostras num buffer circular de
+# tamanho fixo (capacidade). resumo(inicio, fim) retorna a média, o mínimo e
+# o máximo da temperatura, umidade e pressão no intervalo de tempo do ciclo,
+# sem acessar o barramento I2C na thread da medição.
+#
+# Fontes:
+# FonteBME280 - sensor BME280 (smbus2 / bme280)
+# FonteSimulada - condições simuladas (sem o sensor)
+# FonteReproduzida - condições de um registro anterior (registro_*.csv)
+# FonteIndisponivel - sensor indisponível (todas as leituras falham)
+#
+# Se o smbus2 não estiver disponível (ou o sensor não responder), a fonte
+# simulada só é usada com os instrumentos simulados ([Simulacao] habilitar =
+# true); numa medição real as condições ficam indisponíveis (nan no
+# registro), em vez de valores simulados que pareçam medidos. A fonte em uso
+# (descricao) e a quantidade de leituras com erro (falhas) são escritas no
+# registro. Os instantes das amostras são os do relógio em uso
+# (relogio.tempo()); a thread aguarda o intervalo em tempo real, pois com o
+# relógio virtual dormir() avançaria o tempo da medição.
+#-------------------------------------------------------------------------------
+import csv
+import math
+import threading
+import numpy
+import relogio
+# o smbus2 e o bme280 só são necessários com o sensor
+try:
+    import smbus2
+    import bme280
+except ImportError:
+    smbus2 = None
+    bme280 = None
+#-------------------------------------------------------------------------------
+
+class Condicoes(object):
+    """ Condições ambientais (mesmos atributos da amostra do bme280)
+    Atributos:
+    temperature: temperatura, em ºC
+    humidity: umidade relativa, em % u.r.
+    pressure: pressão atmosférica, em hPa
+    """
+
+    def __init__(self, temperature, humidity, pressure):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.pressure = pressure
+
+#-------------------------------------------------------------------------------
+
+class Resumo(Condicoes):
+    """ Condições ambientais de um ciclo de medição
+    Atributos:
+    temperature, humidity, pressure: médias no ciclo
+    minimo, maximo: objetos Condicoes com os mínimos e máximos no ciclo
+    amostras: quantidade de amostras no ciclo
+    """
+
+    def __init__(self, valores):
+        # valores - array (amostras x 3): temperatura, umidade, pressão
+        media = numpy.mean(valores, axis=0)
+        Condicoes.__init__(self, *media)
+        self.minimo = Condicoes(*numpy.min(valores, axis=0))
+        self.maximo = Condicoes(*numpy.max(valores, axis=0))
+        self.amostras = len(valores)
+
+#-------------------------------------------------------------------------------
+
+class FonteBME280(object):
+    """ Sensor BME280 no barramento I2C
+    """
+    # a leitura acessa o barramento I2C
+    bloqueante = True
+
+    def __init__(self, porta=1, endereco=0x76):
+        if smbus2 is None:
+            raise ImportError('smbus2 / bme280 não disponível')
+        self.endereco = endereco
+        self.descricao = 'BME280 (porta {:d}, endereço 0x{:02x})'.format(porta, endereco)
+        self.bus = smbus2.SMBus(porta)
+        self.calibration_params = bme280.load_calibration_params(self.bus, self.endereco)
+
+    def ler(self):
+        amostra = bme280.sample(self.bus, self.endereco, self.calibration_params)
+        return (amostra.temperature, amostra.humidity, amostra.pressure)
+
+#-------------------------------------------------------------------------------
+
+class FonteSimulada(object):
+    """ Condições ambientais simuladas: valores nominais com uma oscilação
+    lenta (período em segundos) e ruído
+    """
+    bloqueante = False
+
+    def __init__(self, temperatura=23.0, umidade=45.0, pressao=1013.0,
+                 periodo=3600, semente=None):
+        self.nominal = numpy.array([temperatura, umidade, pressao])
+        self.amplitude = numpy.array([0.05, 0.5, 0.2])
+        self.ruido = numpy.array([0.01, 0.1, 0.05])
+        self.periodo = periodo
+        self.gerador = numpy.random.default_rng(semente)
+        self.descricao = 'simulada'
+
+    def ler(self):
+        fase = math.sin(2 * math.pi * relogio.tempo() / self.periodo)
+        valores = self.nominal + self.amplitude * fase + self.ruido * self.gerador.standard_normal(3)
+        return tuple(float(v) for v in valores)
+
+#-------------------------------------------------------------------------------
+
+class FonteReproduzida(object):
+    """ Reprodução das condições ambientais de um registro de medição
+    (colunas 'Temperatura [ºC]', 'Umidade Relativa [% u.r.]' e 'Pressão
+    Atmosférica [hPa]'); as linhas são reproduzidas em sequência, de forma
+    circular
+    """
+    bloqueante = False
+    colunas = ['Temperatura [ºC]', 'Umidade Relativa [% u.r.]', 'Pressão Atmosférica [hPa]']
+
+    def __init__(self, arquivo):
+        self.descricao = 'reproduzida de '+arquivo
+        self.valores = []
+        with open(arquivo, newline='', encoding='utf-8', errors='replace') as csvfile:
+            indices = None
+            for linha in csv.reader(csvfile, delimiter=';'):
+                if all(c in linha for c in self.colunas):
+                    indices = [linha.index(c) for c in self.colunas]
+                    continue
+                if indices is None:
+                    continue
+                try:
+                    self.valores.append(tuple(float(linha[i].replace(',','.')) for i in indices))
+                except (IndexError, ValueError):
+                    indices = None
+        if not self.valores:
+            raise ValueError('nenhuma condição ambiental em '+arquivo)
+        self.indice = 0
+
+    def ler(self):
+        valores = self.valores[self.indice]
+        self.indice = (self.indice + 1) % len(self.valores)
+        return valores
+
+#-------------------------------------------------------------------------------
+
+class FonteIndisponivel(object):
+    """ Sensor indisponível: as leituras falham e as condições do ciclo
+    ficam indefinidas (nan)
+    """
+    bloqueante = False
+
+    def __init__(self, motivo):
+        self.descricao = 'indisponível ('+motivo+')'
+
+    def ler(self):
+        raise IOError('condições ambientais '+self.descricao)
+
+#-------------------------------------------------------------------------------
+
+class Amostrador(object):
+    """ Amostragem em segundo plano com buffer circular
+    Atributos:
+    fonte: fonte das condições ambientais (método ler())
+    intervalo: intervalo entre as amostras, em segundos
+    capacidade: tamanho do buffer circular (amostras)
+    buffer: array (capacidade x 4): instante, temperatura, umidade, pressão
+    falhas: quantidade de leituras da fonte com erro
+    """
+
+    def __init__(self, fonte, intervalo=1.0, capacidade=3600):
+        self.fonte = fonte
+        self.intervalo = intervalo
+        self.capacidade = max(int(capacidade), 1)
+        self.buffer = numpy.zeros((self.capacidade, 4))
+        self.indice = 0
+        self.quantidade = 0
+        self.falhas = 0
+        self.trava = threading.Lock()
+        self.parada = threading.Event()
+        self.thread = None
+
+    def amostrar(self):
+        # lê a fonte e guarda a amostra no buffer circular
+        try:
+            valores = self.fonte.ler()
+        except Exception:
+            self.falhas += 1
+            return
+        with self.trava:
+            self.buffer[self.indice] = (relogio.tempo(),) + tuple(valores)
+            self.indice = (self.indice + 1) % self.capacidade
+            self.quantidade = min(self.quantidade + 1, self.capacidade)
+        return
+
+    def executar(self):
+        while not self.parada.is_set():
+            self.amostrar()
+            self.parada.wait(self.intervalo)
+        return
+
+    def iniciar(self):
+        if self.thread is None:
+            self.parada.clear()
+            self.thread = threading.Thread(target=self.executar, daemon=True)
+            self.thread.start()
+        return
+
+    def parar(self):
+        if self.thread is not None:
+            self.parada.set()
+            self.thread.join()
+            self.thread = None
+        return
+
+    def amostras(self):
+        # cópia das amostras guardadas, em ordem cronológica
+        with self.trava:
+            if self.quantidade < self.capacidade:
+                return self.buffer[:self.quantidade].copy()
+            return numpy.roll(self.buffer, -self.indice, axis=0)
+
+    def resumo(self, inicio, fim):
+        # média, mínimo e máximo das amostras entre os instantes inicio e fim
+        # sem amostras no intervalo (p. ex. com o relógio virtual), lê a fonte
+        # se a leitura não for bloqueante; senão, usa a amostra mais recente
+        amostras = self.amostras()
+        if (len(amostras) == 0) or not (self.fonte.bloqueante or numpy.any(amostras[:,0] >= inicio)):
+            self.amostrar()
+            amostras = self.amostras()
+            if len(amostras) == 0:
+                return Resumo(numpy.full((1, 3), numpy.nan))
+        dentro = (amostras[:,0] >= inicio) & (amostras[:,0] <= fim)
+        if not numpy.any(dentro):
+            return Resumo(amostras[-1:, 1:])
+        return Resumo(amostras[dentro, 1:])
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função ambiente_config(config)
+# cria o Amostrador a partir da seção [Ambiente] do arquivo de configuração
+# fonte = bme280, simulada ou arquivo (registro_*.csv indicado em 'arquivo')
+# com o BME280 indisponível, usa a fonte simulada somente com os instrumentos
+# simulados ([Simulacao] habilitar = true)
+def ambiente_config(config):
+    tipo = config.get('Ambiente', 'fonte', fallback='bme280').strip().lower()
+    if tipo == 'arquivo':
+        fonte = FonteReproduzida(config.get('Ambiente', 'arquivo').strip())
+    elif tipo == 'simulada':
+        fonte = FonteSimulada()
+    else:
+        try:
+            fonte = FonteBME280(config.getint('Ambiente', 'porta', fallback=1),
+                                int(config.get('Ambiente', 'endereco', fallback='0x76'), 0))
+        except Exception as erro:
+            if config.getboolean('Simulacao', 'habilitar', fallback=False):
+                print("BME280 indisponível ("+str(erro)+"). Usando condições ambientais simuladas.")
+                fonte = FonteSimulada()
+            else:
+                print("BME280 indisponível ("+str(erro)+"). As condições ambientais não serão registradas.")
+                fonte = FonteIndisponivel(str(erro))
+    return Amostrador(fonte, config.getfloat('Ambiente', 'intervalo', fallback=1.0),
+                      config.getint('Ambiente', 'capacidade', fallback=3600))
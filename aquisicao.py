@@ -0,0 +1,148 @@
+# aquisicao.py
+# Aquisição pareada das leituras do padrão (std) e do objeto (dut)
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# As leituras do padrão e do objeto eram feitas em sequência (query no
+# medidor do padrão e, depois, query no medidor do objeto), de modo que as
+# duas leituras não correspondiam ao mesmo instante e o tempo de leitura de
+# cada ciclo era a soma dos tempos de conversão dos dois medidores.
+#
+# A aquisição pareada separa a query em duas fases:
+# 1. disparo: o comando de leitura é enviado aos dois medidores, um logo após
+#    o outro, de forma que as duas conversões ocorrem simultaneamente;
+# 2. busca: as respostas são lidas em paralelo (thread pool). Quando os
+#    medidores estão em barramentos diferentes as leituras se sobrepõem; no
+#    mesmo barramento o driver VISA serializa o acesso.
+#
+# Aquisição em rajada (burst)
+# Em vez de uma leitura single-shot por etapa, o buffer interno do medidor é
+# preenchido com N leituras, transferidas em uma única transação:
+# 2182A - buffer TRACe (:TRAC:POIN N, :TRAC:DATA?)
+# 3458A - memória de leituras (MEM FIFO, NRDGS N, RMEM)
+# 53132A - estatística sobre N gates (:CALC3:AVER:ALL? -> média e desvio)
+# 182A - sem buffer acessível: N leituras single-shot em sequência
+# Cada etapa passa a fornecer a média, o desvio padrão e o número de leituras.
+#
+# Formato binário (opcional)
+# Na rajada, o bloco de leituras do 3458A (OFORMAT DREAL/SREAL) e do 2182A
+# (:FORM:DATA REAL,32) pode ser transferido em binário e decodificado
+# diretamente em um array numpy (numpy.frombuffer), sem strings
+# intermediárias. O 2182A só transfere em precisão simples (REAL,32).
+#
+# Os comandos de leitura, de rajada e de transferência de cada modelo são
+# implementados nos drivers dos medidores (medidores.py).
+#-------------------------------------------------------------------------------
+import numpy
+import relogio
+from concurrent.futures import ThreadPoolExecutor
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função incerteza_ciclo(x, ux, n_X, y, uy, n_Y, i_ac, i_dc)
+# propaga as incertezas padrão das leituras de cada etapa (ux, uy) para a
+# diferença ac-dc do ciclo, em ppm
+# i_ac, i_dc - índices das etapas AC e de referência do ciclo (padrão: AC,
+# +DC, AC, -DC e AC)
+def incerteza_ciclo(x, ux, n_X, y, uy, n_Y, i_ac=(0, 2, 4), i_dc=(1, 3)):
+    x = numpy.asarray(x); ux = numpy.asarray(ux);
+    y = numpy.asarray(y); uy = numpy.asarray(uy);
+    i_ac = list(i_ac); i_dc = list(i_dc);
+    # incertezas das médias AC e DC
+    u_Xac = numpy.sqrt(numpy.sum(ux[i_ac]**2)) / len(i_ac);
+    u_Xdc = numpy.sqrt(numpy.sum(ux[i_dc]**2)) / len(i_dc);
+    u_Yac = numpy.sqrt(numpy.sum(uy[i_ac]**2)) / len(i_ac);
+    u_Ydc = numpy.sqrt(numpy.sum(uy[i_dc]**2)) / len(i_dc);
+    Xac = numpy.mean(x[i_ac]);
+    Xdc = numpy.mean(x[i_dc]);
+    Yac = numpy.mean(y[i_ac]);
+    Ydc = numpy.mean(y[i_dc]);
+    # incertezas de X = Xac/Xdc - 1 e Y = Yac/Ydc - 1
+    u_X = numpy.sqrt((u_Xac/Xdc)**2 + (Xac*u_Xdc/Xdc**2)**2);
+    u_Y = numpy.sqrt((u_Yac/Ydc)**2 + (Yac*u_Ydc/Ydc**2)**2);
+    return 1e6 * numpy.sqrt((u_X/n_X)**2 + (u_Y/n_Y)**2)
+#-------------------------------------------------------------------------------
+
+class AquisicaoPareada(object):
+    """ Classe para a aquisição pareada dos medidores do padrão e do objeto
+    Atributos:
+    concorrente: se True, as respostas são buscadas em paralelo (thread pool);
+    se False, são buscadas em sequência após o disparo dos dois medidores
+    amostras: número de leituras por etapa na aquisição em rajada
+    formato: formato de transferência da rajada ('ascii', 'sreal' ou 'dreal')
+    """
+
+    def __init__(self, concorrente=True, amostras=1, formato='ascii'):
+        self.concorrente = concorrente
+        self.amostras = amostras
+        self.formato = formato
+        if concorrente:
+            self.executor = ThreadPoolExecutor(max_workers=2)
+        else:
+            self.executor = None
+
+    def ler(self, std, dut):
+        # dispara os dois medidores e busca as respostas
+        # std, dut - drivers dos medidores (medidores.py)
+        # retorna as leituras e os instantes de disparo (relogio.instante())
+        t_std = relogio.instante()
+        std.disparar()
+        t_dut = relogio.instante()
+        dut.disparar()
+        if self.concorrente:
+            busca_std = self.executor.submit(std.buscar)
+            busca_dut = self.executor.submit(dut.buscar)
+            x = busca_std.result()
+            y = busca_dut.result()
+        else:
+            x = std.buscar()
+            y = dut.buscar()
+        return {'std':x, 'dut':y, 't_std':t_std, 't_dut':t_dut}
+
+    def ler_burst(self, std, dut):
+        # aquisição em rajada pareada: os buffers dos dois medidores são
+        # preenchidos simultaneamente e transferidos em seguida
+        # retorna as estatísticas de cada medidor e os instantes de disparo
+        n = self.amostras
+        t_std = relogio.instante()
+        std.disparar_burst(n)
+        t_dut = relogio.instante()
+        dut.disparar_burst(n)
+        if self.concorrente:
+            busca_std = self.executor.submit(std.buscar_burst, n, self.formato)
+            busca_dut = self.executor.submit(dut.buscar_burst, n, self.formato)
+            x = busca_std.result()
+            y = busca_dut.result()
+        else:
+            x = std.buscar_burst(n, self.formato)
+            y = dut.buscar_burst(n, self.formato)
+        return {'std':x, 'dut':y, 't_std':t_std, 't_dut':t_dut}
+
+    def ler_etapa(self, std, dut):
+        # leitura de uma etapa do ciclo de medição: em rajada quando
+        # amostras > 1, single-shot caso contrário
+        # as leituras são retornadas em texto (no caso da rajada, a média),
+        # acompanhadas da incerteza padrão da média (std_u, dut_u)
+        if self.amostras > 1:
+            par = self.ler_burst(std, dut)
+            x = par['std']
+            y = par['dut']
+            return {'std':repr(float(x['media'])), 'dut':repr(float(y['media'])),
+                    'std_u':x['desvio']/numpy.sqrt(x['n']), 'dut_u':y['desvio']/numpy.sqrt(y['n']),
+                    't_std':par['t_std'], 't_dut':par['t_dut']}
+        par = self.ler(std, dut)
+        par['std_u'] = float('nan')
+        par['dut_u'] = float('nan')
+        return par
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função aquisicao_config(config)
+# cria o objeto AquisicaoPareada a partir da seção [Aquisicao] do arquivo de
+# configuração
+def aquisicao_config(config):
+    if not config.has_section('Aquisicao'):
+        return AquisicaoPareada()
+    return AquisicaoPareada(config['Aquisicao'].getboolean('concorrente', True),
+                            config['Aquisicao'].getint('amostras', 1),
+                            config['Aquisicao'].get('formato', 'ascii').strip().lower())
@@ -0,0 +1,119 @@
+# balanco.py
+# Controle do balanço DC entre os ciclos de medição
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Após cada ciclo (AC, +DC, AC, -DC, AC) a tensão DC do ciclo seguinte é
+# ajustada para igualar a saída DC do objeto (Ydc) à saída AC (Yac). O ajuste
+# original é uma correção proporcional, sem memória:
+#
+#     Vdc' = Vdc . (1 + (Yac - Ydc) / (nY . Ydc))
+#
+# O controle do balanço usa o histórico dos ciclos da frequência:
+#
+# - o n efetivo do objeto é estimado por mínimos quadrados recursivos (RLS,
+#   com fator de esquecimento) a partir dos pares (Vdc, Ydc) de ciclos
+#   consecutivos: ln(Ydc2/Ydc1) = n . ln(Vdc2/Vdc1). O valor inicial é o nY
+#   medido; 'ruido' é o ruído relativo esperado de ln(Ydc), que pondera o
+#   ganho do RLS (passos pequenos de Vdc pouco alteram a estimativa);
+# - a tensão DC é calculada pela lei de potência, com um termo integral que
+#   acompanha a deriva da saída AC ao longo das repetições:
+#
+#     e = ln(Yac / Ydc)
+#     Vdc' = Vdc . exp((e + ki . soma(e)) / n_efetivo)
+#
+#   (a soma não inclui o primeiro ciclo da frequência, cujo erro é o desvio
+#   do equilíbrio, corrigido pelo termo proporcional)
+#
+# Os ciclos e os ciclos descartados (critério Delta) são contados para o
+# cálculo da taxa de descarte de cada frequência.
+#-------------------------------------------------------------------------------
+import math
+#-------------------------------------------------------------------------------
+
+class ControleDC(object):
+    """ Controle do balanço DC
+    Atributos:
+    habilitado: se False, é usada a correção proporcional original
+    ki: ganho integral
+    esquecimento: fator de esquecimento do RLS (0 < esquecimento <= 1)
+    ruido: ruído relativo de ln(Ydc) (ponderação do RLS), em ppm
+    n0: n do objeto medido (valor inicial da estimativa)
+    n: n efetivo estimado
+    p: variância da estimativa de n
+    integral: soma dos erros ln(Yac/Ydc)
+    ciclos, descartados: quantidade de ciclos e de ciclos descartados
+    """
+
+    def __init__(self, habilitado=False, ki=0.3, esquecimento=0.9, ruido=1):
+        self.habilitado = habilitado
+        self.ki = ki
+        self.esquecimento = esquecimento
+        self.ruido = ruido
+        self.iniciar(2.0)
+
+    def iniciar(self, n):
+        # reinicia o controle (nova frequência), com o nY medido
+        self.n0 = n
+        self.n = n
+        self.p = (0.1 * n)**2
+        self.integral = 0.0
+        self.anterior = None
+        self.ciclos = 0
+        self.descartados = 0
+        return
+
+    def estimar_n(self, vdc, ydc):
+        # atualização RLS do n efetivo com o par (Vdc, Ydc) do ciclo
+        if self.anterior is not None:
+            x = math.log(vdc / self.anterior[0])
+            y = math.log(ydc / self.anterior[1])
+            r = self.esquecimento * (1e-6 * self.ruido)**2
+            ganho = self.p * x / (r + x * self.p * x)
+            self.n += ganho * (y - self.n * x)
+            self.p = (self.p - ganho * x * self.p) / self.esquecimento
+            # mantém a estimativa numa faixa plausível em torno do n medido
+            self.n = min(max(self.n, 0.5 * self.n0), 2 * self.n0)
+        self.anterior = (vdc, ydc)
+        return self.n
+
+    def atualizar(self, vdc, yac, ydc):
+        # retorna a tensão DC do próximo ciclo
+        self.ciclos += 1
+        if not self.habilitado:
+            return vdc * (1 + (yac - ydc)/(self.n0 * ydc))
+        primeiro = self.anterior is None
+        self.estimar_n(vdc, ydc)
+        e = math.log(yac / ydc)
+        # o erro do primeiro ciclo reflete o equilíbrio (desvio constante,
+        # corrigido pelo termo proporcional), e não a deriva
+        if not primeiro:
+            self.integral += e
+        return vdc * math.exp((e + self.ki * self.integral) / self.n)
+
+    def descartar(self):
+        # contabiliza um ciclo descartado pelo critério Delta
+        self.descartados += 1
+        return
+
+    def taxa_descarte(self):
+        # porcentagem de ciclos descartados na frequência
+        if self.ciclos == 0:
+            return 0.0
+        return 100.0 * self.descartados / self.ciclos
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função balanco_config(config)
+# cria o objeto ControleDC a partir da seção [Balanco] do arquivo de
+# configuração. Sem a seção (ou com habilitar = false), é usada a correção
+# proporcional original.
+def balanco_config(config):
+    padrao = ControleDC()
+    if not config.has_section('Balanco'):
+        return padrao
+    secao = config['Balanco']
+    return ControleDC(secao.getboolean('habilitar', padrao.habilitado),
+                      secao.getfloat('ki', padrao.ki),
+                      secao.getfloat('esquecimento', padrao.esquecimento),
+                      secao.getfloat('ruido', padrao.ruido))
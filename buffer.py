@@ -6,8 +6,8 @@
 import visa
 import numpy as np
 import datetime
-import time
 import csv
+import relogio
 
 # configuracoes
 rm = visa.ResourceManager()
@@ -21,13 +21,10 @@ registro_filename = 'output.csv';
 #-------------------------------------------------------------------------------
 # função espera(segundos)
 # aceita como parâmetro o tempo de espera, em segundos
-# hack para poder interromper o programa a qualquer momento
-# no Windows XP, a função time.sleep não pode ser interrompida por uma
-# interrupção de teclado. A função quebra a chamada dessa função em várias
-# chamadas de 0,1 segundo.
+# espera com prazo no relógio monotônico (relogio.esperar): o tempo é exato
+# e a espera pode ser interrompida a qualquer momento pelo teclado (Ctrl-C)
 def espera(segundos):
-    for i in range(int(segundos * 10)):
-        time.sleep(0.1)    
+    relogio.esperar(segundos)
     return
 #-------------------------------------------------------------------------------
 # função instrument_init()
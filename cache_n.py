@@ -0,0 +1,127 @@
+# cache_n.py
+# Cache do coeficiente de linearidade n ao longo da varredura em frequência
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# A medição do n (n_measure / medir_n) alterna apenas a fonte DC entre a
+# tensão nominal e +-1 %, com a chave sempre em DC: o resultado não depende
+# da frequência AC. O n medido na primeira frequência é guardado, indexado
+# pela tensão e pelo par de conversores, e reutilizado nas frequências
+# seguintes enquanto estiver válido:
+#
+# validade - idade máxima do n, em minutos
+# deriva_max - variação máxima, em ppm, da leitura DC do objeto no
+#              equilíbrio (tensão DC nominal) em relação à leitura no
+#              equilíbrio da frequência em que o n foi medido
+#
+# Quando o n guardado expira ou a deriva ultrapassa o limite, o n é medido
+# novamente. O registro indica a origem do n (medido ou cache) e o horário
+# da medição.
+#
+# Com o banco de dados dos resultados (resultados.py), o n medido também é
+# gravado no banco; se não houver o n na memória (p. ex. após reiniciar o
+# programa), é usado o n do banco que ainda estiver dentro da validade.
+# A idade do n é contada pelo horário (relogio.instante(), segundos desde a
+# época), e não pelo tempo monotônico, que não é comparável entre processos.
+#-------------------------------------------------------------------------------
+import relogio
+#-------------------------------------------------------------------------------
+
+class CacheN(object):
+    """ Cache do n, indexado pela tensão e pelo par de conversores
+    Atributos:
+    habilitado: se False, o n é medido em todas as frequências
+    validade: idade máxima do n, em minutos
+    deriva_max: deriva máxima de Y0 admitida, em ppm
+    entradas: dicionário (tensão, par) -> {'dados', 'tempo', 'horario', 'referencia'}
+    banco: banco de dados dos resultados (resultados.Resultados), ou None
+    descartadas: dicionário (tensão, par) -> instante da medição do último n
+    descartado por deriva (não é recuperado do banco)
+    """
+
+    def __init__(self, habilitado=False, validade=120, deriva_max=500, banco=None):
+        self.habilitado = habilitado
+        self.validade = validade
+        self.deriva_max = deriva_max
+        self.entradas = {}
+        self.banco = banco
+        self.descartadas = {}
+
+    def obter(self, tensao, par):
+        # retorna a entrada válida do cache, ou None
+        if not self.habilitado:
+            return None
+        entrada = self.entradas.get((tensao, par))
+        if (entrada is None) and (self.banco is not None):
+            entrada = self.restaurar(tensao, par)
+        if entrada is None:
+            return None
+        if (relogio.instante() - entrada['tempo']) > 60*self.validade:
+            del self.entradas[(tensao, par)]
+            return None
+        return entrada
+
+    def restaurar(self, tensao, par):
+        # n do banco de dados, dentro da validade
+        agora = relogio.instante()
+        tempo_min = max(agora - 60*self.validade, self.descartadas.get((tensao, par), -1) + 1e-3)
+        salvo = self.banco.ultimo_n(tensao, par, tempo_min, agora)
+        if salvo is None:
+            return None
+        tempo, dados = salvo
+        horario = dados.pop('horario')
+        entrada = {'dados':dados, 'tempo':tempo, 'horario':horario, 'referencia':None}
+        self.entradas[(tensao, par)] = entrada
+        return entrada
+
+    def guardar(self, tensao, par, dados):
+        # dados - resultados da medição do n
+        entrada = {'dados':dados, 'tempo':relogio.instante(), 'horario':relogio.agora(),
+                   'referencia':None}
+        self.entradas[(tensao, par)] = entrada
+        if self.banco is not None:
+            self.banco.guardar_n(tensao, par, entrada['tempo'], dict(dados, horario=entrada['horario']))
+        return entrada
+
+    def deriva(self, tensao, par, y_dc):
+        # deriva da leitura DC do objeto em relação à referência, em ppm
+        entrada = self.entradas.get((tensao, par))
+        if (entrada is None) or (entrada['referencia'] is None):
+            return float('nan')
+        return 1e6 * abs(y_dc / entrada['referencia'] - 1)
+
+    def verificar(self, tensao, par, y_dc):
+        # y_dc - leitura DC do objeto no equilíbrio
+        # a primeira leitura após a medição do n é guardada como referência;
+        # nas seguintes, se a deriva ultrapassar o limite, a entrada é
+        # descartada e retorna False
+        if not self.habilitado:
+            return True
+        entrada = self.entradas.get((tensao, par))
+        if entrada is None:
+            return True
+        if entrada['referencia'] is None:
+            entrada['referencia'] = y_dc
+            return True
+        if self.deriva(tensao, par, y_dc) > self.deriva_max:
+            self.descartadas[(tensao, par)] = entrada['tempo']
+            self.entradas.pop((tensao, par), None)
+            return False
+        return True
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função cache_n_config(config, banco)
+# cria o objeto CacheN a partir da seção [CacheN] do arquivo de configuração.
+# Sem a seção (ou com habilitar = false), o n é medido em todas as
+# frequências, como na versão original.
+# banco - banco de dados dos resultados (persistência do n), opcional
+def cache_n_config(config, banco=None):
+    padrao = CacheN(banco=banco)
+    if not config.has_section('CacheN'):
+        return padrao
+    secao = config['CacheN']
+    return CacheN(secao.getboolean('habilitar', padrao.habilitado),
+                  secao.getfloat('validade', padrao.validade),
+                  secao.getfloat('deriva_max', padrao.deriva_max),
+                  banco)
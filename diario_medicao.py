@@ -0,0 +1,168 @@
+# diario_medicao.py
+# Diário da medição (append-only) e retomada de uma varredura interrompida
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Se a medição é interrompida (exceção, queda de energia), o registro CSV
+# fica incompleto e a varredura precisa ser refeita desde o aquecimento.
+#
+# O diário é um arquivo texto com um registro JSON por linha, somente
+# acrescentado (cada linha é gravada em disco com flush + fsync):
+#
+# plano - tensão, frequências, repetições e nome do registro CSV
+# frequencia - resultados do n e da tensão AC de equilíbrio
+# ciclo - leituras do ciclo, diferença ac-dc, Delta, tensão DC aplicada,
+#         ajuste DC para o ciclo seguinte e condições ambientais
+# media - final de uma frequência (média e desvio padrão)
+# retomada - início de uma retomada
+# fim - varredura concluída
+#
+# carregar(nome) reconstrói o estado da varredura a partir do diário: as
+# frequências concluídas (com os seus ciclos) e, para a frequência
+# interrompida, o n, a tensão AC de equilíbrio e os ciclos já medidos. Linhas incompletas (interrupção
+# durante a gravação) são ignoradas.
+#-------------------------------------------------------------------------------
+import datetime
+import json
+import os
+import numpy
+import ambiente
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função serializar(valor)
+# conversão dos valores que o json não suporta (arrays e escalares do numpy,
+# data / hora)
+def serializar(valor):
+    if isinstance(valor, numpy.ndarray):
+        return valor.tolist()
+    if isinstance(valor, numpy.generic):
+        return valor.item()
+    if isinstance(valor, datetime.datetime):
+        return valor.isoformat()
+    raise TypeError(repr(valor)+' não é serializável')
+#-------------------------------------------------------------------------------
+# função ler_n(dados)
+# resultados do n (dicionário de n_measure / obter_n) gravados no diário
+def ler_n(dados):
+    n = dict(dados)
+    for chave in ['Xi', 'Yi', 'nX', 'nY']:
+        n[chave] = numpy.array(n[chave])
+    n['horario'] = datetime.datetime.fromisoformat(n['horario'])
+    return n
+#-------------------------------------------------------------------------------
+# função condicoes_diario(ca_data) / condicoes(dados)
+# condições ambientais do ciclo (média, mínimo e máximo) no diário e de volta
+def condicoes_diario(ca_data):
+    return [[c.temperature, c.humidity, c.pressure] for c in [ca_data, ca_data.minimo, ca_data.maximo]]
+
+def condicoes(dados):
+    ca_data = ambiente.Condicoes(*dados[0])
+    ca_data.minimo = ambiente.Condicoes(*dados[1])
+    ca_data.maximo = ambiente.Condicoes(*dados[2])
+    return ca_data
+#-------------------------------------------------------------------------------
+
+class Diario(object):
+    """ Diário da medição (um registro JSON por linha)
+    Atributos:
+    nome: nome do arquivo
+    habilitado: se False, nada é gravado
+    """
+
+    def __init__(self, nome, habilitado=True):
+        self.nome = nome
+        self.habilitado = habilitado
+        self.arquivo = None
+        if habilitado:
+            # diário retomado: completa a linha interrompida, se houver
+            incompleta = False
+            if os.path.exists(nome) and (os.path.getsize(nome) > 0):
+                with open(nome, "rb") as arquivo:
+                    arquivo.seek(-1, os.SEEK_END)
+                    incompleta = arquivo.read(1) != b'\n'
+            self.arquivo = open(nome, "a", encoding='utf-8')
+            if incompleta:
+                self.arquivo.write('\n')
+
+    def escrever(self, tipo, **dados):
+        # acrescenta um registro ao diário e grava em disco
+        if not self.habilitado:
+            return
+        dados['tipo'] = tipo
+        self.arquivo.write(json.dumps(dados, default=serializar, ensure_ascii=False) + '\n')
+        self.arquivo.flush()
+        os.fsync(self.arquivo.fileno())
+        return
+
+    def fechar(self):
+        if self.habilitado and not self.arquivo.closed:
+            self.arquivo.close()
+        return
+#-------------------------------------------------------------------------------
+
+class Retomada(object):
+    """ Estado de uma varredura, reconstruído a partir do diário
+    Atributos:
+    plano: registro 'plano' do diário
+    concluidas: frequências concluídas (valores do plano)
+    frequencias: registros 'frequencia' das frequências concluídas, com as
+    listas 'ciclos' e o registro 'media'
+    atual: frequência interrompida - registro 'frequencia' do diário, com
+    a lista 'ciclos' (registros 'ciclo'), ou None
+    concluida: True se a varredura foi concluída
+    """
+
+    def __init__(self):
+        self.plano = None
+        self.concluidas = []
+        self.frequencias = []
+        self.atual = None
+        self.concluida = False
+
+    def adicionar(self, dados):
+        tipo = dados['tipo']
+        if tipo == 'plano':
+            self.plano = dados
+        elif tipo == 'frequencia':
+            self.atual = dict(dados, ciclos=[])
+        elif (tipo == 'ciclo') and (self.atual is not None):
+            self.atual['ciclos'].append(dados)
+        elif (tipo == 'media') and (self.atual is not None):
+            self.concluidas.append(dados['frequencia'])
+            self.frequencias.append(dict(self.atual, media=dados))
+            self.atual = None
+        elif tipo == 'fim':
+            self.concluida = True
+        return
+
+    def interrompida(self, frequencia):
+        # True se a frequência foi interrompida (n e equilíbrio no diário)
+        return (self.atual is not None) and (self.atual['frequencia'] == frequencia)
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função carregar(nome)
+# lê o diário e retorna o objeto Retomada
+def carregar(nome):
+    retomada = Retomada()
+    with open(nome, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            if not linha.strip():
+                continue
+            try:
+                dados = json.loads(linha)
+            except ValueError:
+                # linha incompleta (interrupção durante a gravação)
+                continue
+            retomada.adicionar(dados)
+    if retomada.plano is None:
+        raise ValueError('plano da medição não encontrado em '+nome)
+    return retomada
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função diario_config(config, nome)
+# cria o objeto Diario a partir da seção [Diario] do arquivo de configuração
+def diario_config(config, nome):
+    return Diario(nome, config.getboolean('Diario', 'habilitar', fallback=True))
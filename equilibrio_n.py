@@ -0,0 +1,76 @@
+# equilibrio_n.py
+# Cálculo da tensão AC de equilíbrio a partir do coeficiente n do objeto
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# O equilíbrio por interpolação (equilibrio()) mede a saída do objeto em DC
+# nominal, em AC -0,1 % e em AC +0,1 %, aguardando cerca de 2,5 x wait_time
+# por frequência. Como a saída do conversor térmico segue E = k.V^n, com o
+# nY já medido basta uma leitura DC (Ydc) e uma leitura AC (Yac), na tensão
+# Vac aplicada:
+#
+#     Vac_equilibrio = Vac . (Ydc / Yac)^(1/nY)
+#
+# Se a correção calculada for maior que o limite de refinamento, a tensão
+# calculada é aplicada e uma nova leitura AC é feita (passo de Newton).
+#
+# A leitura DC é a leitura Y0 feita no início da medição do n, quando o n
+# acabou de ser medido. O n só é utilizado se for confiável (desvio padrão
+# relativo e faixa de valores); caso contrário, é usado o equilíbrio por
+# interpolação.
+#-------------------------------------------------------------------------------
+import math
+#-------------------------------------------------------------------------------
+
+class EquilibrioN(object):
+    """ Classe para o equilíbrio a partir do n
+    Atributos:
+    habilitado: se False, é sempre usado o equilíbrio por interpolação
+    (metodo = interpolacao no arquivo de configuração)
+    desvio_max: desvio padrão relativo máximo de nY (desvio / média)
+    n_min, n_max: faixa de valores admitidos para nY
+    refinamento: correção, em ppm, acima da qual é feito o passo de Newton
+    """
+
+    def __init__(self, habilitado=False, desvio_max=0.05, n_min=1.0, n_max=3.0,
+                 refinamento=1000):
+        self.habilitado = habilitado
+        self.desvio_max = desvio_max
+        self.n_min = n_min
+        self.n_max = n_max
+        self.refinamento = refinamento
+
+    def confiavel(self, n_media, n_desvio):
+        # verifica se o n do objeto pode ser utilizado no equilíbrio
+        if not self.habilitado:
+            return False
+        if not (math.isfinite(n_media) and math.isfinite(n_desvio)):
+            return False
+        if not (self.n_min <= n_media <= self.n_max):
+            return False
+        return (n_desvio / n_media) <= self.desvio_max
+
+    def tensao(self, vac, y_dc, y_ac, n):
+        # tensão AC que iguala a saída do objeto à leitura DC
+        return vac * (y_dc / y_ac) ** (1 / n)
+
+    def refinar(self, vac, vac_novo):
+        # True se a correção for maior que o limite de refinamento
+        return 1e6 * abs(vac_novo / vac - 1) > self.refinamento
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função equilibrio_n_config(config)
+# cria o objeto EquilibrioN a partir da seção [Equilibrio] do arquivo de
+# configuração. Sem a seção (ou sem metodo = n), é usado o equilíbrio por
+# interpolação, como na versão original.
+def equilibrio_n_config(config):
+    padrao = EquilibrioN()
+    if not config.has_section('Equilibrio'):
+        return padrao
+    secao = config['Equilibrio']
+    return EquilibrioN(secao.get('metodo', 'interpolacao').strip().lower() == 'n',
+                       secao.getfloat('desvio_max', padrao.desvio_max),
+                       secao.getfloat('n_min', padrao.n_min),
+                       secao.getfloat('n_max', padrao.n_max),
+                       secao.getfloat('refinamento', padrao.refinamento))
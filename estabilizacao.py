@@ -0,0 +1,233 @@
+# estabilizacao.py
+# Detecção adaptativa da estabilização dos conversores térmicos (TCs)
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Durante cada etapa do ciclo de medição (AC, +DC, AC, -DC, AC) as saídas do
+# padrão e do objeto são lidas periodicamente. Uma reta é ajustada às últimas
+# leituras (janela deslizante) de cada medidor, com a inclinação b (relativa
+# à média, em ppm/s) e a sua incerteza padrão u(b).
+#
+# A saída do conversor tende exponencialmente ao valor de regime, com a
+# constante de tempo tau: o erro de estabilização remanescente é a
+# inclinação multiplicada pela constante de tempo. A etapa é considerada
+# estável quando, para todos os medidores,
+#
+#     (|b| + 2 u(b)) . tau <= erro_max
+#
+# em que erro_max (ppm) deve ser uma fração pequena da incerteza alvo da
+# diferença ac-dc. O tempo de espera configurado (wait_time) passa a ser
+# apenas o limite superior da etapa. Um limite fixo de deriva (ppm/min)
+# encerra a etapa ainda na cauda da exponencial e introduz um erro
+# sistemático na diferença ac-dc; por isso a detecção é desabilitada por
+# padrão.
+#
+# O aquecimento (classe Aquecimento) usa o mesmo ajuste: as saídas são lidas
+# a cada 'intervalo' segundos e o aquecimento termina quando a deriva de
+# todos os medidores na janela fica abaixo de deriva_max (ppm/min). O tempo de
+# aquecimento configurado passa a ser o limite superior. A curva de deriva é
+# guardada para o registro.
+#-------------------------------------------------------------------------------
+import numpy
+import relogio
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função deriva_dispersao(tempos, leituras)
+# ajusta uma reta às leituras e retorna a deriva [ppm/min] e a dispersão [ppm]
+# relativas à média das leituras
+def deriva_dispersao(tempos, leituras):
+    t = numpy.array(tempos, dtype=float)
+    y = numpy.array(leituras, dtype=float)
+    media = numpy.mean(y)
+    if media == 0:
+        return float('inf'), float('inf')
+    b, a = numpy.polyfit(t, y, 1)
+    residuos = y - (a + b*t)
+    if len(y) > 2:
+        dispersao = numpy.sqrt(numpy.sum(residuos**2) / (len(y) - 2))
+    else:
+        dispersao = 0.0
+    return abs(1e6 * 60 * b / media), abs(1e6 * dispersao / media)
+#-------------------------------------------------------------------------------
+# função inclinacao(tempos, leituras)
+# ajusta uma reta às leituras e retorna a inclinação e a sua incerteza
+# padrão, relativas à média das leituras, em ppm/s
+def inclinacao(tempos, leituras):
+    t = numpy.array(tempos, dtype=float)
+    y = numpy.array(leituras, dtype=float)
+    media = numpy.mean(y)
+    if (media == 0) or (len(y) < 3):
+        return float('inf'), float('inf')
+    b, a = numpy.polyfit(t, y, 1)
+    residuos = y - (a + b*t)
+    s = numpy.sqrt(numpy.sum(residuos**2) / (len(y) - 2))
+    u_b = s / numpy.sqrt(numpy.sum((t - numpy.mean(t))**2))
+    return abs(1e6 * b / media), abs(1e6 * u_b / media)
+#-------------------------------------------------------------------------------
+
+class Estabilizacao(object):
+    """ Classe para a detecção adaptativa da estabilização
+    Atributos:
+    habilitada: se False, cada etapa aguarda o tempo máximo (comportamento fixo)
+    tempo_minimo: tempo mínimo de cada etapa, em segundos
+    intervalo: intervalo entre as leituras de monitoramento, em segundos
+    janela: quantidade de leituras utilizadas na avaliação
+    tau: constante de tempo dos conversores, em segundos
+    erro_max: erro de estabilização remanescente máximo admitido, em ppm
+    """
+
+    def __init__(self, habilitada=False, tempo_minimo=20, intervalo=2, janela=6,
+                 tau=15, erro_max=0.1):
+        self.habilitada = habilitada
+        self.tempo_minimo = tempo_minimo
+        self.intervalo = intervalo
+        self.janela = max(int(janela), 3)
+        self.tau = tau
+        self.erro_max = erro_max
+
+    def aguardar(self, tempo_max, ler, espera):
+        # aguarda a estabilização da etapa atual
+        # tempo_max - limite superior da etapa, em segundos (wait_time)
+        # ler - função que retorna a lista de leituras (float) dos medidores
+        # espera - função de espera utilizada pelo programa
+        # retorna o tempo decorrido e se a estabilização foi detectada
+        if not self.habilitada:
+            espera(tempo_max)
+            return {'tempo':tempo_max, 'estavel':False}
+
+        inicio = relogio.tempo()
+        tempos = []
+        leituras = None
+
+        while True:
+            decorrido = relogio.tempo() - inicio
+            if decorrido >= tempo_max:
+                return {'tempo':decorrido, 'estavel':False}
+            proxima = decorrido + self.intervalo
+            valores = ler()
+            decorrido = relogio.tempo() - inicio
+            tempos.append(decorrido)
+            if leituras is None:
+                leituras = [[] for v in valores]
+            for i in range(len(valores)):
+                leituras[i].append(valores[i])
+            if len(tempos) > self.janela:
+                del tempos[0]
+                for l in leituras:
+                    del l[0]
+            if (len(tempos) == self.janela) and (decorrido >= self.tempo_minimo):
+                if all(self.estavel(tempos, l) for l in leituras):
+                    return {'tempo':decorrido, 'estavel':True}
+            espera(max(0, min(proxima, tempo_max) - (relogio.tempo() - inicio)))
+
+    def erro(self, tempos, leituras):
+        # erro de estabilização remanescente (limite com cobertura 2), em ppm
+        b, u_b = inclinacao(tempos, leituras)
+        return (b + 2*u_b) * self.tau
+
+    def estavel(self, tempos, leituras):
+        return self.erro(tempos, leituras) <= self.erro_max
+#-------------------------------------------------------------------------------
+
+class Aquecimento(object):
+    """ Classe para o término do aquecimento por detecção da deriva
+    Atributos:
+    habilitado: se False, o aquecimento dura sempre o tempo configurado
+    tempo_minimo: tempo mínimo de aquecimento, em segundos
+    intervalo: intervalo entre as leituras, em segundos
+    janela: quantidade de leituras utilizadas no cálculo da deriva
+    deriva_max: deriva máxima admitida, em ppm/min
+    curva: lista de {'tempo', 'leituras', 'derivas'} (curva de deriva)
+    """
+
+    def __init__(self, habilitado=False, tempo_minimo=300, intervalo=30, janela=10,
+                 deriva_max=2):
+        self.habilitado = habilitado
+        self.tempo_minimo = tempo_minimo
+        self.intervalo = intervalo
+        self.janela = max(int(janela), 3)
+        self.deriva_max = deriva_max
+        self.iniciar()
+
+    def iniciar(self):
+        self.tempos = []
+        self.leituras = None
+        self.curva = []
+        return
+
+    def adicionar(self, tempo, valores):
+        # acrescenta as leituras dos medidores no instante 'tempo' (segundos
+        # desde o início do aquecimento); retorna True se a deriva de todos os
+        # medidores estiver abaixo do limite
+        self.tempos.append(tempo)
+        if self.leituras is None:
+            self.leituras = [[] for v in valores]
+        for i in range(len(valores)):
+            self.leituras[i].append(valores[i])
+        if len(self.tempos) > self.janela:
+            del self.tempos[0]
+            for l in self.leituras:
+                del l[0]
+        derivas = None
+        if len(self.tempos) == self.janela:
+            derivas = [deriva_dispersao(self.tempos, l)[0] for l in self.leituras]
+        self.curva.append({'tempo':tempo, 'leituras':list(valores), 'derivas':derivas})
+        if (derivas is None) or (tempo < self.tempo_minimo):
+            return False
+        return all(d <= self.deriva_max for d in derivas)
+
+    def aguardar(self, tempo_max, ler, espera):
+        # aquecimento com as leituras feitas a cada 'intervalo' segundos
+        # tempo_max - tempo de aquecimento configurado (limite superior)
+        # ler - função que retorna a lista de leituras (float) dos medidores
+        # espera - função de espera utilizada pelo programa
+        # retorna o tempo decorrido e se o término por deriva foi detectado
+        self.iniciar()
+        if not self.habilitado:
+            espera(tempo_max)
+            return {'tempo':tempo_max, 'estavel':False}
+
+        inicio = relogio.tempo()
+        while True:
+            decorrido = relogio.tempo() - inicio
+            if decorrido >= tempo_max:
+                return {'tempo':decorrido, 'estavel':False}
+            proxima = decorrido + self.intervalo
+            valores = ler()
+            decorrido = relogio.tempo() - inicio
+            if self.adicionar(decorrido, valores):
+                return {'tempo':decorrido, 'estavel':True}
+            espera(max(0, min(proxima, tempo_max) - (relogio.tempo() - inicio)))
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função estabilizacao_config(config)
+# cria o objeto Estabilizacao a partir da seção [Estabilizacao] do arquivo de
+# configuração. Parâmetros ausentes assumem os valores padrão.
+def estabilizacao_config(config):
+    padrao = Estabilizacao()
+    if not config.has_section('Estabilizacao'):
+        return padrao
+    secao = config['Estabilizacao']
+    return Estabilizacao(secao.getboolean('habilitar', padrao.habilitada),
+                         secao.getfloat('tempo_minimo', padrao.tempo_minimo),
+                         secao.getfloat('intervalo', padrao.intervalo),
+                         secao.getint('janela', padrao.janela),
+                         secao.getfloat('tau', padrao.tau),
+                         secao.getfloat('erro_max', padrao.erro_max))
+#-------------------------------------------------------------------------------
+# função aquecimento_config(config)
+# cria o objeto Aquecimento a partir da seção [Aquecimento] do arquivo de
+# configuração. Parâmetros ausentes assumem os valores padrão; sem a seção,
+# o aquecimento dura sempre o tempo configurado (versão original).
+def aquecimento_config(config):
+    padrao = Aquecimento()
+    if not config.has_section('Aquecimento'):
+        return padrao
+    secao = config['Aquecimento']
+    return Aquecimento(secao.getboolean('habilitar', padrao.habilitado),
+                       secao.getfloat('tempo_minimo', padrao.tempo_minimo),
+                       secao.getfloat('intervalo', padrao.intervalo),
+                       secao.getint('janela', padrao.janela),
+                       secao.getfloat('deriva_max', padrao.deriva_max))
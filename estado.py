@@ -0,0 +1,141 @@
+# estado.py
+# Cache do estado das fontes e da chave AC-DC
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Os ciclos de medição reenviam às fontes (Fluke 5700A/5720A/5730A) os mesmos
+# comandos OUT <V> V, OUT <f> HZ e OPER a cada repetição, e à chave a mesma
+# posição. Cada comando ocupa o barramento e, no calibrador, a programação de
+# uma nova saída pode provocar um transitório que prolonga a estabilização.
+#
+# As classes EstadoFonte e EstadoChave envolvem o objeto pyVISA e guardam o
+# último valor comandado (tensão, frequência, operate e posição da chave).
+# Comandos que não alteram o estado não são enviados e são contabilizados em
+# 'suprimidos'. Os demais métodos (query, read, control_ren, ...) são
+# repassados ao objeto pyVISA.
+#
+# O método saida(tensao, frequencia) programa tensão e frequência com o
+# comando composto do calibrador (OUT <V> V, <f> HZ) quando as duas mudam.
+#-------------------------------------------------------------------------------
+import re
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# expressões regulares dos comandos de saída do calibrador
+numero = r'([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)'
+cmd_tensao = re.compile(r'^OUT\s*'+numero+r'\s*V$', re.IGNORECASE)
+cmd_frequencia = re.compile(r'^OUT\s*'+numero+r'\s*HZ$', re.IGNORECASE)
+cmd_composto = re.compile(r'^OUT\s*'+numero+r'\s*V\s*,\s*'+numero+r'\s*HZ$', re.IGNORECASE)
+#-------------------------------------------------------------------------------
+
+class EstadoFonte(object):
+    """ Cache do estado de uma fonte (calibrador Fluke 57xxA)
+    Atributos:
+    gpib: objeto pyVISA da fonte
+    tensao: última tensão comandada, em V (None se desconhecida)
+    frequencia: última frequência comandada, em Hz (None se desconhecida)
+    operate: True em OPER, False em STBY (None se desconhecido)
+    limite_operate: tensão acima da qual o calibrador volta sozinho para STBY
+    ao mudar a saída; nesse caso o próximo OPER é sempre enviado
+    suprimidos: quantidade de comandos não enviados por não alterar o estado
+    """
+
+    def __init__(self, gpib, limite_operate=33):
+        self.gpib = gpib
+        self.limite_operate = limite_operate
+        self.suprimidos = 0
+        self.invalidar()
+
+    def __getattr__(self, nome):
+        return getattr(self.gpib, nome)
+
+    def invalidar(self):
+        # esquece o estado; os próximos comandos são sempre enviados
+        self.tensao = None
+        self.frequencia = None
+        self.operate = None
+        return
+
+    def write(self, comando):
+        texto = comando.strip()
+        m = cmd_composto.match(texto)
+        if m:
+            return self.saida(float(m.group(1)), float(m.group(2)))
+        m = cmd_tensao.match(texto)
+        if m:
+            return self.saida(float(m.group(1)), None)
+        m = cmd_frequencia.match(texto)
+        if m:
+            return self.saida(None, float(m.group(1)))
+        comando_upper = texto.upper()
+        if comando_upper in ('OPER', 'STBY'):
+            # STBY é sempre enviado (segurança)
+            operate = (comando_upper == 'OPER')
+            if operate and self.operate:
+                self.suprimidos += 1
+                return
+            self.gpib.write(comando)
+            self.operate = operate
+            return
+        if comando_upper == '*RST':
+            self.invalidar()
+        self.gpib.write(comando)
+        return
+
+    def saida(self, tensao, frequencia):
+        # programa a tensão e a frequência, enviando apenas o que mudou
+        # a tensão é comparada com a resolução do comando (1 uV)
+        if tensao is not None:
+            tensao = round(tensao, 6)
+        nova_tensao = (tensao is not None) and (tensao != self.tensao)
+        nova_frequencia = (frequencia is not None) and (frequencia != self.frequencia)
+        if nova_tensao and nova_frequencia:
+            self.gpib.write("OUT {:+.6f} V, {} HZ".format(tensao, frequencia))
+            self.suprimidos += 1
+        elif nova_tensao:
+            self.gpib.write("OUT {:+.6f} V".format(tensao))
+            self.suprimidos += (frequencia is not None)
+        elif nova_frequencia:
+            self.gpib.write("OUT {} HZ".format(frequencia))
+            self.suprimidos += (tensao is not None)
+        else:
+            self.suprimidos += (tensao is not None) + (frequencia is not None)
+        if nova_tensao and (abs(tensao) > self.limite_operate):
+            self.operate = None
+        if tensao is not None:
+            self.tensao = tensao
+        if frequencia is not None:
+            self.frequencia = frequencia
+        return
+
+#-------------------------------------------------------------------------------
+
+class EstadoChave(object):
+    """ Cache da posição da chave AC-DC (METAS)
+    Atributos:
+    gpib: objeto pyVISA da chave
+    posicao: último comando de posição enviado (None após o reset)
+    suprimidos: quantidade de comandos não enviados por não alterar a posição
+    """
+
+    def __init__(self, gpib, reset=chr(2)):
+        self.gpib = gpib
+        self.reset = reset
+        self.posicao = None
+        self.suprimidos = 0
+
+    def __getattr__(self, nome):
+        return getattr(self.gpib, nome)
+
+    def write_raw(self, comando):
+        # o reset é sempre enviado
+        if comando == self.reset:
+            self.posicao = None
+        elif comando == self.posicao:
+            self.suprimidos += 1
+            return
+        else:
+            self.posicao = comando
+        self.gpib.write_raw(comando)
+        return
+#-------------------------------------------------------------------------------
@@ -0,0 +1,154 @@
+# exportacao.py
+# Exportação dos resultados da medição em arquivo binário (NPZ)
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# O registro CSV (separador ';' e vírgula decimal, com os cabeçalhos de cada
+# frequência entre as linhas de dados) é lento e frágil para a análise.
+#
+# Cada medição gera também um arquivo .npz (numpy.savez), com o mesmo nome do
+# registro, lido com uma única chamada:
+#
+#     dados = numpy.load('registro_16-10-2026_10h00m.npz')
+#
+# Arrays por ciclo (todos os ciclos, inclusive os descartados):
+# ciclo_indice - índice da frequência (arrays por frequência) do ciclo
+# ciclo_frequencia - frequência [kHz]
+# std, dut - leituras convertidas (ciclos x etapas da sequência, [Sequencia];
+#            padrão: AC, DC+, AC, DC-, AC)
+# horario - data / hora do ciclo (datetime64[s])
+# dif, Delta, vdc, u_dif - diferença ac-dc, Delta, tensão DC aplicada e
+#                          incerteza do ciclo
+# tempos - tempos de estabilização das etapas (ciclos x etapas)
+# aceito - True se o ciclo passou no critério de descarte
+# ambiente, ambiente_min, ambiente_max - temperatura, umidade e pressão
+#                                        (ciclos x 3: média, mínimo, máximo)
+#
+# Arrays por frequência:
+# frequencia, n (frequências x 4: média e desvio padrão de nX e nY), X0, Y0,
+# Xi, Yi, vac_equilibrio, metodo_equilibrio, origem_n, media, desvio,
+# pontos, motivo
+#
+# Metadados: versao, inicio e config (seções do arquivo de configuração, em
+# JSON).
+#
+# O arquivo é regravado ao final de cada frequência (arquivo temporário e
+# os.replace).
+#-------------------------------------------------------------------------------
+import datetime
+import json
+import os
+import numpy
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função matriz(linhas, colunas)
+# array 2D a partir de uma lista de listas, completada com nan
+def matriz(linhas, colunas):
+    m = numpy.full((len(linhas), colunas), numpy.nan)
+    for i, linha in enumerate(linhas):
+        m[i, :len(linha)] = linha
+    return m
+#-------------------------------------------------------------------------------
+
+class ExportacaoNPZ(object):
+    """ Exportação da medição em arquivo .npz
+    Atributos:
+    nome: nome do arquivo
+    habilitada: se False, nada é gravado
+    metadados: versão, início da medição e arquivo de configuração
+    ciclos, frequencias: listas com os dados de cada ciclo e de cada
+    frequência
+    """
+
+    def __init__(self, nome, habilitada=True, metadados=None):
+        self.nome = nome
+        self.habilitada = habilitada
+        self.metadados = metadados if metadados is not None else {}
+        self.ciclos = []
+        self.frequencias = []
+
+    def frequencia(self, frequencia, n_array, vac_equilibrio, metodo):
+        # início de uma frequência: n e tensão AC de equilíbrio
+        self.frequencias.append({'frequencia':float(frequencia), 'n':n_array['results'],
+                                 'X0':n_array['X0'], 'Y0':n_array['Y0'],
+                                 'Xi':list(n_array['Xi']), 'Yi':list(n_array['Yi']),
+                                 'vac':vac_equilibrio, 'metodo':metodo, 'origem':n_array['origem'],
+                                 'media':numpy.nan, 'desvio':numpy.nan, 'pontos':0, 'motivo':''})
+        return
+
+    def ciclo(self, results, vdc_atual, ca_data, aceito):
+        # results - dicionário retornado por acdc_calc()
+        condicoes = [[c.temperature, c.humidity, c.pressure] for c in [ca_data, ca_data.minimo, ca_data.maximo]]
+        self.ciclos.append({'indice':len(self.frequencias) - 1, 'frequencia':self.frequencias[-1]['frequencia'],
+                            'std':list(results['std_readings']), 'dut':list(results['dut_readings']),
+                            'horario':datetime.datetime.strptime(results['timestamp'], '%d/%m/%Y %H:%M:%S'),
+                            'dif':results['dif'], 'Delta':results['Delta'], 'vdc':vdc_atual,
+                            'u_dif':results['u_dif'], 'tempos':list(results['tempos']), 'aceito':aceito,
+                            'ambiente':condicoes})
+        return
+
+    def media(self, media, desvio, pontos, motivo):
+        # final de uma frequência; o arquivo é regravado
+        self.frequencias[-1].update({'media':media, 'desvio':desvio, 'pontos':pontos, 'motivo':motivo})
+        self.gravar()
+        return
+
+    def arrays(self):
+        # dicionário nome -> array
+        c = self.ciclos
+        f = self.frequencias
+        etapas = max([len(ciclo['std']) for ciclo in c], default=5)
+        ambiente = numpy.array([ciclo['ambiente'] for ciclo in c], dtype=float).reshape(len(c), 3, 3)
+        return {
+            'ciclo_indice': numpy.array([ciclo['indice'] for ciclo in c], dtype=int),
+            'ciclo_frequencia': numpy.array([ciclo['frequencia'] for ciclo in c], dtype=float),
+            'std': matriz([ciclo['std'] for ciclo in c], etapas),
+            'dut': matriz([ciclo['dut'] for ciclo in c], etapas),
+            'horario': numpy.array([ciclo['horario'] for ciclo in c], dtype='datetime64[s]'),
+            'dif': numpy.array([ciclo['dif'] for ciclo in c], dtype=float),
+            'Delta': numpy.array([ciclo['Delta'] for ciclo in c], dtype=float),
+            'vdc': numpy.array([ciclo['vdc'] for ciclo in c], dtype=float),
+            'u_dif': numpy.array([ciclo['u_dif'] for ciclo in c], dtype=float),
+            'tempos': matriz([ciclo['tempos'] for ciclo in c], etapas),
+            'aceito': numpy.array([ciclo['aceito'] for ciclo in c], dtype=bool),
+            'ambiente': ambiente[:, 0, :],
+            'ambiente_min': ambiente[:, 1, :],
+            'ambiente_max': ambiente[:, 2, :],
+            'frequencia': numpy.array([freq['frequencia'] for freq in f], dtype=float),
+            'n': matriz([freq['n'] for freq in f], 4),
+            'X0': numpy.array([freq['X0'] for freq in f], dtype=float),
+            'Y0': numpy.array([freq['Y0'] for freq in f], dtype=float),
+            'Xi': matriz([freq['Xi'] for freq in f], max([len(freq['Xi']) for freq in f], default=0)),
+            'Yi': matriz([freq['Yi'] for freq in f], max([len(freq['Yi']) for freq in f], default=0)),
+            'vac_equilibrio': numpy.array([freq['vac'] for freq in f], dtype=float),
+            'metodo_equilibrio': numpy.array([freq['metodo'] for freq in f], dtype=str),
+            'origem_n': numpy.array([freq['origem'] for freq in f], dtype=str),
+            'media': numpy.array([freq['media'] for freq in f], dtype=float),
+            'desvio': numpy.array([freq['desvio'] for freq in f], dtype=float),
+            'pontos': numpy.array([freq['pontos'] for freq in f], dtype=int),
+            'motivo': numpy.array([freq['motivo'] for freq in f], dtype=str),
+            'versao': numpy.array(self.metadados.get('versao', '')),
+            'inicio': numpy.array(self.metadados.get('inicio', ''), dtype='datetime64[s]'),
+            'config': numpy.array(json.dumps(self.metadados.get('config', {}), ensure_ascii=False)),
+        }
+
+    def gravar(self):
+        if not self.habilitada:
+            return
+        temporario = self.nome + '.tmp'
+        with open(temporario, 'wb') as arquivo:
+            numpy.savez(arquivo, **self.arrays())
+        os.replace(temporario, self.nome)
+        return
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função exportacao_config(config, registro_filename, versao, inicio)
+# cria o objeto ExportacaoNPZ a partir da seção [Exportacao] do arquivo de
+# configuração; o arquivo tem o nome do registro, com a extensão .npz
+def exportacao_config(config, registro_filename, versao, inicio):
+    nome = os.path.splitext(registro_filename)[0] + '.npz'
+    metadados = {'versao':versao, 'inicio':inicio,
+                 'config':{secao: dict(config[secao]) for secao in config.sections()}}
+    return ExportacaoNPZ(nome, config.getboolean('Exportacao', 'habilitar', fallback=True), metadados)
@@ -0,0 +1,308 @@
+# importacao.py
+# Importação em lote dos registros de medição (registro_*.csv)
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Leitura dos registros escritos por criar_registro / registro_frequencia /
+# registro_linha / registro_media (separador ';', vírgula decimal), para a
+# análise de tendências sem a cópia manual para planilhas.
+#
+# Cada registro é lido linha a linha:
+# - as linhas 'Tensão [V]' / 'Frequência [kHz]' iniciam o bloco de uma
+#   frequência; 'X0', 'Xi', 'Y0', 'Yi', 'nX (média)', ..., 'Vac equilíbrio
+#   [V]', 'Média' e 'Desvio-padrão' completam o bloco;
+# - a linha que começa com 'Data / hora' é o cabeçalho da tabela de
+#   medição: as colunas são identificadas pelo nome (as colunas 'AC (STD)',
+#   'AC (DUT)' se repetem, na ordem do ciclo), de forma que os registros
+#   antigos, sem as colunas do BME280 ou sem as colunas de estabilização e
+#   de incerteza, também são lidos (colunas ausentes -> nan);
+# - o bloco de uma frequência interrompida e refeito após 'Retomada da
+#   medição' é descartado (a frequência aparece completa após a retomada).
+#
+# Os arquivos são decodificados em utf-8 e, se falhar, em latin-1 (registros
+# gravados no Windows).
+#
+# importar(arquivos, processos) lê os arquivos num pool de processos e
+# retorna um dicionário de arrays, com os mesmos nomes do arquivo .npz da
+# exportação (exportacao.py) e os índices:
+# ciclo_indice - índice da frequência (arrays por frequência) de cada ciclo
+# frequencia_arquivo - índice do arquivo (arrays por arquivo) de cada
+#                      frequência
+#
+# Uso:  python importacao.py diretorio [saida.npz]
+#-------------------------------------------------------------------------------
+import concurrent.futures
+import datetime
+import glob
+import os
+import numpy
+import exportacao
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# colunas da tabela de medição: nome no registro -> (array, coluna)
+# as colunas repetidas são identificadas pela ordem em que aparecem
+colunas_ciclo = {
+    'AC (STD)': [('std', 0), ('std', 2), ('std', 4)],
+    'AC (DUT)': [('dut', 0), ('dut', 2), ('dut', 4)],
+    'DC+ (STD)': [('std', 1)],
+    'DC+ (DUT)': [('dut', 1)],
+    'DC- (STD)': [('std', 3)],
+    'DC- (DUT)': [('dut', 3)],
+    'Diferença': [('dif', None)],
+    'Delta': [('Delta', None)],
+    'Tensão DC Aplicada': [('vdc', None)],
+    'Temperatura [ºC]': [('ambiente', 0)],
+    'Umidade Relativa [% u.r.]': [('ambiente', 1)],
+    'Pressão Atmosférica [hPa]': [('ambiente', 2)],
+    'Temperatura mín. [ºC]': [('ambiente_min', 0)],
+    'Temperatura máx. [ºC]': [('ambiente_max', 0)],
+    'Umidade Relativa mín. [% u.r.]': [('ambiente_min', 1)],
+    'Umidade Relativa máx. [% u.r.]': [('ambiente_max', 1)],
+    'Pressão Atmosférica mín. [hPa]': [('ambiente_min', 2)],
+    'Pressão Atmosférica máx. [hPa]': [('ambiente_max', 2)],
+    'Estabilização AC [s]': [('tempos', 0), ('tempos', 2), ('tempos', 4)],
+    'Estabilização DC+ [s]': [('tempos', 1)],
+    'Estabilização DC- [s]': [('tempos', 3)],
+    'Incerteza do ciclo': [('u_dif', None)],
+}
+# tamanho dos arrays por ciclo (None: um valor por ciclo)
+tamanhos_ciclo = {'std':5, 'dut':5, 'dif':None, 'Delta':None, 'vdc':None, 'u_dif':None,
+                  'tempos':5, 'ambiente':3, 'ambiente_min':3, 'ambiente_max':3}
+# linhas do bloco de uma frequência: nome no registro -> chave
+linhas_frequencia = {
+    'X0': 'X0', 'Y0': 'Y0',
+    'nX (média)': 'nX_media', 'nX (desvio padrão)': 'nX_desvio',
+    'nY (média)': 'nY_media', 'nY (desvio padrão)': 'nY_desvio',
+    'Vac equilíbrio [V]': 'vac_equilibrio',
+    'Média': 'media', 'Desvio-padrão': 'desvio',
+}
+formato_data = '%d/%m/%Y %H:%M:%S'
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função numero(texto)
+# converte um número com vírgula decimal (vazio ou inválido -> nan)
+def numero(texto):
+    try:
+        return float(texto.strip().replace(',', '.'))
+    except ValueError:
+        return float('nan')
+#-------------------------------------------------------------------------------
+# função data(texto)
+# converte a data / hora do registro (inválida -> None)
+def data(texto):
+    try:
+        return datetime.datetime.strptime(texto.strip(), formato_data)
+    except ValueError:
+        return None
+#-------------------------------------------------------------------------------
+# função ler_texto(nome)
+# conteúdo do arquivo, em utf-8 ou latin-1
+def ler_texto(nome):
+    with open(nome, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    try:
+        return conteudo.decode('utf-8')
+    except UnicodeDecodeError:
+        return conteudo.decode('latin-1')
+#-------------------------------------------------------------------------------
+
+class Leitor(object):
+    """ Leitura de um registro de medição
+    Atributos:
+    arquivo: metadados do registro (versão, início, observações)
+    frequencias: blocos das frequências (dicionários, com as linhas da
+    tabela de medição em 'ciclos')
+    """
+
+    def __init__(self):
+        self.arquivo = {'versao':'', 'inicio':None, 'observacoes':''}
+        self.frequencias = []
+        self.bloco = None
+        self.colunas = None
+        self.tensao = float('nan')
+
+    def novo_bloco(self, frequencia):
+        # início do bloco de uma frequência
+        self.bloco = {'frequencia':frequencia, 'tensao':self.tensao, 'ciclos':[], 'Xi':[], 'Yi':[],
+                      'metodo':''}
+        self.bloco.update({chave: float('nan') for chave in linhas_frequencia.values()})
+        self.frequencias.append(self.bloco)
+        self.colunas = None
+        return
+
+    def cabecalho(self, linha):
+        # mapa coluna do registro -> (array, coluna)
+        self.colunas = []
+        ocorrencias = {}
+        for i, nome in enumerate(linha):
+            nome = nome.strip()
+            destinos = colunas_ciclo.get(nome)
+            if destinos is None:
+                continue
+            k = ocorrencias.get(nome, 0)
+            ocorrencias[nome] = k + 1
+            if k < len(destinos):
+                self.colunas.append((i, destinos[k]))
+        return
+
+    def ciclo(self, linha, horario):
+        valores = {chave: (numpy.full(n, numpy.nan) if n else numpy.nan) for chave, n in tamanhos_ciclo.items()}
+        for i, (chave, coluna) in self.colunas:
+            if i >= len(linha):
+                continue
+            if coluna is None:
+                valores[chave] = numero(linha[i])
+            else:
+                valores[chave][coluna] = numero(linha[i])
+        valores['horario'] = horario
+        self.bloco['ciclos'].append(valores)
+        return
+
+    def adicionar(self, linha):
+        if not linha:
+            return
+        chave = linha[0].strip()
+        if chave.startswith('pyAC-DC '):
+            self.arquivo['versao'] = chave[len('pyAC-DC '):]
+        elif chave == 'Início da medição' and len(linha) > 1:
+            self.arquivo['inicio'] = data(linha[1])
+        elif chave == 'Observações' and len(linha) > 1:
+            self.arquivo['observacoes'] = linha[1]
+        elif chave == 'Retomada da medição':
+            if (self.bloco is not None) and numpy.isnan(self.bloco['media']):
+                self.frequencias.remove(self.bloco)
+            self.bloco = None
+            self.colunas = None
+        elif chave == 'Tensão [V]' and len(linha) > 1:
+            self.tensao = numero(linha[1])
+        elif chave == 'Frequência [kHz]' and len(linha) > 1:
+            self.novo_bloco(numero(linha[1]))
+        elif self.bloco is None:
+            return
+        elif chave in ('Xi', 'Yi'):
+            self.bloco[chave] = [numero(v) for v in linha[1:] if v.strip()]
+        elif chave in linhas_frequencia and len(linha) > 1:
+            self.bloco[linhas_frequencia[chave]] = numero(linha[1])
+            if chave == 'Média':
+                self.colunas = None
+        elif chave == 'Método do equilíbrio' and len(linha) > 1:
+            self.bloco['metodo'] = linha[1]
+        elif chave == 'Data / hora':
+            self.cabecalho(linha)
+        elif self.colunas is not None:
+            horario = data(chave)
+            if horario is not None:
+                self.ciclo(linha, horario)
+        return
+
+    def arrays(self):
+        # dicionário nome -> array (mesmos nomes da exportação)
+        f = self.frequencias
+        c = [ciclo for bloco in f for ciclo in bloco['ciclos']]
+        dados = {
+            'ciclo_indice': numpy.array([i for i, bloco in enumerate(f) for ciclo in bloco['ciclos']], dtype=int),
+            'ciclo_frequencia': numpy.array([bloco['frequencia'] for bloco in f for ciclo in bloco['ciclos']], dtype=float),
+            'horario': numpy.array([ciclo['horario'] for ciclo in c], dtype='datetime64[s]'),
+            'frequencia': numpy.array([bloco['frequencia'] for bloco in f], dtype=float),
+            'tensao': numpy.array([bloco['tensao'] for bloco in f], dtype=float),
+            'n': exportacao.matriz([[bloco['nX_media'], bloco['nX_desvio'], bloco['nY_media'], bloco['nY_desvio']] for bloco in f], 4),
+            'X0': numpy.array([bloco['X0'] for bloco in f], dtype=float),
+            'Y0': numpy.array([bloco['Y0'] for bloco in f], dtype=float),
+            'Xi': exportacao.matriz([bloco['Xi'] for bloco in f], max([len(bloco['Xi']) for bloco in f], default=0)),
+            'Yi': exportacao.matriz([bloco['Yi'] for bloco in f], max([len(bloco['Yi']) for bloco in f], default=0)),
+            'vac_equilibrio': numpy.array([bloco['vac_equilibrio'] for bloco in f], dtype=float),
+            'metodo_equilibrio': numpy.array([bloco['metodo'] for bloco in f], dtype=str),
+            'media': numpy.array([bloco['media'] for bloco in f], dtype=float),
+            'desvio': numpy.array([bloco['desvio'] for bloco in f], dtype=float),
+            'pontos': numpy.array([len(bloco['ciclos']) for bloco in f], dtype=int),
+        }
+        for chave, n in tamanhos_ciclo.items():
+            if n:
+                dados[chave] = numpy.array([ciclo[chave] for ciclo in c], dtype=float).reshape(len(c), n)
+            else:
+                dados[chave] = numpy.array([ciclo[chave] for ciclo in c], dtype=float)
+        return dados
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função ler_registro(nome)
+# lê um registro de medição; retorna (metadados, arrays)
+def ler_registro(nome):
+    leitor = Leitor()
+    for linha in ler_texto(nome).splitlines():
+        leitor.adicionar(linha.split(';'))
+    return leitor.arquivo, leitor.arrays()
+#-------------------------------------------------------------------------------
+# função ler_seguro(nome)
+# ler_registro() no pool de processos: o erro de um arquivo não interrompe a
+# importação dos demais
+def ler_seguro(nome):
+    try:
+        return ler_registro(nome), None
+    except Exception as erro:
+        return None, repr(erro)
+#-------------------------------------------------------------------------------
+# função juntar(arrays)
+# concatena arrays 1D ou 2D (colunas completadas com nan)
+def juntar(arrays):
+    if arrays[0].ndim == 2:
+        colunas = max(a.shape[1] for a in arrays)
+        arrays = [numpy.pad(a, ((0, 0), (0, colunas - a.shape[1])), constant_values=numpy.nan) for a in arrays]
+    return numpy.concatenate(arrays)
+#-------------------------------------------------------------------------------
+# função importar(arquivos, processos)
+# lê os registros num pool de processos (processos = 1: sem o pool) e
+# retorna (dados, falhas): o dicionário de arrays e a lista (arquivo, erro)
+# dos registros que não puderam ser lidos
+def importar(arquivos, processos=None):
+    arquivos = sorted(arquivos)
+    if processos == 1:
+        resultados = [ler_seguro(nome) for nome in arquivos]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processos) as pool:
+            resultados = list(pool.map(ler_seguro, arquivos, chunksize=8))
+    lidos = []
+    falhas = []
+    for nome, (resultado, erro) in zip(arquivos, resultados):
+        if erro is None:
+            lidos.append((nome, resultado))
+        else:
+            falhas.append((nome, erro))
+    dados = {'arquivo': numpy.array([os.path.basename(nome) for nome, resultado in lidos], dtype=str),
+             'versao': numpy.array([resultado[0]['versao'] for nome, resultado in lidos], dtype=str),
+             'inicio': numpy.array([resultado[0]['inicio'] for nome, resultado in lidos], dtype='datetime64[s]'),
+             'observacoes': numpy.array([resultado[0]['observacoes'] for nome, resultado in lidos], dtype=str)}
+    if not lidos:
+        return dados, falhas
+    # índices globais: frequências de cada arquivo e ciclos de cada frequência
+    deslocamento = 0
+    for i, (nome, (metadados, arrays)) in enumerate(lidos):
+        arrays['frequencia_arquivo'] = numpy.full(len(arrays['frequencia']), i, dtype=int)
+        arrays['ciclo_indice'] = arrays['ciclo_indice'] + deslocamento
+        deslocamento += len(arrays['frequencia'])
+    for chave in lidos[0][1][1]:
+        dados[chave] = juntar([arrays[chave] for nome, (metadados, arrays) in lidos])
+    return dados, falhas
+#-------------------------------------------------------------------------------
+# função importar_diretorio(diretorio, processos)
+# importa todos os registro_*.csv do diretório
+def importar_diretorio(diretorio, processos=None):
+    return importar(glob.glob(os.path.join(diretorio, 'registro_*.csv')), processos)
+#-------------------------------------------------------------------------------
+
+# execução pela linha de comando: importa o diretório e grava os arrays
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Importação dos registros de medição (registro_*.csv)')
+    parser.add_argument('diretorio', help='diretório com os registros')
+    parser.add_argument('saida', nargs='?', default='registros.npz', help='arquivo .npz de saída')
+    parser.add_argument('--processos', type=int, default=None, help='quantidade de processos')
+    args = parser.parse_args()
+    dados, falhas = importar_diretorio(args.diretorio, args.processos)
+    for nome, erro in falhas:
+        print("Falha na leitura de "+nome+": "+erro)
+    numpy.savez(args.saida, **dados)
+    print("{:d} registros, {:d} frequências, {:d} ciclos -> {:s}".format(
+        len(dados['arquivo']), len(dados.get('frequencia', [])), len(dados.get('dif', [])), args.saida))
@@ -0,0 +1,315 @@
+# medidores.py
+# Drivers dos medidores das saídas dos conversores térmicos (TCs)
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Cada modelo de medidor é implementado em uma classe derivada de Driver, que
+# reúne o que antes era decidido por comparações do nome do modelo em cada
+# leitura, impressão e conversão:
+#
+# inicializar() - comandos de configuração; retorna a string de identificação
+# disparar() / buscar() - leitura single-shot separada em disparo e busca
+# disparar_burst(n) / buscar_burst(n, formato) - aquisição em rajada
+# converter() / converter_lote() - conversão das respostas em float / array
+# unidade, escala, formato - exibição das leituras (p. ex. mV para o 182A)
+# escala_delta - fator do critério de descarte Delta (ppm para tensão)
+#
+# O driver é escolhido uma única vez, na criação do medidor, pela função
+# criar_driver(). O modelo pode ser informado com ou sem o fabricante
+# ('182A' ou 'Keithley 182A'). Novos medidores são incluídos com a função
+# registrar(), sem alterar o ciclo de medição.
+#-------------------------------------------------------------------------------
+import re
+import numpy
+import relogio
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função converter_burst(resposta)
+# converte a resposta de um bloco de leituras em ASCII em um array numpy
+def converter_burst(resposta):
+    campos = [a for a in re.split(r'[,;\s]+', resposta.replace('NDCV','')) if a]
+    return numpy.array(campos, dtype=float)
+#-------------------------------------------------------------------------------
+# função decodificar_bloco(dados, tipo, cabecalho)
+# decodifica um bloco binário de leituras em um array numpy, sem cópia
+# tipo - tipo numpy das leituras ('>f8', '>f4', '<f4', ...)
+# cabecalho - True se o medidor envia o cabeçalho IEEE-488.2 (#<d><comprimento>
+#             ou #0); False para blocos sem cabeçalho (3458A), em que o
+#             primeiro byte pode ser qualquer valor, inclusive '#'
+def decodificar_bloco(dados, tipo, cabecalho=True):
+    tipo = numpy.dtype(tipo)
+    inicio = 0
+    comprimento = len(dados)
+    if cabecalho:
+        if dados[:1] != b'#':
+            raise ValueError('bloco binário sem o cabeçalho IEEE-488.2')
+        digitos = int(dados[1:2])
+        inicio = 2 + digitos
+        if digitos > 0:
+            comprimento = inicio + int(dados[2:inicio])
+    n = (comprimento - inicio) // tipo.itemsize
+    return numpy.frombuffer(dados, dtype=tipo, count=n, offset=inicio)
+#-------------------------------------------------------------------------------
+# função estatisticas(valores)
+# retorna a média, o desvio padrão e o número de leituras de um array
+def estatisticas(valores):
+    if len(valores) > 1:
+        desvio = numpy.std(valores, ddof=1)
+    else:
+        desvio = float('nan')
+    return {'media':numpy.mean(valores), 'desvio':desvio, 'n':len(valores)}
+#-------------------------------------------------------------------------------
+
+class Driver(object):
+    """ Classe base dos drivers dos medidores
+    Atributos:
+    instrumento: objeto pyVISA do medidor
+    comando: comando de leitura single-shot
+    unidade: unidade das leituras exibidas ('mV', 'Hz', 'ohms')
+    escala: fator aplicado às leituras exibidas
+    formato: formato das leituras exibidas
+    escala_delta: fator aplicado a Yac - Ydc no critério de descarte
+    cabecalho_bloco: True se os blocos binários têm o cabeçalho IEEE-488.2
+    """
+    comando = None
+    unidade = 'V'
+    escala = 1
+    formato = "{:5.6f}"
+    escala_delta = 1e6
+    cabecalho_bloco = True
+
+    def __init__(self, instrumento, **opcoes):
+        # opcoes - parâmetros específicos de cada modelo; os demais são
+        # ignorados, de forma que as mesmas opções servem a todos os drivers
+        self.instrumento = instrumento
+
+    def inicializar(self):
+        return self.instrumento.query("*IDN?")
+
+    def disparar(self):
+        self.instrumento.write(self.comando)
+        return
+
+    def buscar(self):
+        return self.instrumento.read()
+
+    def ler(self):
+        return self.instrumento.query(self.comando)
+
+    def converter(self, leitura):
+        return float(leitura)
+
+    def converter_lote(self, leituras):
+        return numpy.array(leituras, dtype=float)
+
+    def exibir(self, leitura):
+        return self.formato.format(self.converter(leitura) * self.escala)
+
+    def disparar_burst(self, n):
+        # medidores sem buffer acessível: as leituras são feitas na busca
+        return
+
+    def buscar_burst(self, n, formato='ascii'):
+        valores = numpy.array([self.converter(self.ler()) for i in range(n)])
+        return estatisticas(valores)
+
+#-------------------------------------------------------------------------------
+
+class Keithley182A(Driver):
+    """ Nanovoltímetro Keithley 182A
+    Atributos:
+    comandos: comandos de configuração enviados na inicialização
+    """
+    comando = "X"
+    unidade = 'mV'
+    escala = 1000
+
+    # query dividida para evitar timeout
+    # R0 = enable autorange
+    # I0 = disable buffer
+    # B1 = 6 1/2 digit resolution
+    # S2 = periodo de integracao: 100 ms
+    # N1 = filters on
+    # O1 = analog filter on
+    # P2 = digital filter medium response
+    def __init__(self, instrumento, **opcoes):
+        Driver.__init__(self, instrumento)
+        self.comandos = opcoes.get('comandos', ["X", "R0I0B1X", "O1P2X"])
+
+    def inicializar(self):
+        for comando in self.comandos:
+            self.instrumento.write(comando)
+        return "Keithley 182A"
+
+    def converter(self, leitura):
+        # a resposta do 182A vem precedida do prefixo NDCV
+        return float(leitura.replace('NDCV',''))
+
+    def converter_lote(self, leituras):
+        return numpy.array([a.replace('NDCV','') for a in leituras], dtype=float)
+
+#-------------------------------------------------------------------------------
+
+class Keithley2182A(Driver):
+    """ Nanovoltímetro Keithley 2182A
+    Atributos:
+    canal: canal de medição (1 ou 2)
+    """
+    comando = ":FETCH?"
+    unidade = 'mV'
+    escala = 1000
+
+    def __init__(self, instrumento, **opcoes):
+        Driver.__init__(self, instrumento)
+        self.canal = opcoes.get('canal', 1)
+
+    def inicializar(self):
+        self.instrumento.write("SENS:CHAN {:d}".format(self.canal))
+        self.instrumento.write(":SENS:VOLT:CHAN{:d}:RANG:AUTO ON".format(self.canal))
+        self.instrumento.write(":SENS:VOLT:NPLC 18")
+        self.instrumento.write(":SENS:VOLT:DIG 8")
+        return self.instrumento.query("*IDN?")
+
+    def disparar_burst(self, n):
+        # buffer TRACe
+        self.instrumento.write(":TRAC:CLE")
+        self.instrumento.write(":TRAC:POIN {:d}".format(n))
+        self.instrumento.write(":TRAC:FEED SENS")
+        self.instrumento.write(":TRAC:FEED:CONT NEXT")
+        return
+
+    def buscar_burst(self, n, formato='ascii'):
+        # ao completar o buffer, o controle de alimentação volta para NEVer
+        while self.instrumento.query(":TRAC:FEED:CONT?").strip() != 'NEV':
+            relogio.dormir(0.1)
+        if formato == 'ascii':
+            valores = converter_burst(self.instrumento.query(":TRAC:DATA?"))
+        else:
+            self.instrumento.write(":FORM:BORD SWAP")
+            self.instrumento.write(":FORM:DATA REAL,32")
+            self.instrumento.write(":TRAC:DATA?")
+            valores = decodificar_bloco(self.instrumento.read_raw(), '<f4', self.cabecalho_bloco)
+            self.instrumento.write(":FORM:DATA ASC")
+        return estatisticas(valores)
+
+#-------------------------------------------------------------------------------
+
+class Agilent53132A(Driver):
+    """ Contador de frequência Agilent 53132A (TCs com saída em frequência)
+    """
+    comando = ":FETCH:FREQ?"
+    unidade = 'Hz'
+    formato = "{:5.8f}"
+    escala_delta = 1
+
+    def inicializar(self):
+        idn = self.instrumento.query("*IDN?")
+        self.instrumento.write("*RST")
+        self.instrumento.write("*CLS")
+        self.instrumento.write("*SRE 0")
+        self.instrumento.write("*ESE 0")
+        self.instrumento.write(":STAT:PRES")
+        # comandos para throughput máximo
+        self.instrumento.write(":FORMAT ASCII")
+        self.instrumento.write(":FUNC 'FREQ 1'")
+        self.instrumento.write(":EVENT1:LEVEL 0")
+        # configura o gate size (1 s)
+        self.instrumento.write(":FREQ:ARM:STAR:SOUR IMM")
+        self.instrumento.write(":FREQ:ARM:STOP:SOUR TIM")
+        self.instrumento.write(":FREQ:ARM:STOP:TIM 1")
+        # configura para utilizar oscilador interno
+        self.instrumento.write(":ROSC:SOUR INT")
+        # desativa interpolador automatico
+        self.instrumento.write(":DIAG:CAL:INT:AUTO OFF")
+        # desativa todo o pós-processamento
+        self.instrumento.write(":CALC:MATH:STATE OFF")
+        self.instrumento.write(":CALC2:LIM:STATE OFF")
+        self.instrumento.write(":CALC3:AVER:STATE OFF")
+        self.instrumento.write(":HCOPY:CONT OFF")
+        self.instrumento.write("*DDT #15FETC?")
+        self.instrumento.write(":INIT:CONT ON")
+        return idn
+
+    def disparar_burst(self, n):
+        # estatística sobre n gates
+        self.instrumento.write(":INIT:CONT OFF")
+        self.instrumento.write(":CALC3:AVER:TYPE MEAN")
+        self.instrumento.write(":CALC3:AVER:COUN {:d}".format(n))
+        self.instrumento.write(":CALC3:AVER:STAT ON")
+        self.instrumento.write(":TRIG:COUN:AUTO ON")
+        self.instrumento.write(":INIT")
+        return
+
+    def buscar_burst(self, n, formato='ascii'):
+        # média e desvio padrão calculados pelo próprio contador
+        estatistica = converter_burst(self.instrumento.query("*WAI;:CALC3:AVER:ALL?"))
+        self.instrumento.write(":CALC3:AVER:STAT OFF")
+        self.instrumento.write(":TRIG:COUN:AUTO OFF")
+        self.instrumento.write(":INIT:CONT ON")
+        return {'media':estatistica[0], 'desvio':estatistica[1], 'n':n}
+
+#-------------------------------------------------------------------------------
+
+class Agilent3458A(Driver):
+    """ Multímetro Agilent 3458A (TCs com saída em resistência)
+    """
+    comando = "OHM 100E3"
+    unidade = 'ohms'
+    formato = "{:5.8f}"
+    escala_delta = 1
+    cabecalho_bloco = False
+
+    def inicializar(self):
+        self.instrumento.write("OFORMAT ASCII")
+        self.instrumento.write("END ALWAYS")
+        self.instrumento.write("NPLC 8")
+        return self.instrumento.query("ID?")
+
+    def disparar_burst(self, n):
+        # memória de leituras
+        self.instrumento.write(self.comando+";MEM FIFO;NRDGS {:d},AUTO;TRIG SGL".format(n))
+        return
+
+    def buscar_burst(self, n, formato='ascii'):
+        while int(float(self.instrumento.query("MCOUNT?"))) < n:
+            relogio.dormir(0.1)
+        if formato == 'ascii':
+            valores = converter_burst(self.instrumento.query("RMEM 1,{:d},1".format(n)))
+        else:
+            # com END ALWAYS o EOI acompanha cada leitura: lê o número exato
+            # de bytes do bloco
+            tipo = {'sreal':'>f4', 'dreal':'>f8'}[formato]
+            self.instrumento.write("OFORMAT "+formato.upper())
+            self.instrumento.write("RMEM 1,{:d},1".format(n))
+            valores = decodificar_bloco(self.instrumento.read_bytes(n*numpy.dtype(tipo).itemsize), tipo,
+                                        self.cabecalho_bloco)
+            self.instrumento.write("OFORMAT ASCII")
+        self.instrumento.write("MEM OFF;NRDGS 1,AUTO;TRIG AUTO")
+        return estatisticas(valores)
+
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# Registro dos drivers, indexado pelo modelo (sem o fabricante)
+drivers = {'182A':Keithley182A,
+           '2182A':Keithley2182A,
+           '53132A':Agilent53132A,
+           '3458A':Agilent3458A}
+#-------------------------------------------------------------------------------
+# função registrar(modelo, classe)
+# inclui um novo modelo de medidor no registro
+def registrar(modelo, classe):
+    drivers[modelo.split()[-1]] = classe
+    return
+#-------------------------------------------------------------------------------
+# função criar_driver(modelo, instrumento, **opcoes)
+# cria o driver do medidor a partir do modelo ('182A' ou 'Keithley 182A')
+# opcoes - parâmetros específicos dos drivers: 'canal' (2182A) e 'comandos'
+# (comandos de configuração do 182A)
+def criar_driver(modelo, instrumento, **opcoes):
+    try:
+        classe = drivers[modelo.split()[-1]]
+    except (KeyError, IndexError):
+        raise NameError('modelo de medidor não suportado: '+modelo)
+    return classe(instrumento, **opcoes)
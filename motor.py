@@ -0,0 +1,211 @@
+# motor.py
+# Motor de medição assíncrono (asyncio): instrumentos como recursos com trava
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Em measure() os comandos das fontes, a comutação da chave, as esperas e as
+# leituras são executados em sequência, numa única thread. Apenas a troca da
+# polaridade da fonte DC durante a etapa AC intermediária é sobreposta à
+# estabilização, e ainda assim após uma espera fixa de 2 s sem leituras.
+#
+# No motor, cada instrumento é um recurso assíncrono (Recurso) com a sua
+# própria trava (asyncio.Lock); a E/S do barramento e as esperas são
+# executadas num executor (ThreadPoolExecutor), de forma que operações em
+# instrumentos distintos ocorrem em paralelo. O ciclo de medição é escrito
+# como uma sequência de etapas aguardáveis (etapa()):
+#
+# 1. a chave é comutada para a posição da etapa;
+# 2. os medidores aguardam a estabilização (travas 'std' e 'dut') e, em
+#    paralelo, as fontes isoladas pela chave (cuja saída não está conectada)
+#    são programadas após o intervalo de guarda da comutação;
+# 3. padrão e objeto são lidos.
+#
+# Comandos em instrumentos distintos (por exemplo, fontes AC e DC no início
+# da frequência) podem ser executados juntos com paralelo().
+#
+# Interrupção (Ctrl-C ou exceção): o evento de cancelamento interrompe
+# imediatamente as esperas em curso no executor (relogio.esperar) e as
+# tarefas pendentes são canceladas.
+#
+# Com o relógio virtual (simulação), cada tarefa é um ramo com o seu próprio
+# tempo (relogio.py): as funções executadas no executor avançam o tempo do
+# ramo da tarefa, um recurso liberado por outro ramo só é adquirido no tempo
+# da liberação e, ao final de paralelo(), o tempo é o maior dos ramos. A
+# duração simulada do ciclo é a do ciclo real, e não a soma das esperas.
+#
+# O motor é experimental e vem desabilitado ([Motor] habilitar = false).
+#-------------------------------------------------------------------------------
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import relogio
+#-------------------------------------------------------------------------------
+
+class Recurso(object):
+    """ Instrumento como recurso assíncrono
+    Atributos:
+    nome: identificação do recurso ('fonte_ac', 'fonte_dc', 'chave', 'std',
+    'dut')
+    instrumento: objeto do instrumento (pyVISA, estado.py ou driver do
+    medidor)
+    trava: asyncio.Lock (um comando por vez em cada instrumento)
+    liberado: tempo (relogio.tempo()) da última liberação da trava
+    """
+
+    def __init__(self, nome, instrumento):
+        self.nome = nome
+        self.instrumento = instrumento
+        self.trava = asyncio.Lock()
+        self.liberado = 0.0
+
+#-------------------------------------------------------------------------------
+
+class MotorMedicao(object):
+    """ Motor de medição assíncrono
+    Atributos:
+    habilitado: se False, o ciclo é executado pela sequência original
+    guarda: intervalo entre a comutação da chave e a programação da fonte
+    isolada, em segundos
+    trabalhadores: quantidade de threads do executor de E/S
+    cancelamento: evento que interrompe as esperas em curso no executor
+    recursos: dicionário nome -> Recurso
+    """
+
+    def __init__(self, habilitado=False, guarda=2, trabalhadores=4):
+        self.habilitado = habilitado
+        self.guarda = guarda
+        self.trabalhadores = trabalhadores
+        self.cancelamento = threading.Event()
+        self.recursos = {}
+        self.loop = None
+        self.executor = None
+
+    def iniciar(self):
+        # laço de eventos e executor (criados uma única vez)
+        if self.loop is None:
+            self.loop = asyncio.new_event_loop()
+            self.executor = ThreadPoolExecutor(max_workers=self.trabalhadores)
+        return
+
+    def instrumentos(self, **instrumentos):
+        # registra os instrumentos (nome=objeto) como recursos
+        self.iniciar()
+        asyncio.set_event_loop(self.loop)
+        for nome, instrumento in instrumentos.items():
+            self.recursos[nome] = Recurso(nome, instrumento)
+        return
+
+    def espera(self, segundos):
+        # espera interrompida pelo cancelamento; utilizada nas funções
+        # executadas no executor (estabilização)
+        relogio.esperar(segundos, self.cancelamento)
+        return
+
+    async def no_executor(self, funcao, *args):
+        # executa funcao(*args) no executor, no contexto da tarefa (ramo do
+        # relógio virtual); o ramo da tarefa continua no tempo final da função
+        contexto = contextvars.copy_context()
+        resultado = await self.loop.run_in_executor(self.executor, contexto.run, funcao, *args)
+        relogio.sincronizar(contexto.run(relogio.tempo))
+        return resultado
+
+    async def executar(self, nomes, funcao, *args):
+        # executa funcao(*args) no executor, com as travas dos recursos
+        # indicados (adquiridas em ordem alfabética, sem risco de impasse)
+        recursos = [self.recursos[nome] for nome in sorted(nomes)]
+        for recurso in recursos:
+            await recurso.trava.acquire()
+        try:
+            relogio.sincronizar(max(recurso.liberado for recurso in recursos))
+            return await self.no_executor(funcao, *args)
+        finally:
+            for recurso in reversed(recursos):
+                recurso.liberado = relogio.tempo()
+                recurso.trava.release()
+
+    async def comando(self, nome, funcao, *args):
+        # comando num único instrumento
+        return await self.executar([nome], funcao, *args)
+
+    async def aguardar(self, segundos):
+        # espera sem ocupar instrumentos
+        return await self.no_executor(self.espera, segundos)
+
+    async def paralelo(self, *corrotinas):
+        # executa as corrotinas em paralelo (asyncio.gather) e retorna a
+        # lista dos resultados; cada corrotina é um ramo e, ao final, o ramo
+        # em curso continua no maior tempo alcançado
+        async def ramo(corrotina):
+            resultado = await corrotina
+            return resultado, relogio.tempo()
+        finais = await asyncio.gather(*[ramo(c) for c in corrotinas])
+        if finais:
+            relogio.sincronizar(max(tempo for _, tempo in finais))
+        return [resultado for resultado, _ in finais]
+
+    async def apos_guarda(self, *comandos):
+        # programação das fontes isoladas pela chave, após a guarda
+        # comandos - (nome, funcao, args...) de cada fonte
+        await self.aguardar(self.guarda)
+        return await self.paralelo(*[self.comando(*c) for c in comandos])
+
+    async def etapa(self, posicao, estabilizar, ler, isoladas=()):
+        # etapa do ciclo de medição
+        # posicao - comando da chave (AC ou DC)
+        # estabilizar - função que aguarda a estabilização e retorna o tempo
+        # ler - função que retorna a leitura pareada da etapa
+        # isoladas - lista de (nome, funcao, args...), comandos das fontes
+        #            isoladas, executados durante a estabilização, após a guarda
+        # retorna o tempo de estabilização e a leitura
+        chave = self.recursos['chave'].instrumento
+        await self.comando('chave', chave.write_raw, posicao)
+        tarefas = [self.executar(['std', 'dut'], estabilizar)]
+        if isoladas:
+            tarefas.append(self.apos_guarda(*isoladas))
+        resultados = await self.paralelo(*tarefas)
+        leitura = await self.executar(['std', 'dut'], ler)
+        return resultados[0], leitura
+
+    def rodar(self, corrotina):
+        # executa a corrotina até o final; na interrupção, as esperas em curso
+        # são canceladas e as tarefas pendentes aguardadas antes de propagar
+        # a exceção
+        self.iniciar()
+        token = relogio.iniciar_ramo()
+        try:
+            return self.loop.run_until_complete(corrotina)
+        except BaseException:
+            self.cancelamento.set()
+            pendentes = [t for t in asyncio.all_tasks(self.loop) if not t.done()]
+            for tarefa in pendentes:
+                tarefa.cancel()
+            if pendentes:
+                self.loop.run_until_complete(asyncio.gather(*pendentes, return_exceptions=True))
+            raise
+        finally:
+            relogio.encerrar_ramo(token)
+            self.cancelamento.clear()
+
+    def fechar(self):
+        if self.loop is not None:
+            self.cancelamento.set()
+            self.executor.shutdown(wait=True)
+            self.loop.close()
+            self.loop = None
+            self.cancelamento.clear()
+        return
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função motor_config(config)
+# cria o objeto MotorMedicao a partir da seção [Motor] do arquivo de
+# configuração. Parâmetros ausentes assumem os valores padrão.
+def motor_config(config):
+    padrao = MotorMedicao()
+    if not config.has_section('Motor'):
+        return padrao
+    secao = config['Motor']
+    return MotorMedicao(secao.getboolean('habilitar', padrao.habilitado),
+                        secao.getfloat('guarda', padrao.guarda),
+                        secao.getint('trabalhadores', padrao.trabalhadores))
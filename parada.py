@@ -0,0 +1,159 @@
+# parada.py
+# Critério de parada sequencial das repetições da medição
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Em vez de coletar sempre a mesma quantidade de pontos por frequência, as
+# repetições são encerradas assim que o erro padrão da média da diferença
+# ac-dc (desvio padrão / raiz(n)) atinge a incerteza alvo:
+#
+# minimo - quantidade mínima de pontos aceitos
+# maximo - quantidade máxima de pontos aceitos
+# incerteza_alvo - erro padrão alvo da média, em ppm
+# deriva - se True, a parada pela incerteza alvo só ocorre se a inclinação
+#          da diferença ac-dc em função da repetição não for significativa
+#          (|b| / u(b) < deriva_limite)
+#
+# As estatísticas (média, variância e covariância com o índice da repetição)
+# são atualizadas a cada ponto pelo algoritmo de Welford, sem guardar os
+# pontos. O motivo da parada é escrito no registro.
+#-------------------------------------------------------------------------------
+import math
+#-------------------------------------------------------------------------------
+
+class Welford(object):
+    """ Estatísticas acumuladas (algoritmo de Welford)
+    Atributos:
+    n: quantidade de pontos
+    media: média dos pontos
+    m2: soma dos quadrados dos desvios em relação à média
+    media_i, m2_i, c: média e soma dos quadrados do índice do ponto e
+    co-momento entre índice e valor (regressão linear)
+    """
+
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.media_i = 0.0
+        self.m2_i = 0.0
+        self.c = 0.0
+
+    def adicionar(self, x):
+        i = float(self.n)
+        self.n += 1
+        delta = x - self.media
+        delta_i = i - self.media_i
+        self.media += delta / self.n
+        self.media_i += delta_i / self.n
+        self.m2 += delta * (x - self.media)
+        self.m2_i += delta_i * (i - self.media_i)
+        self.c += delta_i * (x - self.media)
+        return
+
+    def desvio(self):
+        # desvio padrão experimental
+        if self.n < 2:
+            return float('nan')
+        return math.sqrt(self.m2 / (self.n - 1))
+
+    def erro_padrao(self):
+        # desvio padrão experimental da média
+        return self.desvio() / math.sqrt(self.n) if self.n >= 2 else float('nan')
+
+    def inclinacao(self):
+        # inclinação da reta ajustada (valor x índice) e a sua incerteza
+        if self.n < 3 or self.m2_i == 0:
+            return float('nan'), float('nan')
+        b = self.c / self.m2_i
+        residuos = max(self.m2 - b * self.c, 0.0)
+        return b, math.sqrt(residuos / (self.n - 2) / self.m2_i)
+#-------------------------------------------------------------------------------
+
+class ParadaSequencial(object):
+    """ Critério de parada das repetições de uma frequência
+    Atributos:
+    habilitada: se False, são coletados sempre 'maximo' pontos
+    incerteza_alvo: erro padrão alvo da média, em ppm
+    minimo, maximo: quantidades mínima e máxima de pontos aceitos
+    deriva: se True, aplica o teste de deriva
+    deriva_limite: limite de |b| / u(b) para considerar a deriva significativa
+    estatisticas: objeto Welford da frequência atual
+    motivo: motivo da parada (None enquanto as repetições continuam)
+    """
+
+    def __init__(self, habilitada=False, incerteza_alvo=0.5, minimo=4, maximo=20,
+                 deriva=True, deriva_limite=3):
+        self.habilitada = habilitada
+        self.incerteza_alvo = incerteza_alvo
+        self.minimo = max(int(minimo), 1)
+        self.maximo = max(int(maximo), self.minimo)
+        self.deriva = deriva
+        self.deriva_limite = deriva_limite
+        self.iniciar()
+
+    def iniciar(self):
+        # reinicia as estatísticas (nova frequência)
+        self.estatisticas = Welford()
+        self.motivo = None
+        return
+
+    def descrever(self):
+        # regra de parada em uso (cabeçalho do registro)
+        if not self.habilitada:
+            return 'repetições fixas ({:d})'.format(self.maximo)
+        regra = 'incerteza alvo {:g} ppm (mínimo {:d}, máximo {:d})'.format(self.incerteza_alvo, self.minimo,
+                                                                        self.maximo)
+        if self.deriva:
+            regra += ', teste de deriva (|b|/u(b) < {:g})'.format(self.deriva_limite)
+        return regra
+
+    def continuar(self):
+        return self.motivo is None
+
+    def deriva_significativa(self):
+        b, u_b = self.estatisticas.inclinacao()
+        if not (math.isfinite(b) and math.isfinite(u_b)):
+            return False
+        if u_b == 0:
+            return b != 0
+        return abs(b) / u_b >= self.deriva_limite
+
+    def adicionar(self, dif):
+        # acrescenta um ponto aceito e avalia o critério de parada
+        # retorna o motivo da parada (None se as repetições devem continuar)
+        self.estatisticas.adicionar(dif)
+        n = self.estatisticas.n
+        if self.habilitada and (n >= self.minimo):
+            if self.estatisticas.erro_padrao() <= self.incerteza_alvo:
+                if not (self.deriva and self.deriva_significativa()):
+                    self.motivo = 'incerteza alvo atingida'
+                    return self.motivo
+        if n >= self.maximo:
+            if not self.habilitada:
+                self.motivo = 'repetições configuradas'
+            elif self.deriva and self.deriva_significativa():
+                self.motivo = 'máximo de repetições (deriva significativa)'
+            else:
+                self.motivo = 'máximo de repetições'
+        return self.motivo
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função parada_config(config, repeticoes)
+# cria o objeto ParadaSequencial a partir da seção [Parada] do arquivo de
+# configuração. Sem a seção (ou com habilitar = false), são coletados sempre
+# 'repeticoes' pontos; com a parada habilitada, 'repeticoes' é o máximo
+# padrão
+def parada_config(config, repeticoes):
+    if not config.has_section('Parada'):
+        return ParadaSequencial(habilitada=False, minimo=1, maximo=repeticoes)
+    padrao = ParadaSequencial()
+    secao = config['Parada']
+    habilitada = secao.getboolean('habilitar', padrao.habilitada)
+    return ParadaSequencial(habilitada,
+                            secao.getfloat('incerteza_alvo', padrao.incerteza_alvo),
+                            secao.getint('minimo', padrao.minimo) if habilitada else 1,
+                            secao.getint('maximo', repeticoes) if habilitada else repeticoes,
+                            secao.getboolean('deriva', padrao.deriva),
+                            secao.getfloat('deriva_limite', padrao.deriva_limite))
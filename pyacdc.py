@@ -5,7 +5,7 @@
 # Autor:       Gean Marcos Geronymo
 #
 # Versão inicial:      10-Jun-2016
-# Última modificação:  25-Jul-2022
+# Última modificação:  16-Oct-2026
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
@@ -37,16 +37,49 @@
 versao = '0.5';
 #-------------------------------------------------------------------------------
 # Carregar módulos
-import pyvisa as visa
+# o pyVISA não é necessário com os instrumentos simulados
+try:
+    import pyvisa as visa
+except ImportError:
+    visa = None
 import datetime
 import configparser
-import time
 import numpy
 import datetime
-import csv
-# condicoes ambientais - bme280
-import smbus2
-import bme280
+# condicoes ambientais - bme280 (amostragem em segundo plano)
+import ambiente
+# detecção adaptativa da estabilização
+import estabilizacao
+# aquisição pareada padrão / objeto
+import aquisicao
+# drivers dos medidores
+import medidores
+# cache do estado das fontes e da chave
+import estado
+# instrumentos simulados
+import simulador
+# relógio (real ou virtual)
+import relogio
+# escrita do registro de medição
+import registro_csv
+# diário da medição (retomada de uma varredura interrompida)
+import diario_medicao
+# exportação dos resultados em arquivo binário (NPZ)
+import exportacao
+# banco de dados dos resultados (SQLite)
+import resultados
+# cache do n ao longo da varredura em frequência
+import cache_n
+# equilíbrio AC a partir do n do objeto
+import equilibrio_n
+# critério de parada sequencial das repetições
+import parada
+# controle do balanço DC entre os ciclos
+import balanco
+# motor de medição assíncrono (sobreposição de comandos, esperas e leituras)
+import motor
+# sequências de medição declaradas na configuração
+import sequencia
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
@@ -55,6 +88,8 @@ import bme280
 reset = chr(2)
 ac = chr(4)
 dc = chr(6)
+# comando da chave de cada posição das etapas da sequência
+posicoes = {'AC': ac, 'DC': dc}
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
@@ -65,11 +100,27 @@ config = configparser.ConfigParser() # iniciar o objeto config
 config.read('config.ini') # ler o arquivo de configuracao
 wait_time = int(config['Measurement Config']['wait_time']); # tempo de espera
 heating_time = int(config['Measurement Config']['aquecimento']); # tempo de aquecimento
-rm = visa.ResourceManager('@py')
+# instrumentos simulados ([Simulacao] habilitar = true) ou barramento GPIB
+rm = simulador.simulador_config(config)
+if rm is None:
+    rm = visa.ResourceManager('@py')
 repeticoes = int(config['Measurement Config']['repeticoes']); # quantidade de repetições
 vac_nominal = float(config['Measurement Config']['voltage']); # Tensão nominal AC
 vdc_nominal = float(config['Measurement Config']['voltage']); # Tensão nominal DC
 freq_array = config['Measurement Config']['frequency'].split(',') # Array com as frequências
+estab = estabilizacao.estabilizacao_config(config) # detecção da estabilização
+aquec = estabilizacao.aquecimento_config(config) # término do aquecimento por deriva
+aquis = aquisicao.aquisicao_config(config) # aquisição pareada
+banco = resultados.resultados_config(config) # banco de dados dos resultados
+cache = cache_n.cache_n_config(config, banco) # cache do n (persistido no banco)
+equil = equilibrio_n.equilibrio_n_config(config) # equilíbrio a partir do n
+parar = parada.parada_config(config, repeticoes) # critério de parada das repetições
+controle = balanco.balanco_config(config) # controle do balanço DC
+motor_med = motor.motor_config(config) # motor de medição assíncrono
+plano = sequencia.sequencia_config(config, motor_med.guarda) # sequência do ciclo de medição
+referencia = sequencia.referencia_config(config) # frequência de referência (etapas ACR)
+antecipar = config.getboolean('Sequencia', 'antecipar', fallback=True) # preparação do próximo ponto
+vac_inicio = vac_nominal # tensão AC inicial do ponto atual (equilíbrio do banco ou nominal)
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
@@ -77,30 +128,50 @@ freq_array = config['Measurement Config']['frequency'].split(',') # Array com as
 #-------------------------------------------------------------------------------
 # função espera(segundos)
 # aceita como parâmetro o tempo de espera, em segundos
-# hack para poder interromper o programa a qualquer momento
-# no Windows XP, a função time.sleep não pode ser interrompida por uma
-# interrupção de teclado. A função quebra a chamada dessa função em várias
-# chamadas de 0,1 segundo.
+# espera com prazo no relógio monotônico (relogio.esperar): o tempo é exato
+# e a espera pode ser interrompida a qualquer momento pelo teclado (Ctrl-C)
 def espera(segundos):
-    for i in range(int(segundos * 10)):
-        time.sleep(0.1)    
+    relogio.esperar(segundos)
     return
 #-------------------------------------------------------------------------------
 # inicializar bme280
+# a amostragem é feita em segundo plano ([Ambiente] no arquivo de
+# configuração); sem o smbus2, as condições ambientais são simuladas apenas
+# com os instrumentos simulados (numa medição real, ficam indisponíveis)
 def bme280_init():
-    global port;
-    port = 1;
-    global address;
-    address = 0x76;
-    global bus;
-    bus = smbus2.SMBus(port);
-    global calibration_params;
-    calibration_params = bme280.load_calibration_params(bus, address)
-
+    global amostrador;
+    amostrador = ambiente.ambiente_config(config)
+    amostrador.iniciar()
     return
 
-def bme280_read():
-    return bme280.sample(bus, address, calibration_params)
+# condições ambientais do ciclo: média, mínimo (ca_data.minimo) e máximo
+# (ca_data.maximo) das amostras desde o instante inicio (relogio.tempo())
+def bme280_read(inicio):
+    return amostrador.resumo(inicio, relogio.tempo())
+#-------------------------------------------------------------------------------
+# função estabilizar(tempo_max)
+# aguarda a estabilização das saídas do padrão e do objeto na etapa atual,
+# monitorando as leituras dos medidores. O parâmetro tempo_max (wait_time) é
+# o limite superior da espera.
+# funcao_espera - função de espera (no motor assíncrono, motor_med.espera)
+# retorna o tempo de estabilização, em segundos
+def estabilizar(tempo_max, funcao_espera=espera):
+    def ler():
+        par = ler_par()
+        return [medidor_std.converter(par['std']), medidor_dut.converter(par['dut'])]
+    resultado = estab.aguardar(tempo_max, ler, funcao_espera)
+    if resultado['estavel']:
+        print("Estabilizado em {:5.1f} s".format(resultado['tempo']))
+    return resultado['tempo']
+
+# função esperar_etapa(plano_etapa, tempo_max, funcao_espera)
+# espera de uma etapa do plano: estabilização (estabilizar()) ou espera fixa
+# de tempo_max (medição do n); retorna o tempo da etapa, em segundos
+def esperar_etapa(plano_etapa, tempo_max, funcao_espera=espera):
+    if plano_etapa.estabilizar:
+        return estabilizar(tempo_max, funcao_espera)
+    funcao_espera(tempo_max)
+    return tempo_max
 
 # função instrument_init()
 # inicializa a comunicação com os instrumentos, via GPIB
@@ -111,133 +182,48 @@ def instrument_init():
     global std;
     global dut;
     global sw;
+    global medidor_std;
+    global medidor_dut;
     # Inicialização dos intrumentos conectados ao barramento GPIB
     print("Comunicando com fonte AC no endereço "+config['GPIB']['ac_source']+"...");
-    ac_source = rm.open_resource("GPIB0::"+config['GPIB']['ac_source']+"::INSTR");
+    ac_source = estado.EstadoFonte(rm.open_resource("GPIB0::"+config['GPIB']['ac_source']+"::INSTR"));
     print(ac_source.query("*IDN?"));
     print("OK!\n");
 
     print("Comunicando com fonte DC no endereço "+config['GPIB']['dc_source']+"...");
-    dc_source = rm.open_resource("GPIB0::"+config['GPIB']['dc_source']+"::INSTR");
+    dc_source = estado.EstadoFonte(rm.open_resource("GPIB0::"+config['GPIB']['dc_source']+"::INSTR"));
     print(dc_source.query("*IDN?"));
     print("OK!\n");
 
     print("Comunicando com o medidor do padrão no endereço "+config['GPIB']['std']+"...");
     std = rm.open_resource("GPIB0::"+config['GPIB']['std']+"::INSTR");
-    
-    if config['Instruments']['std'] == '3458A':
-        std.write("OFORMAT ASCII")
-        std.write("END ALWAYS")
-        std.write("NPLC 8")
-        print(std.query("ID?"))
-        print("OK!\n");
-    elif config['Instruments']['std'] == '182A':
-        # query dividida para evitar timeout
-        # R0 = enable autorange
-        # I0 = disable buffer
-        # B1 = 6 1/2 digit resolution
-        # S2 = periodo de integracao: 100 ms
-        # N1 = filters on
-        # O1 = analog filter on
-        # P2 = digital filter medium response
-        std.write("X")
-        #std.write("R0I0B1S2N1O1P2X")
-        std.write("R0I0B1X")
-        #std.write("S2N1X")
-        std.write("O1P2X")
-        print("Keithley 182A...\n")
-        print("OK!\n");
-    elif config['Instruments']['std'] == '53132A':
-        print(std.query("*IDN?"));
-        counter_init(std);
-        print("OK!\n");
-    elif config['Instruments']['std'] == '2182A':
-        std.write("SENS:CHAN 1")
-        std.write(":SENS:VOLT:CHAN1:RANG:AUTO ON")
-        std.write(":SENS:VOLT:NPLC 18")
-        std.write(":SENS:VOLT:DIG 8")
-        print(std.query("*IDN?"));
-        print("OK!\n");
-    else:
-        print(std.query("*IDN?"));
-        print("OK!\n");
+    medidor_std = medidores.criar_driver(config['Instruments']['std'], std);
+    print(medidor_std.inicializar());
+    print("OK!\n");
 
     print("Comunicando com o medidor do objeto no endereço "+config['GPIB']['dut']+"...");
     dut = rm.open_resource("GPIB0::"+config['GPIB']['dut']+"::INSTR");
-
-    if config['Instruments']['dut'] == '3458A':
-        dut.write("OFORMAT ASCII")
-        dut.write("END ALWAYS")
-        dut.write("NPLC 8")
-        print(dut.query("ID?"))
-        print("OK!\n");
-    elif config['Instruments']['dut'] == '182A':
-        dut.write("X")
-        dut.write("R0I0B1X")
-        #dut.write("S2N1X")
-        dut.write("O1P2X")
-        print("Keithley 182A...\n")
-        print("OK!\n");
-    elif config['Instruments']['dut'] == '53132A':
-        print(dut.query("*IDN?"));
-        counter_init(dut);
-        print("OK!\n");
-    elif config['Instruments']['dut'] == '2182A':
-        dut.write("SENS:CHAN 1")
-        dut.write(":SENS:VOLT:CHAN1:RANG:AUTO ON")
-        dut.write(":SENS:VOLT:NPLC 18")
-        dut.write(":SENS:VOLT:DIG 8")
-        print(dut.query("*IDN?"));
-        print("OK!\n");
-    else:
-        print(dut.query("*IDN?"));
-        print("OK!\n");
+    medidor_dut = medidores.criar_driver(config['Instruments']['dut'], dut);
+    print(medidor_dut.inicializar());
+    print("OK!\n");
 
     print("Comunicando com a chave no endereço "+config['GPIB']['sw']+"...");
-    sw = rm.open_resource("GPIB0::"+config['GPIB']['sw']+"::INSTR");
+    sw = estado.EstadoChave(rm.open_resource("GPIB0::"+config['GPIB']['sw']+"::INSTR"), reset);
     sw.write_raw(reset);
     print("OK!\n");
 
-    return
-#-------------------------------------------------------------------------------
-# funcao counter_init()
-# envia os comandos para inicializar o contador Agilent 53132A
-def counter_init(instrumento):
-    instrumento.write("*RST")
-    instrumento.write("*CLS")
-    instrumento.write("*SRE 0")
-    instrumento.write("*ESE 0")
-    instrumento.write(":STAT:PRES")
-    # comandos para throughput máximo
-    instrumento.write(":FORMAT ASCII")
-    instrumento.write(":FUNC 'FREQ 1'")
-    instrumento.write(":EVENT1:LEVEL 0")
-    # configura o gate size (1 s)
-    instrumento.write(":FREQ:ARM:STAR:SOUR IMM")
-    instrumento.write(":FREQ:ARM:STOP:SOUR TIM")
-    instrumento.write(":FREQ:ARM:STOP:TIM 1")
-    # configura para utilizar oscilador interno
-    instrumento.write(":ROSC:SOUR INT")
-    # desativa interpolador automatico
-    instrumento.write(":DIAG:CAL:INT:AUTO OFF")
-    # desativa todo o pós-processamento
-    instrumento.write(":CALC:MATH:STATE OFF")
-    instrumento.write(":CALC2:LIM:STATE OFF")
-    instrumento.write(":CALC3:AVER:STATE OFF")
-    instrumento.write(":HCOPY:CONT OFF")
-    instrumento.write("*DDT #15FETC?")
-    instrumento.write(":INIT:CONT ON")
+    # instrumentos como recursos do motor assíncrono
+    if motor_med.habilitado:
+        motor_med.instrumentos(fonte_ac=ac_source, fonte_dc=dc_source, chave=sw, std=medidor_std, dut=medidor_dut)
     return
 #-------------------------------------------------------------------------------
 # função meas_init()
 # inicializa os instrumentos, coloca as fontes em OPERATE, etc.
 def meas_init():
     # configuração da fonte AC
-    ac_source.write("OUT +{:.6f} V".format(vac_nominal));
-    ac_source.write("OUT 1000 HZ");
+    ac_source.saida(vac_nominal, 1000);
     # configuração da fonte DC
-    dc_source.write("OUT +{:.6f} V".format(vdc_nominal));
-    dc_source.write("OUT 0 HZ");
+    dc_source.saida(vdc_nominal, 0);
     # AC-AC
     #dc_source.write("OUT 1000 HZ");
     # Entrar em OPERATE
@@ -255,70 +241,62 @@ def meas_init():
 # retorna uma leitura single-shot da saída do TC padrão
 # não aceita parâmetros de entrada
 def ler_std():
-    if config['Instruments']['std'] == '182A':
-        x = std.query("X")
-    elif config['Instruments']['std'] == '2182A':
-        x = std.query(":FETCH?")
-    elif config['Instruments']['std'] == '53132A':
-        x = std.query(":FETCH:FREQ?")
-    elif config['Instruments']['std'] == '3458A':
-        x = std.query("OHM 100E3")
-    return x
+    return medidor_std.ler()
 #-------------------------------------------------------------------------------
 # função ler_std()
 # retorna uma leitura single-shot da saída do TC objeto
 # não aceita parâmetros de entrada
 def ler_dut():
-    if config['Instruments']['dut'] == '182A':
-        x = dut.query("X")
-    elif config['Instruments']['dut'] == '2182A':
-        x = dut.query(":FETCH?")
-    elif config['Instruments']['dut'] == '53132A':
-        x = dut.query(":FETCH:FREQ?")
-    elif config['Instruments']['dut'] == '3458A':
-        x = dut.query("OHM 100E3")
-    return x
+    return medidor_dut.ler()
+#-------------------------------------------------------------------------------
+# função ler_par()
+# retorna uma leitura pareada do padrão e do objeto: os dois medidores são
+# disparados juntos e as respostas buscadas em paralelo.
+# retorna {'std', 'dut', 't_std', 't_dut'} (leituras e instantes de disparo)
+def ler_par():
+    return aquis.ler(medidor_std, medidor_dut)
+#-------------------------------------------------------------------------------
+# função ler_ciclo()
+# retorna a leitura pareada de uma etapa do ciclo de medição. Se configurada
+# a aquisição em rajada ([Aquisicao] amostras > 1), cada leitura é a média das
+# leituras armazenadas no buffer do medidor, acompanhada da incerteza padrão
+# da média ('std_u' e 'dut_u').
+def ler_ciclo():
+    return aquis.ler_etapa(medidor_std, medidor_dut)
 #-------------------------------------------------------------------------------
 # função ler_std()
 # aceita como parâmetro o vetor com as leituras do padrão
 # escreve na tela a última leitura da saída do TC padrão
 def print_std(std_readings):
-    if config['Instruments']['std'] == '182A':
-        print("STD [mV] {:5.6f}".format(float(std_readings[-1].replace('NDCV','').strip())*1000)) 
-    elif config['Instruments']['std'] == '2182A':
-        print("STD [mV] {:5.6f}".format(float(std_readings[-1].strip())*1000))
-    elif config['Instruments']['std'] == '53132A':
-        print("STD [Hz] {:5.8f}".format(float(std_readings[-1].strip())))
-    elif config['Instruments']['std'] == '3458A':
-        print("STD [ohms] {:5.8f}".format(float(std_readings[-1].strip())))
+    print("STD ["+medidor_std.unidade+"] "+medidor_std.exibir(std_readings[-1]))
     return
 #-------------------------------------------------------------------------------
 # função ler_std()
 # aceita como parâmetro o vetor com as leituras do objeto
 # escreve na tela a última leitura da saída do TC objeto
 def print_dut(dut_readings):
-    if config['Instruments']['dut'] == '182A':
-        print("DUT [mV] {:5.6f}".format(float(dut_readings[-1].replace('NDCV','').strip())*1000)) 
-    elif config['Instruments']['dut'] == '2182A':
-        print("DUT [mV] {:5.6f}".format(float(dut_readings[-1].strip())*1000))
-    elif config['Instruments']['dut'] == '53132A':
-        print("DUT [Hz] {:5.8f}".format(float(dut_readings[-1].strip())))
-    elif config['Instruments']['dut'] == '3458A':
-        print("DUT [ohms] {:5.8f}".format(float(dut_readings[-1].strip())))
+    print("DUT ["+medidor_dut.unidade+"] "+medidor_dut.exibir(dut_readings[-1]))
     return
 #-------------------------------------------------------------------------------
 # função aquecimento()
 # aceita como parâmetro o tempo de aquecimento, em segundos
+# retorna o tempo de aquecimento efetivo e se o término por deriva foi
+# detectado; a curva de deriva fica em aquec.curva
 def aquecimento(tempo):
-    # executa o aquecimento, mantendo a tensão nominal aplicada pelo tempo
-    # (em segundos) definido na variavel "tempo"
-    dc_source.write("OUT +{:.6f} V".format(vdc_nominal));
-    dc_source.write("OUT 0 HZ");
+    # executa o aquecimento, mantendo a tensão nominal aplicada até que a
+    # deriva das saídas de padrão e objeto fique abaixo do limite, limitado
+    # ao tempo (em segundos) definido na variavel "tempo"
+    dc_source.saida(vdc_nominal, 0);
     # AC-AC
     #dc_source.write("OUT 1000 HZ");
     sw.write_raw(dc);
-    espera(tempo);
-    return
+    def ler():
+        par = ler_par()
+        return [medidor_std.converter(par['std']), medidor_dut.converter(par['dut'])]
+    resultado = aquec.aguardar(tempo, ler, espera)
+    if resultado['estavel']:
+        print("Aquecimento concluído por deriva em {:5.0f} s".format(resultado['tempo']))
+    return resultado
 #-------------------------------------------------------------------------------
 # função n_measure()
 # aceita o número de repetições como parâmetro de entrada
@@ -328,82 +306,29 @@ def aquecimento(tempo):
 # o algoritmo consiste em aplicar a tensão nominal, a tensão nominal + 1% e
 # a tensão nominal -1%, registrando os respectivos valores de saída de padrão
 # e objeto
+# a sequência pode ser definida em [Sequencia] n (p. ex. 'n_invertida')
 def n_measure(M):
-    # testa se M é par, se não for, soma 1 para se tornar par
-    if int(M) % 2 != 0:
-        M += 1;
-    # define as variáveis que armazenam as leituras do padrão e do objeto
-    std_readings = []
-    dut_readings = []
+    # sequência DC da medição do n ([Sequencia] n ou sequencia.sequencia_n(M))
+    plano_n = sequencia.sequencia_n_config(config, M, motor_med.guarda)
+    # aplica o valor nominal de tensão e as tensões de cada etapa, com a chave
+    # em DC; as mudanças da fonte DC são feitas com a chave em AC
+    readings = executar_plano(plano_n, {'fonte_ac':vac_inicio, 'fonte_dc':vdc_nominal})
+    std_readings = readings['std_readings']
+    dut_readings = readings['dut_readings']
     # variavel da constante V0 / (Vi-V0)
-    k = []
-    # aplica o valor nominal de tensão
-    ac_source.write("OUT {:.6f} V".format(vac_nominal));
-    ac_source.write("OUT "+str(freq)+" HZ");
-    dc_source.write("OUT +{:.6f} V".format(vdc_nominal));
-    espera(2); # espera 2 segundos
-    sw.write_raw(dc);
-    print("Vdc nominal: +{:.6f} V".format(vdc_nominal))
-    # aguarda pelo tempo de espera configurado
-    espera(wait_time);
-    # lê as saídas de padrão e objeto, e armazena na variável std_readings e
-    # dut_readings
-    std_readings.append(ler_std())
-    dut_readings.append(ler_dut())
-    print_std(std_readings);
-    print_dut(dut_readings);
-
-    for i in range(1,M+1):
-        # determina se i é par ou ímpar
-        # se i é impar, v_i = 1,01*vdc_nominal
-        # se i é par, v_i = 0,99*vdc_nominal
-        if int(i) % 2 == 0:
-            Vi = 0.99*vdc_nominal;
-            k.append(-100);
-        else:
-            Vi = 1.01*vdc_nominal;
-            k.append(100);
-
-        sw.write_raw(ac);
-        espera(2); # esperar 2 segundos
-        dc_source.write("OUT +{:.6f} V".format(Vi));
-        espera(2); # esperar 2 segundos
-        sw.write_raw(dc);
-        print("Vdc nominal + 1%: +{:.6f} V".format(Vi));
-        # aguarda pelo tempo de espera configurado
-        espera(wait_time);
-        # lê as saídas de padrão e objeto, e armazena na variável std_readings e
-        # dut_readings
-        std_readings.append(ler_std())
-        dut_readings.append(ler_dut())
-        print_std(std_readings);
-        print_dut(dut_readings);
+    k = [etapa.constante_n() for etapa in plano_n.etapas[1:]]
 
     # cálculo do n
     sw.write_raw(ac); # mantém chave em ac durante cálculo
 
-    if config['Instruments']['std'] == '182A':
-        X0 = float(std_readings[0].replace('NDCV','').strip())
-    else:
-        X0 = float(std_readings[0].strip())
-
-    if config['Instruments']['dut'] == '182A':
-        Y0 = float(dut_readings[0].replace('NDCV','').strip())
-    else:
-        Y0 = float(dut_readings[0].strip())
+    X0 = medidor_std.converter(std_readings[0])
+    Y0 = medidor_dut.converter(dut_readings[0])
         
     del std_readings[0]
     del dut_readings[0]
 
-    if config['Instruments']['std'] == '182A':  
-        Xi = numpy.array([float(a.replace('NDCV','').strip()) for a in std_readings]);
-    else:
-        Xi = numpy.array([float(a.strip()) for a in std_readings]);
-
-    if config['Instruments']['dut'] == '182A':
-        Yi = numpy.array([float(a.replace('NDCV','').strip()) for a in dut_readings]);
-    else:
-        Yi = numpy.array([float(a.strip()) for a in dut_readings]);
+    Xi = medidor_std.converter_lote(std_readings);
+    Yi = medidor_dut.converter_lote(dut_readings);
 
     nX = (Xi/X0 - 1) * k;
     nY = (Yi/Y0 - 1) * k;
@@ -415,87 +340,188 @@ def n_measure(M):
     return {'results':results, 'Xi':Xi, 'X0':X0, 'Yi':Yi, 'Y0':Y0, 'k':k, 'nX':nX, 'nY':nY}
     
 #-------------------------------------------------------------------------------
+# função par_conversores()
+# identifica o par de conversores (identificação dos conversores em
+# [Conversores], medidores e endereços) no cache do n
+def par_conversores():
+    return (banco.padrao+'|'+config['Instruments']['std']+'@'+config['GPIB']['std']+'/'+
+            banco.objeto+'|'+config['Instruments']['dut']+'@'+config['GPIB']['dut'])
+#-------------------------------------------------------------------------------
+# função obter_n(M)
+# retorna o n do cache, se válido; caso contrário, executa n_measure(M) e
+# guarda o resultado. O dicionário retornado inclui a origem do n ('medido'
+# ou 'cache') e o horário da medição ('horario').
+def obter_n(M):
+    entrada = cache.obter(vdc_nominal, par_conversores())
+    if entrada is None:
+        entrada = cache.guardar(vdc_nominal, par_conversores(), n_measure(M))
+        origem = 'medido'
+    else:
+        origem = 'cache'
+    n_array = dict(entrada['dados'])
+    n_array['origem'] = origem
+    n_array['horario'] = entrada['horario']
+    return n_array
+#-------------------------------------------------------------------------------
+# função print_n(n_array)
+# escreve na tela os valores de n do padrão e do objeto e a sua origem
+def print_n(n_array):
+    n_value = n_array['results'];
+    if n_array['origem'] == 'cache':
+        print("N do cache, medido em "+datetime.datetime.strftime(n_array['horario'], '%d/%m/%Y %H:%M:%S'))
+    print("N STD (média): {:5.2f}".format(n_value[0]))
+    print("N STD (desvio padrão): {:5.2f}".format(n_value[1]))
+    print("N DUT (média): {:5.2f}".format(n_value[2]))
+    print("N DUT (desvio padrão): {:5.2f}".format(n_value[3]))
+    return
+#-------------------------------------------------------------------------------
+# função ler_etapa(readings, tempo, par)
+# lê as saídas do padrão e do objeto ao final de uma etapa do ciclo de medição
+# e acrescenta ao dicionário readings as leituras, as incertezas padrão das
+# médias, o tempo de estabilização da etapa e os instantes de disparo
+# par - leitura já obtida (motor assíncrono); se None, a leitura é feita
+def ler_etapa(readings, tempo, par=None):
+    if par is None:
+        par = ler_ciclo()
+    readings['std_readings'].append(par['std'])
+    readings['dut_readings'].append(par['dut'])
+    readings['std_u'].append(par['std_u'])
+    readings['dut_u'].append(par['dut_u'])
+    readings['tempos'].append(tempo)
+    readings['instantes'].append([par['t_std'], par['t_dut']])
+    print_std(readings['std_readings']);
+    print_dut(readings['dut_readings']);
+    return
+#-------------------------------------------------------------------------------
+# função fonte(nome)
+# objeto da fonte ('fonte_ac' ou 'fonte_dc') de uma etapa da sequência
+def fonte(nome):
+    return ac_source if nome == 'fonte_ac' else dc_source
+#-------------------------------------------------------------------------------
+# função comando_fonte(nome, etapa, tensoes)
+# comando da fonte na condição da etapa: (nome, função, tensão, frequência)
+# tensoes - dicionário fonte -> tensão nominal atual ('fonte_ac': vac_atual,
+# 'fonte_dc': vdc_atual)
+def comando_fonte(nome, etapa, tensoes):
+    tensao, frequencia = etapa.ajuste(tensoes[nome], freq, referencia)
+    return (nome, fonte(nome).saida, tensao, frequencia)
+#-------------------------------------------------------------------------------
+# função programar(nome, etapa, tensoes)
+# programa a fonte na condição da etapa (somente o que mudou é enviado)
+def programar(nome, etapa, tensoes):
+    _, saida, tensao, frequencia = comando_fonte(nome, etapa, tensoes)
+    saida(tensao, frequencia)
+    return
+#-------------------------------------------------------------------------------
+# função executar_plano(plano_ciclo, tensoes, anterior)
+# executa um ciclo do plano de medição (sequencia.Plano)
+# aceita como parâmetros de entrada:
+# plano_ciclo - plano compilado da sequência ([Sequencia] no arquivo de
+#               configuração; padrão: AC, +DC, AC, -DC e AC)
+# tensoes - dicionário fonte -> tensão nominal atual
+# anterior - leituras da última etapa do ciclo anterior; se informado (plano
+#            com reaproveitamento), a primeira etapa aproveita as leituras
+# As fontes são programadas no início do ciclo, seguidas da guarda. As
+# mudanças antecipadas pelo plano são feitas durante a etapa anterior, após a
+# guarda da comutação da chave (a chave isola a fonte); as demais, num
+# transitório com a chave na outra posição. O tempo de estabilização de cada
+# etapa é retornado em 'tempos'.
+def executar_plano(plano_ciclo, tensoes, anterior=None):
+    primeiro = not anterior
+    guarda = plano_ciclo.guarda
+    # inicializa arrays de resultados
+    readings = {'std_readings':[], 'dut_readings':[], 'std_u':[], 'dut_u':[], 'tempos':[], 'instantes':[]}
+    # configuração das fontes AC e DC
+    for nome, etapa in plano_ciclo.programacao_inicial(primeiro):
+        programar(nome, etapa, tensoes)
+    # Iniciar medição
+    espera(guarda);
+    if not primeiro:
+        # aproveitar as medições do ciclo anterior
+        print("Ciclo "+plano_ciclo.etapas[0].rotulo())
+        for chave in readings:
+            readings[chave].append(anterior[chave])
+        print_std(readings['std_readings']);
+        print_dut(readings['dut_readings']);
+    for passo in plano_ciclo.passos(primeiro):
+        etapa = passo.etapa
+        if passo.transitorio:
+            # a fonte da etapa muda com a chave na outra posição
+            sw.write_raw(dc if etapa.posicao == 'AC' else ac);
+            espera(guarda);
+            programar(etapa.fonte, etapa, tensoes)
+            espera(guarda);
+        sw.write_raw(posicoes[etapa.posicao]);
+        print("Ciclo "+etapa.rotulo())
+        if passo.antecipados:
+            # fontes isoladas pela chave programadas para as etapas seguintes
+            espera(guarda);
+            for nome, indice in passo.antecipados:
+                programar(nome, plano_ciclo.etapas[indice], tensoes)
+            tempo = guarda + esperar_etapa(plano_ciclo, wait_time - guarda)
+        else:
+            tempo = esperar_etapa(plano_ciclo, wait_time)
+        ler_etapa(readings, tempo);
+    # retorna as leituras obtidas para o objeto e para o padrão, as incertezas
+    # das leituras, os tempos de estabilização e os instantes de disparo
+    return readings
+#-------------------------------------------------------------------------------
+# função executar_plano_async(plano_ciclo, tensoes, anterior)
+# ciclo do plano de medição no motor assíncrono, com os mesmos parâmetros e
+# resultados de executar_plano()
+# No início do ciclo as fontes são programadas em paralelo (nos ciclos
+# seguintes, somente as que mudaram, por exemplo a tensão DC ajustada pelo
+# balanço) e a guarda é aguardada apenas se alguma fonte foi programada. As
+# mudanças antecipadas são executadas durante a estabilização da etapa. Os
+# tempos de estabilização são contados a partir da comutação da chave.
+async def executar_plano_async(plano_ciclo, tensoes, anterior=None):
+    primeiro = not anterior
+    readings = {'std_readings':[], 'dut_readings':[], 'std_u':[], 'dut_u':[], 'tempos':[], 'instantes':[]}
+    def esperar():
+        return esperar_etapa(plano_ciclo, wait_time, motor_med.espera)
+    def mudou(comando):
+        nome, _, tensao, frequencia = comando
+        return (fonte(nome).tensao, fonte(nome).frequencia) != (round(tensao, 6), frequencia)
+    inicio = [comando_fonte(nome, etapa, tensoes) for nome, etapa in plano_ciclo.programacao_inicial(primeiro)]
+    inicio = [comando for comando in inicio if primeiro or mudou(comando)]
+    if inicio:
+        await motor_med.paralelo(*[motor_med.comando(*comando) for comando in inicio])
+        await motor_med.aguardar(motor_med.guarda)
+    if not primeiro:
+        print("Ciclo "+plano_ciclo.etapas[0].rotulo())
+        for chave in readings:
+            readings[chave].append(anterior[chave])
+        print_std(readings['std_readings']);
+        print_dut(readings['dut_readings']);
+    for passo in plano_ciclo.passos(primeiro):
+        etapa = passo.etapa
+        if passo.transitorio:
+            await motor_med.comando('chave', sw.write_raw, dc if etapa.posicao == 'AC' else ac)
+            await motor_med.apos_guarda(comando_fonte(etapa.fonte, etapa, tensoes))
+            await motor_med.aguardar(motor_med.guarda)
+        print("Ciclo "+etapa.rotulo())
+        isoladas = [comando_fonte(nome, plano_ciclo.etapas[indice], tensoes) for nome, indice in passo.antecipados]
+        tempo, par = await motor_med.etapa(posicoes[etapa.posicao], esperar, ler_ciclo, isoladas)
+        ler_etapa(readings, tempo, par)
+    return readings
+#-------------------------------------------------------------------------------
 # função measure(vdc_atual, vac_atual, ciclo_ac)
-# Executa os ciclos de medição, na sequência AC, +DC, AC, -DC e AC.
+# Executa um ciclo de medição, na sequência de [Sequencia] (padrão: AC, +DC,
+# AC, -DC e AC)
 # aceita como parâmetros de entrada:
 # vdc_atual - valor atual da tensão DC
 # vac_atual - valor atual da tensão AC
-# ciclo_ac - valor das leituras do último ciclo AC da medida anterior
-# se não for a primeira medição, o primeiro ciclo AC aproveita as leituras do
-# último ciclo AC da medição anterior
+# ciclo_ac - valor das leituras da última etapa da medida anterior
+# se não for a primeira medição, a primeira etapa aproveita as leituras da
+# última etapa da medição anterior (sequências que iniciam e terminam na
+# mesma etapa)
+# Com o motor assíncrono ([Motor] habilitar = true), o ciclo é executado por
+# executar_plano_async().
 def measure(vdc_atual,vac_atual,ciclo_ac):
-    # inicializa arrays de resultados
-    std_readings = []
-    dut_readings = []
-    # configuração da fonte AC
-    ac_source.write("OUT {:.6f} V".format(vac_atual));
-    ac_source.write("OUT "+str(freq)+" HZ");
-    # configuração da fonte DC
-    dc_source.write("OUT +{:.6f} V".format(vdc_atual));
-    dc_source.write("OUT 0 HZ");
-    # ac-ac
-    #dc_source.write("OUT 1000 HZ");
-    # Iniciar medição
-    espera(2); # esperar 2 segundos
-    # Ciclo AC
-    # testa se existem dados do último ciclo AC da medição anterior
-    if (ciclo_ac == []):
-        # caso negativo, medir AC normalmente
-        sw.write_raw(ac);
-        print("Ciclo AC")
-        espera(wait_time);
-        # leituras
-        std_readings.append(ler_std())
-        dut_readings.append(ler_dut())
-        print_std(std_readings);
-        print_dut(dut_readings);
-    else:
-        # caso positivo, aproveitar as medições do ciclo anterior
-        print("Ciclo AC")
-        std_readings.append(ciclo_ac[0])
-        dut_readings.append(ciclo_ac[1])
-        print_std(std_readings);
-        print_dut(dut_readings);
-    # Ciclo DC
-    sw.write_raw(dc);
-    print("Ciclo +DC")
-    espera(wait_time);
-    std_readings.append(ler_std())
-    dut_readings.append(ler_dut())
-    print_std(std_readings);
-    print_dut(dut_readings);
-    # Ciclo AC
-    sw.write_raw(ac);
-    print("Ciclo AC")
-    espera(wait_time/2);
-    # Mudar fonte DC para -DC
-    dc_source.write("OUT -{:.6f} V".format(vdc_atual));
-    espera(wait_time/2);
-    std_readings.append(ler_std())
-    dut_readings.append(ler_dut())
-    print_std(std_readings);
-    print_dut(dut_readings);
-    # Ciclo -DC
-    sw.write_raw(dc);
-    print("Ciclo -DC")
-    espera(wait_time);
-    std_readings.append(ler_std())
-    dut_readings.append(ler_dut())
-    print_std(std_readings);
-    print_dut(dut_readings);
-    # Ciclo AC
-    sw.write_raw(ac);
-    print("Ciclo AC")
-    espera(wait_time/2);
-    # Mudar fonte DC para +DC
-    dc_source.write("OUT +{:.6f} V".format(vdc_atual));
-    espera(wait_time/2);
-    std_readings.append(ler_std())
-    dut_readings.append(ler_dut())
-    print_std(std_readings);
-    print_dut(dut_readings);
-    # retorna as leituras obtidas para o objeto e para o padrão
-    return {'std_readings':std_readings, 'dut_readings':dut_readings}
+    tensoes = {'fonte_ac':vac_atual, 'fonte_dc':vdc_atual}
+    if motor_med.habilitado:
+        return motor_med.rodar(executar_plano_async(plano, tensoes, ciclo_ac))
+    return executar_plano(plano, tensoes, ciclo_ac)
 #-------------------------------------------------------------------------------
 # função acdc_calc(readings,N,vdc_atual)
 # Calcula a diferença AC-DC a partir dos dados obtidos com a funcao measure()
@@ -509,45 +535,44 @@ def acdc_calc(readings,N,vdc_atual):
     n_X = N[0]; # n do padrão
     n_Y = N[2]; # n do objeto
     # extrai os dados de leituras do padrão
-    if config['Instruments']['std'] == '182A':
-        x = numpy.array([float(a.replace('NDCV','').strip()) for a in readings['std_readings']]);
-    else:
-        x = numpy.array([float(a.strip()) for a in readings['std_readings']]);
+    x = medidor_std.converter_lote(readings['std_readings']);
     # extrai os dados de leitura do objeto
-    if config['Instruments']['dut'] == '182A':
-        y = numpy.array([float(a.replace('NDCV','').strip()) for a in readings['dut_readings']])
-    else:
-        y = numpy.array([float(a.strip()) for a in readings['dut_readings']])
+    y = medidor_dut.converter_lote(readings['dut_readings'])
+    # etapas AC (grandeza em teste) e de referência (DC ou AC de referência)
+    i_ac = plano.indices_teste();
+    i_dc = plano.indices_referencia();
     # calcula Xac, Xdc, Yac e Ydc a partir das leituras brutas    
-    Xac = numpy.mean(numpy.array([x[0], x[2], x[4]]));     # AC médio padrão
-    Xdc = numpy.mean(numpy.array([x[1], x[3]]));           # DC médio padrão
-    Yac = numpy.mean(numpy.array([y[0], y[2], y[4]]));     # AC médio objeto
-    Ydc = numpy.mean(numpy.array([y[1], y[3]]));           # DC médio objeto
+    Xac = numpy.mean(numpy.array([x[i] for i in i_ac]));   # AC médio padrão
+    Xdc = numpy.mean(numpy.array([x[i] for i in i_dc]));   # DC médio padrão
+    Yac = numpy.mean(numpy.array([y[i] for i in i_ac]));   # AC médio objeto
+    Ydc = numpy.mean(numpy.array([y[i] for i in i_dc]));   # DC médio objeto
     # Variáveis auxiliares X e Y
     X = Xac/Xdc - 1;
     Y = Yac/Ydc - 1;
     # diferença AC-DC medida:
     delta_m = 1e6 * ((X/n_X - Y/n_Y)/(1 + Y/n_Y));
-    # critério para repetir a medição - diferença entre Yac e Ydc    
-    if config['Instruments']['dut'] == '53132A':
-        Delta = Yac - Ydc;
-    elif config['Instruments']['dut'] == '3458A':
-        Delta = Yac - Ydc;
-    else:
-        Delta = 1e6 * (Yac - Ydc);
-    # ajuste da tensão DC para o próximo ciclo
-    adj_dc = vdc_atual * (1 + (Yac - Ydc)/(n_Y * Ydc));
+    # incerteza padrão do ciclo, a partir das incertezas das médias de cada
+    # etapa (aquisição em rajada; nan para leituras single-shot)
+    u_dif = aquisicao.incerteza_ciclo(x, numpy.array(readings['std_u']), n_X, y, numpy.array(readings['dut_u']), n_Y, i_ac, i_dc);
+    # critério para repetir a medição - diferença entre Yac e Ydc (em ppm para
+    # medidores de tensão)
+    Delta = medidor_dut.escala_delta * (Yac - Ydc);
+    # ajuste da tensão DC para o próximo ciclo (controle do balanço)
+    adj_dc = controle.atualizar(vdc_atual, Yac, Ydc);
     # timestamp de cada medição
-    date = datetime.datetime.now();
+    date = relogio.agora();
     timestamp = datetime.datetime.strftime(date, '%d/%m/%Y %H:%M:%S');
     # retorna lista com os arrays de leitura do padrão, objeto, a diferença ac-dc,
-    # Delta=Yac-Ydc, o ajuste DC e o horário
-    return {'std_readings':x,'dut_readings':y,'dif':delta_m, 'Delta':Delta, 'adj_dc':adj_dc,'timestamp':timestamp}
+    # Delta=Yac-Ydc, o ajuste DC, o horário, os tempos de estabilização e a
+    # incerteza do ciclo
+    return {'std_readings':x,'dut_readings':y,'dif':delta_m, 'Delta':Delta, 'adj_dc':adj_dc,'timestamp':timestamp,'tempos':readings['tempos'],'u_dif':u_dif}
 #-------------------------------------------------------------------------------
 # função equilibrio()
 # Calcula a tensão de equilíbrio AC no início da sequência de medições
 # A função não aceita parâmetros de entrada
+# A leitura DC do objeto na tensão nominal fica em ydc_equilibrio
 def equilibrio():
+    global ydc_equilibrio;
     dut_readings = []
     ac_source.write("OUT "+str(freq)+" HZ");
     dc_source.write("OUT {:.6f} V".format(vdc_nominal));
@@ -581,17 +606,106 @@ def equilibrio():
     # cálculo do equilíbrio
     yp = [0.999*vac_nominal, 1.001*vac_nominal]
     
-    if config['Instruments']['dut'] == '182A':
-        xp = [float(dut_readings[1].replace('NDCV','').strip()), float(dut_readings[2].replace('NDCV','').strip())]
-        xi = float(dut_readings[0].replace('NDCV','').strip())
-    else:
-        xp = [float(dut_readings[1].strip()), float(dut_readings[2].strip())]
-        xi = float(dut_readings[0].strip())
+    xp = [medidor_dut.converter(dut_readings[1]), medidor_dut.converter(dut_readings[2])]
+    xi = medidor_dut.converter(dut_readings[0])
+    # leitura DC do objeto na tensão nominal (deriva em relação ao n do cache)
+    ydc_equilibrio = xi
     # calcula o valor de equilíbrio através de interpolação linear    
     new_ac = numpy.interp(xi,xp,yp);
     # retorna o novo valor de AC
     return new_ac
 #-------------------------------------------------------------------------------
+# função equilibrio_n(n_array)
+# Calcula a tensão de equilíbrio AC a partir do nY do objeto, com uma leitura
+# DC e uma leitura AC (e um passo de Newton, se a correção for grande)
+# Se o n acabou de ser medido, a leitura DC é a leitura Y0 de n_measure
+# A leitura DC do objeto na tensão nominal fica em ydc_equilibrio
+# A primeira leitura AC é feita em vac_inicio (último equilíbrio do banco de
+# dados, se houver), programada com antecedência por preparar_frequencia()
+def equilibrio_n(n_array):
+    global ydc_equilibrio;
+    nY = n_array['results'][2]
+    dut_readings = []
+    ac_source.saida(vac_inicio, freq);
+    dc_source.saida(vdc_nominal, 0);
+    if n_array['origem'] == 'medido':
+        ydc = n_array['Y0']
+        print("Vdc nominal: leitura Y0 da medição do N")
+    else:
+        sw.write_raw(dc);
+        print("Vdc nominal: +{:.6f} V".format(vdc_nominal))
+        espera(wait_time);
+        dut_readings.append(ler_dut())
+        print_dut(dut_readings);
+        ydc = medidor_dut.converter(dut_readings[-1])
+    ydc_equilibrio = ydc
+    # Aplica Vac inicial
+    vac = vac_inicio
+    print("Vac inicial: +{:.6f} V".format(vac))
+    sw.write_raw(ac);
+    espera(wait_time);
+    dut_readings.append(ler_dut())
+    print_dut(dut_readings);
+    new_ac = equil.tensao(vac, ydc, medidor_dut.converter(dut_readings[-1]), nY)
+    if equil.refinar(vac, new_ac):
+        # passo de Newton: aplica a tensão calculada e repete o cálculo
+        vac = new_ac
+        ac_source.saida(vac, freq);
+        print("Vac calculado: +{:.6f} V".format(vac))
+        espera(wait_time);
+        dut_readings.append(ler_dut())
+        print_dut(dut_readings);
+        new_ac = equil.tensao(vac, ydc, medidor_dut.converter(dut_readings[-1]), nY)
+    sw.write_raw(dc);
+    # retorna o novo valor de AC
+    return new_ac
+#-------------------------------------------------------------------------------
+# função calcular_equilibrio(n_array)
+# Calcula a tensão de equilíbrio AC a partir do n, se o nY do objeto for
+# confiável; caso contrário, pelo equilíbrio por interpolação
+# O método utilizado fica em metodo_equilibrio
+def calcular_equilibrio(n_array):
+    global metodo_equilibrio;
+    if equil.confiavel(n_array['results'][2], n_array['results'][3]):
+        metodo_equilibrio = 'n'
+        print("Equilíbrio a partir do N do objeto")
+        return equilibrio_n(n_array)
+    metodo_equilibrio = 'interpolação'
+    return equilibrio()
+#-------------------------------------------------------------------------------
+# função tensao_inicial(frequencia)
+# tensão AC inicial de uma frequência (texto em kHz, como em freq_array): o
+# último equilíbrio do par de conversores no banco de dados, se estiver
+# dentro de 10 % da tensão nominal; caso contrário, a tensão nominal
+def tensao_inicial(frequencia):
+    vac = banco.equilibrio(vdc_nominal, float(frequencia))
+    if (vac is None) or (abs(vac/vac_nominal - 1) > 0.1):
+        return vac_nominal
+    return vac
+#-------------------------------------------------------------------------------
+# função preparar_frequencia(frequencia)
+# antecipa a preparação da próxima frequência ao final da frequência atual,
+# após a última leitura AC: com a chave em AC, a fonte DC (isolada) volta à
+# tensão nominal; com a chave em DC, a fonte AC é programada na frequência e
+# na tensão inicial do próximo ponto, após a guarda. A estabilização da fonte
+# AC ocorre durante as etapas DC da medição do n e do equilíbrio, cujos
+# comandos de programação das fontes deixam de ser enviados (estado.py).
+def preparar_frequencia(frequencia):
+    if plano.etapas[-1].posicao == 'AC':
+        dc_source.saida(vdc_nominal, 0);
+        sw.write_raw(dc);
+        espera(plano.guarda);
+    ac_source.saida(tensao_inicial(frequencia), float(frequencia) * 1000);
+    return
+#-------------------------------------------------------------------------------
+# função proxima_frequencia(indice, retomada)
+# próxima frequência a medir após freq_array[indice] (None na última)
+def proxima_frequencia(indice, retomada):
+    for value in freq_array[indice+1:]:
+        if (retomada is None) or (value not in retomada.concluidas):
+            return value
+    return None
+#-------------------------------------------------------------------------------
 # função stop_instruments()
 # função chamada para interromper a medição
 # não aceita parâmetros de entrada
@@ -606,130 +720,274 @@ def stop_instruments():
 # função criar_registro()
 # Cria um novo registro de medição
 # Não aceita parâmetros de entrada
+# Retorna o objeto registro_csv.Registro (arquivo aberto durante a medição)
 def criar_registro():
-    date = datetime.datetime.now();
+    date = relogio.agora();
     timestamp_file = datetime.datetime.strftime(date, '%d-%m-%Y_%Hh%Mm');
     timestamp_registro = datetime.datetime.strftime(date, '%d/%m/%Y %H:%M:%S');
     # o nome do registro é criado de forma automática, a partir da data e hora atuais
     registro_filename = "registro_"+timestamp_file+".csv"
-    with open(registro_filename,"w") as csvfile:
-        registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-        registro.writerow(['pyAC-DC '+versao]);
-        registro.writerow(['Registro de Medições']);
-        registro.writerow([' ']);
-        registro.writerow(['Início da medição',timestamp_registro]);
-        registro.writerow(['Tempo de aquecimento [s]',config['Measurement Config']['aquecimento']]);
-        registro.writerow(['Tempo de estabilização [s]',config['Measurement Config']['wait_time']]);
-        registro.writerow(['Repetições',config['Measurement Config']['repeticoes']]);
-        registro.writerow(['Observações',config['Misc']['observacoes']]);
-        registro.writerow([' ']);
-        registro.writerow([' ']);
-
-    csvfile.close();
-    return registro_filename
+    # o arquivo permanece aberto até o final da medição
+    registro = registro_csv.registro_config(config, registro_filename)
+    registro.writerow(['pyAC-DC '+versao]);
+    registro.writerow(['Registro de Medições']);
+    registro.writerow([' ']);
+    registro.writerow(['Início da medição',timestamp_registro]);
+    registro.writerow(['Tempo de aquecimento [s]',config['Measurement Config']['aquecimento']]);
+    registro.writerow(['Tempo de estabilização [s]',config['Measurement Config']['wait_time']]);
+    registro.writerow(['Repetições',parar.maximo]);
+    registro.writerow(['Regra de parada',parar.descrever()]);
+    registro.writerow(['Condições ambientais',amostrador.fonte.descricao]);
+    registro.writerow(['Observações',config['Misc']['observacoes']]);
+    registro.writerow([' ']);
+    registro.writerow([' ']);
+    return registro
+#-------------------------------------------------------------------------------
+# função criar_diario(registro_filename)
+# Cria o diário da medição (diario_*.jsonl, com a mesma data e hora do
+# registro) e escreve o plano da varredura
+# Retorna o objeto diario_medicao.Diario
+def criar_diario(registro_filename):
+    diario_filename = registro_filename.replace('registro_', 'diario_', 1).replace('.csv', '.jsonl')
+    diario = diario_medicao.diario_config(config, diario_filename)
+    diario.escrever('plano', versao=versao, inicio=relogio.agora(), registro=registro_filename,
+                    tensao=vdc_nominal, frequencias=freq_array, repeticoes=parar.maximo,
+                    parada=parar.descrever());
+    return diario
 #-------------------------------------------------------------------------------
-# função registro_frequencia(egistro_filename,frequencia,n_value,vac_equilibrio)
+# função retomar_registro(registro_filename)
+# Reabre o registro de uma medição interrompida (modo append) e marca a
+# retomada
+# Retorna o objeto registro_csv.Registro
+def retomar_registro(registro_filename):
+    timestamp_registro = datetime.datetime.strftime(relogio.agora(), '%d/%m/%Y %H:%M:%S');
+    registro = registro_csv.registro_config(config, registro_filename, "a")
+    registro.writerow([' ']);
+    registro.writerow(['Retomada da medição',timestamp_registro]);
+    registro.writerow(['Condições ambientais',amostrador.fonte.descricao]);
+    registro.writerow([' ']);
+    registro.writerow([' ']);
+    return registro
+#-------------------------------------------------------------------------------
+# função registro_aquecimento(registro,resultado)
+# escreve no registro o término do aquecimento e a curva de deriva
+# resultado - dicionário retornado pela função aquecimento()
+def registro_aquecimento(registro,resultado):
+    registro.writerow(['Aquecimento']);
+    registro.writerow(['Término do aquecimento','deriva abaixo do limite' if resultado['estavel'] else 'tempo configurado']);
+    registro.writerow(['Tempo de aquecimento efetivo [s]',resultado['tempo']]);
+    registro.writerow(['Deriva máxima [ppm/min]',aquec.deriva_max]);
+    registro.writerow(['Tempo [s]','STD','DUT','Deriva STD [ppm/min]','Deriva DUT [ppm/min]']);
+    for ponto in aquec.curva:
+        derivas = ponto['derivas'] if ponto['derivas'] is not None else ['','']
+        registro.writerow([ponto['tempo']] + ponto['leituras'] + derivas);
+    registro.writerow([' ']);
+    registro.writerow([' ']);
+    return
+#-------------------------------------------------------------------------------
+# função registro_frequencia(registro,frequencia,n_value,vac_equilibrio)
 # Inicia uma nova frequência no registro de medição
 # Aceita os parâmetros
-# registro_filename - o nome do registro criado com a função criar_registro()
+# registro - o registro criado com a função criar_registro()
 # frequencia - o valor da frequência que está sendo medida no momento;
 # n_value - os valores obtidos de n para padrão e objeto
 # vac_equilibrio - a tensão AC de equilíbrio calculada com a funcao equilibrio()
 # n_array:
-# {'results':results, 'Xi':Xi, 'X0':X0, 'Yi':Yi, 'Y0':Y0, 'k':k, 'nX':nX, 'nY':nY}
-def registro_frequencia(registro_filename,frequencia,n_array,vac_equilibrio):
-    with open(registro_filename,"a") as csvfile:
-        registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-        registro.writerow(['Tensão [V]',config['Measurement Config']['voltage'].replace('.',',')]);
-        registro.writerow(['Frequência [kHz]',frequencia.replace('.',',')]);
-        registro.writerow([' ']); # pular linha
-        registro.writerow(['X0',str(n_array['X0']).replace('.',',')]); # valor de X0
-        registro.writerow(['Xi'] + [str(i).replace('.',',') for i in n_array['Xi']]); # valores de Xi
-        registro.writerow(['k'] + [str(i).replace('.',',') for i in n_array['k']]); # valores de k
-        registro.writerow(['nX'] + [str(i).replace('.',',') for i in n_array['nX']]); # valores de nX
-        registro.writerow(['nX (média)',str(n_array['results'][0]).replace('.',',')]); # Valor médio de nX
-        registro.writerow(['nX (desvio padrão)',str(n_array['results'][1]).replace('.',',')]); # desvio padrão de nX
-        registro.writerow([' ']); # pular linha
-        registro.writerow(['Y0',str(n_array['Y0']).replace('.',',')]); # valor de X0
-        registro.writerow(['Yi'] + [str(i).replace('.',',') for i in n_array['Yi']]); # valores de Yi
-        registro.writerow(['k'] + [str(i).replace('.',',') for i in n_array['k']]); # valores de k
-        registro.writerow(['nY'] + [str(i).replace('.',',') for i in n_array['nY']]); # valores de nY
-        registro.writerow(['nY (média)',str(n_array['results'][2]).replace('.',',')]); # valor médio de nY
-        registro.writerow(['nY (desvio padrão)',str(n_array['results'][3]).replace('.',',')]); # desvio padrão de nY
-        registro.writerow([' ']); # pular linha
-        registro.writerow(['Vac equilíbrio [V]',str(vac_equilibrio).replace('.',',')]); # Vac calculado para o equilíbrio
-        registro.writerow([' ']); # pular linha
-        # cabeçalho da tabela de medicao
-        registro.writerow(['Data / hora','AC (STD)','AC (DUT)','DC+ (STD)','DC+ (DUT)','AC (STD)','AC (DUT)','DC- (STD)','DC- (DUT)','AC (STD)','AC (DUT)', 'Diferença', 'Delta', 'Tensão DC Aplicada','Temperatura [ºC]', 'Umidade Relativa [% u.r.]', 'Pressão Atmosférica [hPa]']);
-    csvfile.close();
+# {'results':results, 'Xi':Xi, 'X0':X0, 'Yi':Yi, 'Y0':Y0, 'k':k, 'nX':nX, 'nY':nY,
+#  'origem':origem, 'horario':horario}
+def registro_frequencia(registro,frequencia,n_array,vac_equilibrio):
+    registro.writerow(['Tensão [V]',registro_csv.decimal(config['Measurement Config']['voltage'])]);
+    registro.writerow(['Frequência [kHz]',registro_csv.decimal(frequencia)]);
+    registro.writerow([' ']); # pular linha
+    registro.writerow(['X0',n_array['X0']]); # valor de X0
+    registro.writerow(['Xi'] + list(n_array['Xi'])); # valores de Xi
+    registro.writerow(['k'] + list(n_array['k'])); # valores de k
+    registro.writerow(['nX'] + list(n_array['nX'])); # valores de nX
+    registro.writerow(['nX (média)',n_array['results'][0]]); # Valor médio de nX
+    registro.writerow(['nX (desvio padrão)',n_array['results'][1]]); # desvio padrão de nX
+    registro.writerow([' ']); # pular linha
+    registro.writerow(['Y0',n_array['Y0']]); # valor de X0
+    registro.writerow(['Yi'] + list(n_array['Yi'])); # valores de Yi
+    registro.writerow(['k'] + list(n_array['k'])); # valores de k
+    registro.writerow(['nY'] + list(n_array['nY'])); # valores de nY
+    registro.writerow(['nY (média)',n_array['results'][2]]); # valor médio de nY
+    registro.writerow(['nY (desvio padrão)',n_array['results'][3]]); # desvio padrão de nY
+    registro.writerow(['Origem do n',n_array['origem']]); # n medido nesta frequência ou do cache
+    registro.writerow(['n medido em',datetime.datetime.strftime(n_array['horario'], '%d/%m/%Y %H:%M:%S')]); # horário da medição do n
+    registro.writerow([' ']); # pular linha
+    registro.writerow(['Vac equilíbrio [V]',vac_equilibrio]); # Vac calculado para o equilíbrio
+    registro.writerow(['Método do equilíbrio',metodo_equilibrio]); # a partir do n ou por interpolação
+    registro.writerow([' ']); # pular linha
+    # cabeçalho da tabela de medicao
+    # (uma coluna de leituras e uma de estabilização por etapa da sequência)
+    colunas = [etapa.coluna() for etapa in plano.etapas]
+    registro.writerow(['Data / hora'] + [c+m for c in colunas for m in [' (STD)',' (DUT)']] + ['Diferença', 'Delta', 'Tensão DC Aplicada','Temperatura [ºC]', 'Umidade Relativa [% u.r.]', 'Pressão Atmosférica [hPa]'] + ['Estabilização '+c+' [s]' for c in colunas] + ['Incerteza do ciclo','Temperatura mín. [ºC]','Temperatura máx. [ºC]','Umidade Relativa mín. [% u.r.]','Umidade Relativa máx. [% u.r.]','Pressão Atmosférica mín. [hPa]','Pressão Atmosférica máx. [hPa]']);
     return
 #-------------------------------------------------------------------------------
-# função registro_linha(registro_filename,results,vdc_atual)
+# função registro_linha(registro,results,vdc_atual)
 # salva uma nova linha (medição individual) no registro de medição
 # parâmetros:
-# registro_filename - o nome do registro criado com a função criar_registro()
+# registro - o registro criado com a função criar_registro()
 # results - array com os resultados
 # vdc_atual - tensão DC calculada para a medição atual
-def registro_linha(registro_filename,results,vdc_atual,ca_data):
+# ca_data - condições ambientais do ciclo (média, mínimo e máximo)
+def registro_linha(registro,results,vdc_atual,ca_data):
     # results -> results['std_readings'], results['dut_readings'], results['dif'], results['Delta'], results['adj_dc'] e results['timestamp']
-    with open(registro_filename,"a") as csvfile:
-        registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-        registro.writerow([results['timestamp'],str(results['std_readings'][0]).replace('.',','),str(results['dut_readings'][0]).replace('.',','),str(results['std_readings'][1]).replace('.',','),str(results['dut_readings'][1]).replace('.',','),str(results['std_readings'][2]).replace('.',','),str(results['dut_readings'][2]).replace('.',','),str(results['std_readings'][3]).replace('.',','),str(results['dut_readings'][3]).replace('.',','),str(results['std_readings'][4]).replace('.',','),str(results['dut_readings'][4]).replace('.',','),str(results['dif']).replace('.',','),str(results['Delta']).replace('.',','),str(vdc_atual).replace('.',','),str(ca_data.temperature).replace('.',','),str(ca_data.humidity).replace('.',','),str(ca_data.pressure).replace('.',',')]);
-
-    csvfile.close();
+    leituras = [v for par in zip(results['std_readings'],results['dut_readings']) for v in par]
+    registro.writerow([results['timestamp']] + leituras + [results['dif'],results['Delta'],vdc_atual,ca_data.temperature,ca_data.humidity,ca_data.pressure] + [round(t,1) for t in results['tempos']] + [results['u_dif']] + [ca_data.minimo.temperature, ca_data.maximo.temperature, ca_data.minimo.humidity, ca_data.maximo.humidity, ca_data.minimo.pressure, ca_data.maximo.pressure]);
     return
 #-------------------------------------------------------------------------------
-# função registro_media(registro_filename,diferenca):
+# função registro_media(registro,diferenca):
 # finaliza o registro de medição para cada frequência, escrevendo a média
 # e desvio padrão obtidos.
 # Aceita os parâmetros:
-# registro_filename - o nome do registro criado com a função criar_registro()
+# registro - o registro criado com a função criar_registro()
 # diferenca - array com a média e o desvio padrão calculados
-def registro_media(registro_filename,diferenca):
-    with open(registro_filename,"a") as csvfile:
-        registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-        registro.writerow([' ']);
-        registro.writerow(['Média',str(numpy.mean(diferenca)).replace('.',',')]);
-        registro.writerow(['Desvio-padrão',str(numpy.std(diferenca, ddof=1)).replace('.',',')]);
-        registro.writerow([' ']);
-        registro.writerow([' ']);
-    csvfile.close();
+# O erro padrão da média e o motivo da parada das repetições são obtidos do
+# objeto parar (parada.ParadaSequencial), a taxa de descarte do objeto
+# controle (balanco.ControleDC) e as falhas de leitura das condições
+# ambientais (acumuladas desde o início) do amostrador
+def registro_media(registro,diferenca):
+    registro.writerow([' ']);
+    registro.writerow(['Média',numpy.mean(diferenca)]);
+    registro.writerow(['Desvio-padrão',numpy.std(diferenca, ddof=1)]);
+    registro.writerow(['Desvio-padrão da média',parar.estatisticas.erro_padrao()]);
+    registro.writerow(['Pontos aceitos',parar.estatisticas.n]);
+    registro.writerow(['Critério de parada',parar.motivo]);
+    registro.writerow(['Ciclos descartados',controle.descartados]);
+    registro.writerow(['Taxa de descarte [%]',controle.taxa_descarte()]);
+    registro.writerow(['Falhas do sensor ambiental',amostrador.falhas]);
+    registro.writerow([' ']);
+    registro.writerow([' ']);
+    registro.frequencia();  # final da frequência (gravação em disco)
+    return
+#-------------------------------------------------------------------------------
+# função retomar_ciclos(registro,exportar,ciclos,diff_acdc,Delta)
+# refaz o estado da frequência interrompida a partir dos ciclos do diário:
+# controle do balanço DC, critério de parada e pontos aceitos (acrescentados
+# a diff_acdc e Delta e escritos novamente no registro e na exportação)
+# retorna a tensão DC ajustada no último ciclo
+def retomar_ciclos(registro,exportar,ciclos,diff_acdc,Delta):
+    vdc_atual = vdc_nominal;
+    for ciclo in ciclos:
+        results = ciclo['resultados'];
+        y = results['dut_readings'];
+        controle.atualizar(ciclo['vdc'], numpy.mean([y[i] for i in plano.indices_teste()]),
+                           numpy.mean([y[i] for i in plano.indices_referencia()]));
+        exportar.ciclo(results,ciclo['vdc'],diario_medicao.condicoes(ciclo['ca']),ciclo['aceito']);
+        if ciclo['aceito']:
+            diff_acdc.append(results['dif']);
+            Delta.append(results['Delta']);
+            registro_linha(registro,results,ciclo['vdc'],diario_medicao.condicoes(ciclo['ca']));
+            parar.adicionar(results['dif']);
+        else:
+            controle.descartar();
+        vdc_atual = results['adj_dc'];
+    print("Ciclos retomados: {:d} ({:d} pontos aceitos)".format(len(ciclos), len(diff_acdc)))
+    return vdc_atual
+#-------------------------------------------------------------------------------
+# função retomar_exportacao(exportar,frequencias)
+# acrescenta à exportação as frequências concluídas antes da interrupção
+# (registros do diário)
+def retomar_exportacao(exportar,frequencias):
+    for dados in frequencias:
+        exportar.frequencia(dados['frequencia'],diario_medicao.ler_n(dados['n']),dados['vac'],dados['metodo']);
+        for ciclo in dados['ciclos']:
+            exportar.ciclo(ciclo['resultados'],ciclo['vdc'],diario_medicao.condicoes(ciclo['ca']),ciclo['aceito']);
+        media = dados['media'];
+        exportar.media(media['media'],media['desvio'],media['pontos'],media['motivo']);
     return
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
 # Programa principal
 #-------------------------------------------------------------------------------
-def main():
+def main(retomar=None):
+    registro = None
+    diario = None
+    exportar = None
     try:
         global freq;
+        global freq_array;
+        global metodo_equilibrio;
+        global vac_inicio;
+        retomada = None
+        if retomar is not None:
+            # estado da varredura interrompida, a partir do diário
+            retomada = diario_medicao.carregar(retomar)
+            if retomada.concluida:
+                print("A medição do diário "+retomar+" já foi concluída.")
+                return
+            if float(retomada.plano['tensao']) != vdc_nominal:
+                raise NameError('Tensão nominal diferente da medição interrompida!')
+            freq_array = retomada.plano['frequencias']
         print("Inicializando BME280 (condições ambientais)")
         bme280_init()
         print("Inicializando os intrumentos...")
         instrument_init()  # inicializa os instrumentos
         print("Colocando fontes em OPERATE...")
         meas_init()        # inicializa a medição (coloca fontes em operate)
-        print("Criando arquivo de registro...")
-        filename = criar_registro();  # cria arquivo de registro
-        print("Arquivo "+filename+" criado com sucesso!")
+        if retomada is None:
+            print("Criando arquivo de registro...")
+            registro = criar_registro();  # cria arquivo de registro
+            print("Arquivo "+registro.nome+" criado com sucesso!")
+            diario = criar_diario(registro.nome);  # cria o diário da medição
+            inicio = relogio.agora();
+            exportar = exportacao.exportacao_config(config, registro.nome, versao, inicio);
+        else:
+            registro = retomar_registro(retomada.plano['registro']);  # reabre o registro
+            print("Retomando a medição do arquivo "+registro.nome)
+            diario = diario_medicao.diario_config(config, retomar);
+            diario.escrever('retomada', horario=relogio.agora());
+            inicio = datetime.datetime.fromisoformat(retomada.plano['inicio']);
+            exportar = exportacao.exportacao_config(config, registro.nome, versao, inicio);
+            retomar_exportacao(exportar,retomada.frequencias);
+        # medição no banco de dados (na retomada, a mesma medição)
+        medicao_id = banco.iniciar_medicao(registro.nome, inicio, versao, config['Misc']['observacoes']);
         print("Aquecimento...");   
-        aquecimento(heating_time);  # inicia o aquecimento
+        resultado = aquecimento(heating_time);  # inicia o aquecimento
+        registro_aquecimento(registro,resultado);  # curva de deriva do aquecimento
+        # plano do ciclo de medição e duração estimada (tempo de espera como
+        # limite de cada etapa)
+        print("Sequência do ciclo: "+", ".join(etapa.nome for etapa in plano.etapas))
+        print("Duração estimada do ciclo: {:.0f} s (primeiro), {:.0f} s (seguintes); {:.0f} s por frequência".format(
+            plano.duracao(wait_time, True), plano.duracao(wait_time, False), plano.duracao_frequencia(wait_time, parar.maximo)))
         # fazer loop para cada valor de frequencia
-        for value in freq_array:
+        for indice, value in enumerate(freq_array):
+            if (retomada is not None) and (value in retomada.concluidas):
+                print("Frequência "+value.strip()+" kHz já medida.")
+                continue
+            # frequência interrompida: o n e o equilíbrio são os do diário
+            interrompida = (retomada is not None) and retomada.interrompida(value)
             freq = float(value) * 1000;
+            vac_inicio = tensao_inicial(value);  # último equilíbrio do banco ou tensão nominal
             print("Iniciando a medição...")
             print("V nominal: {:5.2f} V, f nominal: {:5.2f} Hz".format(vdc_nominal,freq));
-            print("Medindo o N...");           
-            n_array = n_measure(4);  # 4 repetições para o cálculo do N
+            if interrompida:
+                n_array = diario_medicao.ler_n(retomada.atual['n']);
+                vac_atual = retomada.atual['vac'];
+                metodo_equilibrio = retomada.atual['metodo'];
+                print("N e equilíbrio AC do diário");
+                print_n(n_array)
+            else:
+                print("Medindo o N...");           
+                n_array = obter_n(4);  # 4 repetições para o cálculo do N (ou n do cache)
+                print_n(n_array)
+                print("Equilibrio AC...");
+                vac_atual = calcular_equilibrio(n_array);  # calcula a tensão AC de equilíbrio
+                # se a leitura DC do objeto derivou em relação ao n do cache, medir o n novamente
+                if not cache.verificar(vdc_nominal, par_conversores(), ydc_equilibrio):
+                    print("Deriva acima do limite em relação ao N do cache. Medindo o N...");
+                    n_array = obter_n(4);
+                    print_n(n_array)
+                    print("Equilibrio AC...");
+                    vac_atual = calcular_equilibrio(n_array);
+                    cache.verificar(vdc_nominal, par_conversores(), ydc_equilibrio);
+                diario.escrever('frequencia', frequencia=value, n=n_array, vac=vac_atual, metodo=metodo_equilibrio);
+            exportar.frequencia(value,n_array,vac_atual,metodo_equilibrio);
             n_value = n_array['results'];
-            print("N STD (média): {:5.2f}".format(n_value[0]))
-            print("N STD (desvio padrão): {:5.2f}".format(n_value[1]))
-            print("N DUT (média): {:5.2f}".format(n_value[2]))
-            print("N DUT (desvio padrão): {:5.2f}".format(n_value[3]))   
-            print("Equilibrio AC...");
-            vac_atual = equilibrio();  # calcula a tensão AC de equilíbrio
             print("Vac aplicado: {:5.6f} V".format(vac_atual))
-            registro_frequencia(filename,value,n_array,vac_atual);  # inicia o registro para a frequencia atual
+            registro_frequencia(registro,value,n_array,vac_atual);  # inicia o registro para a frequencia atual
             first_measure = True;   # flag para determinar se é a primeira repeticao
 
             if vac_atual > 1.1*vac_nominal:  # verifica se a tensão AC de equilíbrio não é muito elevada
@@ -739,51 +997,98 @@ def main():
             diff_acdc = [];
             Delta = [];
             vdc_atual = vdc_nominal;
-            i = 0;
-            while (i < repeticoes):  # inicia as repetições da medição
+            parar.iniciar();
+            controle.iniciar(n_value[2]);
+            if interrompida:
+                # continua a partir dos pontos aceitos e do último ajuste DC
+                vdc_atual = retomar_ciclos(registro,exportar,retomada.atual['ciclos'],diff_acdc,Delta);
+            while parar.continuar():  # inicia as repetições da medição
                 print ("Vdc aplicado: {:5.6f} V".format(vdc_atual))
-                if first_measure:    # testa se é a primeira medição
+                if first_measure or not plano.reaproveitar:    # testa se é a primeira medição
                     ciclo_ac = [];
                     first_measure = False
                 else:
-                    ciclo_ac = [readings['std_readings'][4], readings['dut_readings'][4]];  # caso não seja, aproveitar o último ciclo AC
+                    ciclo_ac = {chave: readings[chave][-1] for chave in readings};  # caso não seja, aproveitar a última etapa
+                inicio_ciclo = relogio.tempo();                                             # início do ciclo (condições ambientais)
                 readings = measure(vdc_atual,vac_atual,ciclo_ac);                           # da repetição anterior
                 results = acdc_calc(readings,n_value,vdc_atual);                            # calcula a diferença ac-dc         
                 print("Diferença ac-dc: {:5.2f}".format(results['dif']))               
+                if not numpy.isnan(results['u_dif']):
+                    print("Incerteza do ciclo: {:5.2f}".format(results['u_dif']))
                 print("Delta: {:5.2f}".format(results['Delta']))
                 print("Data / hora: "+results['timestamp']);
-                ca_data = bme280_read();
+                ca_data = bme280_read(inicio_ciclo);
                 print("Temperatura: "+str(ca_data.temperature)+" ºC");
                 print("Umidade Relativa: "+str(ca_data.humidity)+" %u.r.");
                 print("Pressão atmosférica: "+str(ca_data.pressure)+" hPa");
-                if abs(results['Delta']) > 50:               # se o ponto não passa no critério de descarte, repetir medição
+                aceito = abs(results['Delta']) <= 50;
+                if not aceito:               # se o ponto não passa no critério de descarte, repetir medição
                     print("Delta > 50. Ponto descartado!")
+                    controle.descartar();
                 else:
                     diff_acdc.append(results['dif']);
                     Delta.append(results['Delta']);
-                    registro_linha(filename,results,vdc_atual,ca_data);
-                    i += 1;               
+                    registro_linha(registro,results,vdc_atual,ca_data);
+                    parar.adicionar(results['dif']);   # avalia o critério de parada
+                # leituras brutas e ajuste DC do ciclo no diário
+                diario.escrever('ciclo', frequencia=value, vdc=vdc_atual, leituras=readings, resultados=results,
+                                ca=diario_medicao.condicoes_diario(ca_data), aceito=aceito);
+                exportar.ciclo(results,vdc_atual,ca_data,aceito);
                 vdc_atual = results['adj_dc'];              # aplica o ajuste DC
                 if vdc_atual > 1.1*vdc_nominal:
                     raise NameError('Tensão DC ajustada perigosamente alta!')    
 
-            print("Medição concluída.")                      
+            print("Medição concluída ("+parar.motivo+").")
+            proxima = proxima_frequencia(indice, retomada)
+            if antecipar and (proxima is not None):
+                # fonte AC na próxima frequência durante o final desta
+                print("Preparando a frequência "+proxima.strip()+" kHz...")
+                preparar_frequencia(proxima);                      
         
             print("Resultados:")
             print("Média: {:5.2f}".format(numpy.mean(diff_acdc)))
             print("Desvio padrão: {:5.2f}".format(numpy.std(diff_acdc, ddof=1)))
+            print("Desvio padrão da média: {:5.2f}".format(parar.estatisticas.erro_padrao()))
+            print("Ciclos descartados: {:d} de {:d} ({:5.1f} %)".format(controle.descartados, controle.ciclos, controle.taxa_descarte()))
             print("Salvando arquivo...")
-            registro_media(filename,diff_acdc);             # salva a diferença ac-dc média para a frequência atual no registro
+            registro_media(registro,diff_acdc);             # salva a diferença ac-dc média para a frequência atual no registro
+            diario.escrever('media', frequencia=value, media=numpy.mean(diff_acdc), desvio=numpy.std(diff_acdc, ddof=1),
+                            pontos=parar.estatisticas.n, motivo=parar.motivo);
+            exportar.media(numpy.mean(diff_acdc),numpy.std(diff_acdc, ddof=1),parar.estatisticas.n,parar.motivo);  # regrava o arquivo .npz
+            banco.adicionar(medicao_id,vdc_nominal,value,relogio.agora(),(numpy.mean(diff_acdc),numpy.std(diff_acdc, ddof=1)),
+                            parar.estatisticas.erro_padrao(),parar.estatisticas.n,parar.motivo,n_value,vac_atual,metodo_equilibrio);
 
         stop_instruments();                                 # coloca as fontes em stand-by
+        amostrador.parar();                                 # encerra a amostragem das condições ambientais
+        registro.fechar();                                  # fecha o arquivo de registro
+        diario.escrever('fim', horario=relogio.agora());
+        diario.fechar();
+        banco.fechar();
+        motor_med.fechar();
+        if amostrador.falhas:
+            print("Falhas de leitura das condições ambientais: {:d}".format(amostrador.falhas))
+        print("Comandos GPIB suprimidos (fontes e chave): {:d}".format(ac_source.suprimidos + dc_source.suprimidos + sw.suprimidos))
         print("Concluído.")
                 
     except:
         stop_instruments()
+        if registro is not None:
+            registro.fechar()
+        if diario is not None:
+            diario.fechar()
+        if exportar is not None:
+            exportar.gravar()
+        banco.fechar()
+        motor_med.fechar()
         import traceback
         traceback.print_exc()
         
 
 # execução do programa principal
+# --resume diario_*.jsonl: retoma a medição interrompida
 if __name__ == '__main__':
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description='pyAC-DC '+versao)
+    parser.add_argument('--resume', metavar='DIARIO', help='retoma a medição interrompida a partir do diário (diario_*.jsonl)')
+    args = parser.parse_args()
+    main(args.resume)
@@ -39,14 +39,38 @@
 versao = '0.5';
 #-------------------------------------------------------------------------------
 # Carregar módulos
-import visa
+# o pyVISA não é necessário com os instrumentos simulados
+try:
+    import visa
+except ImportError:
+    visa = None
 import datetime
 import configparser
-import time
 import numpy
-import csv
 # classes abstratas:
 from abc import ABCMeta, abstractmethod
+# detecção adaptativa da estabilização
+import estabilizacao
+# aquisição pareada padrão / objeto
+import aquisicao
+# drivers dos medidores
+import medidores
+# cache do estado das fontes e da chave
+import estado
+# instrumentos simulados
+import simulador
+# relógio (real ou virtual)
+import relogio
+# cache do n ao longo da varredura em frequência
+import cache_n
+# equilíbrio AC a partir do n do objeto
+import equilibrio_n
+# critério de parada sequencial das repetições
+import parada
+# controle do balanço DC entre os ciclos
+import balanco
+# escrita do registro de medição
+import registro_csv
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
@@ -65,10 +89,20 @@ config = configparser.ConfigParser() # iniciar o objeto config
 config.read('config_ood.ini') # ler o arquivo de configuracao
 wait_time = int(config['Measurement Config']['wait_time']); # tempo de espera
 heating_time = int(config['Measurement Config']['aquecimento']); # tempo de aquecimento
-rm = visa.ResourceManager()
+# instrumentos simulados ([Simulacao] habilitar = true) ou barramento GPIB
+rm = simulador.simulador_config(config)
+if rm is None:
+    rm = visa.ResourceManager()
 repeticoes = int(config['Measurement Config']['repeticoes']); # quantidade de repetições
 v_nominal = float(config['Measurement Config']['voltage']); # Tensão nominal 
 freq_array = config['Measurement Config']['frequency'].split(',') # Array com as frequências
+estab = estabilizacao.estabilizacao_config(config) # detecção da estabilização
+aquec = estabilizacao.aquecimento_config(config) # término do aquecimento por deriva
+aquis = aquisicao.aquisicao_config(config) # aquisição pareada
+cache = cache_n.cache_n_config(config) # cache do n
+equil = equilibrio_n.equilibrio_n_config(config) # equilíbrio a partir do n
+parar = parada.parada_config(config, repeticoes) # critério de parada das repetições
+controle = balanco.balanco_config(config) # controle do balanço DC
 #-------------------------------------------------------------------------------
 
 #-------------------------------------------------------------------------------
@@ -76,14 +110,11 @@ freq_array = config['Measurement Config']['frequency'].split(',') # Array com as
 #-------------------------------------------------------------------------------
 # função espera(segundos)
 # aceita como parâmetro o tempo de espera, em segundos
-# hack para poder interromper o programa a qualquer momento
-# no Windows XP, a função time.sleep não pode ser interrompida por uma
-# interrupção de teclado. A função quebra a chamada dessa função em várias
-# chamadas de 0,1 segundo.
+# espera com prazo no relógio monotônico (relogio.esperar): o tempo é exato
+# e a espera pode ser interrompida a qualquer momento pelo teclado (Ctrl-C)
 
 def espera(segundos):
-    for i in range(int(segundos * 10)):
-        time.sleep(0.1)    
+    relogio.esperar(segundos)
     return
 
 #-------------------------------------------------------------------------------
@@ -115,6 +146,7 @@ class Chave(Instrumento):
 
     def __init__(self):
         Instrumento.__init__(self,config['GPIB']['SW'],'METAS')
+        self.gpib = estado.EstadoChave(self.gpib, reset)
     
     def print_idn(self):
         print("Comunicando com a chave no endereço "+self.endereco+".");
@@ -134,6 +166,8 @@ class Fonte(Instrumento):
     """
     def __init__(self, tipo):
         Instrumento.__init__(self, config['GPIB'][tipo], config['Instruments'][tipo])
+        # comandos que não alteram o estado da fonte não são enviados
+        self.gpib = estado.EstadoFonte(self.gpib)
         if (tipo != 'AC') & (tipo != 'DC'):
             raise NameError('tipo deve ser AC ou DC')
         
@@ -162,55 +196,9 @@ class Medidor(Instrumento):
             raise NameError('tipo deve ser STD ou DUT')
 
         self.tipo = tipo
-
-        if self.modelo == '3458A':
-            self.gpib.write("OFORMAT ASCII")
-            self.gpib.write("END ALWAYS")
-            self.gpib.write("NPLC 8")
-            self.idn = self.gpib.query("ID?");
-            
-        elif self.modelo == '182A':
-            self.gpib.write("R0I0B1X")
-            self.gpib.write("S2N1X")
-            self.gpib.write("O1P2X")
-            self.idn = "Keithley 182A"
-
-        elif self.modelo == '53132A':
-            self.idn = self.gpib.query("*IDN?");
-            self.gpib.write("*RST")
-            self.gpib.write("*CLS")
-            self.gpib.write("*SRE 0")
-            self.gpib.write("*ESE 0")
-            self.gpib.write(":STAT:PRES")
-            # comandos para throughput máximo
-            self.gpib.write(":FORMAT ASCII")
-            self.gpib.write(":FUNC 'FREQ 1'")
-            self.gpib.write(":EVENT1:LEVEL 0")
-            # configura o gate size (1 s)
-            self.gpib.write(":FREQ:ARM:STAR:SOUR IMM")
-            self.gpib.write(":FREQ:ARM:STOP:SOUR TIM")
-            self.gpib.write(":FREQ:ARM:STOP:TIM 1")
-            # configura para utilizar oscilador interno
-            self.gpib.write(":ROSC:SOUR INT")
-            # desativa interpolador automatico
-            self.gpib.write(":DIAG:CAL:INT:AUTO OFF")
-            # desativa todo o pós-processamento
-            self.gpib.write(":CALC:MATH:STATE OFF")
-            self.gpib.write(":CALC2:LIM:STATE OFF")
-            self.gpib.write(":CALC3:AVER:STATE OFF")
-            self.gpib.write(":HCOPY:CONT OFF")
-            self.gpib.write("*DDT #15FETC?")
-            self.gpib.write(":INIT:CONT ON")
-
-        elif self.modelo == '2182A':
-            self.gpib.write("SENS:CHAN 2")
-            self.gpib.write(":SENS:VOLT:CHAN2:RANG:AUTO ON")
-            self.gpib.write(":SENS:VOLT:NPLC 18")
-            self.gpib.write(":SENS:VOLT:DIG 8")
-            self.idn = self.gpib.query("*IDN?");
-            
-        else:
-            self.idn = self.gpib.query("*IDN?");
+        # driver do modelo, escolhido uma única vez (2182A no canal 2)
+        self.driver = medidores.criar_driver(self.modelo, self.gpib, comandos=["R0I0B1X", "S2N1X", "O1P2X"], canal=2)
+        self.idn = self.driver.inicializar()
         
     def print_idn(self):
         if self.tipo == 'STD':
@@ -225,25 +213,10 @@ class Medidor(Instrumento):
         return
 
     def ler_dados(self):
-        if self.modelo == '182A':
-            x = self.gpib.query("X")
-        elif self.modelo == '2182A':
-            x = self.gpib.query(":FETCH?")
-        elif self.modelo == '53132A':
-            x = self.gpib.query(":FETCH:FREQ?")
-        elif self.modelo == '3458A':
-            x = self.gpib.query("OHM 100E3")
-        return x
+        return self.driver.ler()
 
     def imprimir_dados(self, readings):
-        if self.modelo == '182A':
-            print(self.tipo+" [mV] {:5.6f}".format(float(readings[-1].replace('NDCV','').strip())*1000))
-        elif self.modelo == '2182A':
-            print(self.tipo+" [mV] {:5.6f}".format(float(readings[-1].strip())*1000))
-        elif self.modelo == '53132A':
-            print(self.tipo+" [Hz] {:5.8f}".format(float(readings[-1].strip())))
-        elif self.modelo == '3458A':
-            print(self.tipo+" [ohms] {:5.8f}".format(float(readings[-1].strip())))
+        print(self.tipo+" ["+self.driver.unidade+"] "+self.driver.exibir(readings[-1]))
         return
 
 #-------------------------------------------------------------------------------
@@ -257,6 +230,9 @@ class Medicao(object):
     medidor_dut: objeto pyVISA do medidor do objeto
     chave: objeto pyVISA da chave
     """
+    # resultados da medição do n guardados no cache
+    atributos_n = ['X0', 'Xi', 'Y0', 'Yi', 'k', 'nX_array', 'nY_array',
+                   'nX_media', 'nX_desvio', 'nY_media', 'nY_desvio']
 
     def __init__(self, fonte_ac, fonte_dc, medidor_std, medidor_dut, chave):
         self.fonte_ac = fonte_ac
@@ -264,14 +240,19 @@ class Medicao(object):
         self.medidor_std = medidor_std
         self.medidor_dut = medidor_dut
         self.chave = chave
+        self.estabilizacao = estab
+        self.aquec = aquec
+        self.aquisicao = aquis
+        self.cache_n = cache
+        self.equil = equil
+        self.controle = controle
+        self.registro = None
 
     def inicializar(self):
         # configuração da fonte AC
-        self.fonte_ac.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_ac.gpib.write("OUT 1000 HZ");
+        self.fonte_ac.gpib.saida(v_nominal, 1000);
         # configuração da fonte DC
-        self.fonte_dc.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_dc.gpib.write("OUT 0 HZ");
+        self.fonte_dc.gpib.saida(v_nominal, 0);
         # Entrar em OPERATE
         espera(2); # esperar 2 segundos
         self.fonte_ac.gpib.write("*CLS");
@@ -287,17 +268,45 @@ class Medicao(object):
     # executa o aquecimento, mantendo a tensão nominal aplicada pelo tempo
     # (em segundos) definido na variavel "tempo", alternando entre AC e DC
     # a cada 60 segundos
+    # as saídas são lidas ao final de cada etapa DC; o aquecimento termina
+    # antes se a deriva de padrão e objeto ficar abaixo do limite
         rep = int(tempo / 120);
-        self.fonte_dc.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_dc.gpib.write("OUT 0 HZ");
-        self.fonte_ac.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_ac.gpib.write("OUT 1000 HZ");
+        self.fonte_dc.gpib.saida(v_nominal, 0);
+        self.fonte_ac.gpib.saida(v_nominal, 1000);
+        self.aquec.iniciar()
+        self.aquecimento_estavel = False
+        inicio = relogio.tempo()
 
         for i in range(0,rep):
             self.chave.gpib.write_raw(dc);
             espera(60);
+            if self.aquec.habilitado:
+                par = self.ler_par()
+                valores = [self.medidor_std.driver.converter(par['std']), self.medidor_dut.driver.converter(par['dut'])]
+                if self.aquec.adicionar(relogio.tempo() - inicio, valores):
+                    self.aquecimento_estavel = True
+                    break
             self.chave.gpib.write_raw(ac);
             espera(60);
+        self.tempo_aquecimento = relogio.tempo() - inicio
+        if self.aquecimento_estavel:
+            print("Aquecimento concluído por deriva em {:5.0f} s".format(self.tempo_aquecimento))
+        return
+
+    def registrar_aquecimento(self):
+        # término do aquecimento e curva de deriva (leituras ao final das
+        # etapas DC)
+        registro = self.registro
+        registro.writerow(['Aquecimento']);
+        registro.writerow(['Término do aquecimento','deriva abaixo do limite' if self.aquecimento_estavel else 'tempo configurado']);
+        registro.writerow(['Tempo de aquecimento efetivo [s]',self.tempo_aquecimento]);
+        registro.writerow(['Deriva máxima [ppm/min]',self.aquec.deriva_max]);
+        registro.writerow(['Tempo [s]','STD','DUT','Deriva STD [ppm/min]','Deriva DUT [ppm/min]']);
+        for ponto in self.aquec.curva:
+            derivas = ponto['derivas'] if ponto['derivas'] is not None else ['','']
+            registro.writerow([ponto['tempo']] + ponto['leituras'] + derivas);
+        registro.writerow([' ']);
+        registro.writerow([' ']);
         return
 
     def medir_n(self, M):
@@ -310,8 +319,7 @@ class Medicao(object):
         # variavel da constante V0 / (Vi-V0)
         self.k = []
         # aplica o valor nominal de tensão
-        self.fonte_ac.gpib.write("OUT {:.6f} V".format(v_nominal));
-        self.fonte_ac.gpib.write("OUT "+str(freq)+" HZ");
+        self.fonte_ac.gpib.saida(v_nominal, freq);
         self.fonte_dc.gpib.write("OUT +{:.6f} V".format(v_nominal));
         espera(2); # espera 2 segundos
         self.chave.gpib.write_raw(dc);
@@ -320,8 +328,9 @@ class Medicao(object):
         espera(wait_time);
         # lê as saídas de padrão e objeto, e armazena na variável std_readings e
         # dut_readings
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
+        par = self.ler_ciclo()
+        std_readings.append(par['std'])
+        dut_readings.append(par['dut'])
         self.medidor_std.imprimir_dados(std_readings)
         self.medidor_dut.imprimir_dados(dut_readings)
 
@@ -346,36 +355,23 @@ class Medicao(object):
             espera(wait_time);
             # lê as saídas de padrão e objeto, e armazena na variável std_readings e
             # dut_readings
-            std_readings.append(self.medidor_std.ler_dados())
-            dut_readings.append(self.medidor_dut.ler_dados())
+            par = self.ler_ciclo()
+            std_readings.append(par['std'])
+            dut_readings.append(par['dut'])
             self.medidor_std.imprimir_dados(std_readings)
             self.medidor_dut.imprimir_dados(dut_readings)
                 
         # cálculo do n
         self.chave.gpib.write_raw(ac); # mantém chave em ac durante cálculo
         
-        if self.medidor_std.modelo == '182A':
-            self.X0 = float(std_readings[0].replace('NDCV','').strip())
-        else:
-            self.X0 = float(std_readings[0].strip())
-            
-        if self.medidor_dut.modelo == '182A':
-            self.Y0 = float(dut_readings[0].replace('NDCV','').strip())
-        else:
-            self.Y0 = float(dut_readings[0].strip())
+        self.X0 = self.medidor_std.driver.converter(std_readings[0])
+        self.Y0 = self.medidor_dut.driver.converter(dut_readings[0])
         
         del std_readings[0]
         del dut_readings[0]
 
-        if self.medidor_std.modelo == '182A':
-            self.Xi = numpy.array([float(a.replace('NDCV','').strip()) for a in std_readings]);
-        else:
-            self.Xi = numpy.array([float(a.strip()) for a in std_readings]);
-            
-        if self.medidor_dut.modelo == '182A':    
-            self.Yi = numpy.array([float(a.replace('NDCV','').strip()) for a in dut_readings]);
-        else:
-            self.Yi = numpy.array([float(a.strip()) for a in dut_readings]);
+        self.Xi = self.medidor_std.driver.converter_lote(std_readings);
+        self.Yi = self.medidor_dut.driver.converter_lote(dut_readings);
             
         self.nX_array = (self.Xi/self.X0 - 1) * self.k;
         self.nY_array = (self.Yi/self.Y0 - 1) * self.k;
@@ -387,6 +383,37 @@ class Medicao(object):
         
         return
 
+    def par_conversores(self):
+        # identifica o par de conversores (medidores e endereços) no cache do n
+        return (self.medidor_std.modelo+'@'+self.medidor_std.endereco+'/'+
+                self.medidor_dut.modelo+'@'+self.medidor_dut.endereco)
+
+    def obter_n(self, M):
+        # utiliza o n do cache, se válido; caso contrário, mede o n e guarda
+        # o resultado. A origem do n ('medido' ou 'cache') e o horário da
+        # medição ficam em n_origem e n_horario
+        entrada = self.cache_n.obter(v_nominal, self.par_conversores())
+        if entrada is None:
+            self.medir_n(M)
+            dados = {a: getattr(self, a) for a in self.atributos_n}
+            entrada = self.cache_n.guardar(v_nominal, self.par_conversores(), dados)
+            self.n_origem = 'medido'
+        else:
+            for a in self.atributos_n:
+                setattr(self, a, entrada['dados'][a])
+            self.n_origem = 'cache'
+        self.n_horario = entrada['horario']
+        return
+
+    def verificar_n(self, M):
+        # após o equilíbrio: se a leitura DC do objeto derivou em relação à
+        # frequência em que o n foi medido, o n é medido novamente
+        if not self.cache_n.verificar(v_nominal, self.par_conversores(), self.Ydc_equilibrio):
+            print("Deriva acima do limite em relação ao N do cache. Medindo o N...")
+            self.obter_n(M)
+            return False
+        return True
+
     def equilibrio(self):
         dut_readings = []
         self.fonte_ac.gpib.write("OUT "+str(freq)+" HZ");
@@ -421,12 +448,10 @@ class Medicao(object):
         # cálculo do equilíbrio
         yp = [0.999*v_nominal, 1.001*v_nominal]
 
-        if self.medidor_dut.modelo == '182A':
-            xp = [float(dut_readings[1].replace('NDCV','').strip()), float(dut_readings[2].replace('NDCV','').strip())]
-            xi = float(dut_readings[0].replace('NDCV','').strip())
-        else:
-            xp = [float(dut_readings[1].strip()), float(dut_readings[2].strip())]
-            xi = float(dut_readings[0].strip())
+        xp = [self.medidor_dut.driver.converter(dut_readings[1]), self.medidor_dut.driver.converter(dut_readings[2])]
+        xi = self.medidor_dut.driver.converter(dut_readings[0])
+        # leitura DC do objeto na tensão nominal (deriva em relação ao n do cache)
+        self.Ydc_equilibrio = xi
         # calcula o valor de equilíbrio através de interpolação linear    
         self.vac_atual = numpy.interp(xi,xp,yp);
         self.adj_dc = v_nominal
@@ -436,104 +461,164 @@ class Medicao(object):
         
         return
 
+    def equilibrio_n(self):
+        # equilíbrio a partir do nY do objeto: uma leitura DC e uma leitura AC
+        # (e um passo de Newton, se a correção for grande). Se o n acabou de
+        # ser medido, a leitura DC é a leitura Y0 de medir_n
+        dut_readings = []
+        self.fonte_ac.gpib.saida(v_nominal, freq)
+        self.fonte_dc.gpib.saida(v_nominal, 0)
+        if self.n_origem == 'medido':
+            ydc = self.Y0
+            print("Vdc nominal: leitura Y0 da medição do N")
+        else:
+            self.chave.gpib.write_raw(dc);
+            print("Vdc nominal: +{:.6f} V".format(v_nominal))
+            espera(wait_time);
+            dut_readings.append(self.medidor_dut.ler_dados())
+            self.medidor_dut.imprimir_dados(dut_readings)
+            ydc = self.medidor_dut.driver.converter(dut_readings[-1])
+        self.Ydc_equilibrio = ydc
+        # Aplica Vac nominal
+        vac = v_nominal
+        print("Vac nominal: +{:.6f} V".format(vac))
+        self.chave.gpib.write_raw(ac);
+        espera(wait_time)
+        dut_readings.append(self.medidor_dut.ler_dados())
+        self.medidor_dut.imprimir_dados(dut_readings)
+        self.vac_atual = self.equil.tensao(vac, ydc, self.medidor_dut.driver.converter(dut_readings[-1]), self.nY_media)
+        if self.equil.refinar(vac, self.vac_atual):
+            # passo de Newton: aplica a tensão calculada e repete o cálculo
+            vac = self.vac_atual
+            self.fonte_ac.gpib.saida(vac, freq)
+            print("Vac calculado: +{:.6f} V".format(vac))
+            espera(wait_time)
+            dut_readings.append(self.medidor_dut.ler_dados())
+            self.medidor_dut.imprimir_dados(dut_readings)
+            self.vac_atual = self.equil.tensao(vac, ydc, self.medidor_dut.driver.converter(dut_readings[-1]), self.nY_media)
+        self.chave.gpib.write_raw(dc);
+        self.adj_dc = v_nominal
+
+        if self.vac_atual > 1.1*v_nominal:  # verifica se a tensão AC de equilíbrio não é muito elevada
+            raise NameError('Tensão AC ajustada perigosamente alta!')
+
+        return
+
+    def calcular_equilibrio(self):
+        # equilíbrio a partir do n, se o nY do objeto for confiável; caso
+        # contrário, equilíbrio por interpolação
+        if self.equil.confiavel(self.nY_media, self.nY_desvio):
+            self.metodo_equilibrio = 'n'
+            print("Equilíbrio a partir do N do objeto")
+            self.equilibrio_n()
+        else:
+            self.metodo_equilibrio = 'interpolação'
+            self.equilibrio()
+        return
+
+    def ler_par(self):
+        # leitura pareada: os dois medidores são disparados juntos e as
+        # respostas buscadas em paralelo
+        # retorna {'std', 'dut', 't_std', 't_dut'} (leituras e instantes de disparo)
+        return self.aquisicao.ler(self.medidor_std.driver, self.medidor_dut.driver)
+
+    def ler_ciclo(self):
+        # leitura pareada de uma etapa do ciclo de medição: em rajada se
+        # configurada (amostras > 1), retornando também as incertezas padrão
+        # das médias ('std_u' e 'dut_u')
+        return self.aquisicao.ler_etapa(self.medidor_std.driver, self.medidor_dut.driver)
+
+    def estabilizar(self, tempo_max):
+        # aguarda a estabilização das saídas do padrão e do objeto, limitada
+        # a tempo_max; retorna o tempo de estabilização, em segundos
+        def ler():
+            par = self.ler_par()
+            return [self.medidor_std.driver.converter(par['std']), self.medidor_dut.driver.converter(par['dut'])]
+        resultado = self.estabilizacao.aguardar(tempo_max, ler, espera)
+        if resultado['estavel']:
+            print("Estabilizado em {:5.1f} s".format(resultado['tempo']))
+        return resultado['tempo']
+
+    def ler_etapa(self, readings, tempo):
+        # lê padrão e objeto ao final de uma etapa do ciclo de medição e
+        # acrescenta ao dicionário readings as leituras, as incertezas padrão
+        # das médias, o tempo de estabilização e os instantes de disparo
+        par = self.ler_ciclo()
+        readings['std_readings'].append(par['std'])
+        readings['dut_readings'].append(par['dut'])
+        readings['std_u'].append(par['std_u'])
+        readings['dut_u'].append(par['dut_u'])
+        readings['tempos'].append(tempo)
+        readings['instantes'].append([par['t_std'], par['t_dut']])
+        self.medidor_std.imprimir_dados(readings['std_readings'])
+        self.medidor_dut.imprimir_dados(readings['dut_readings'])
+        return
+
     def medir_acdc(self, ciclo_ac):
         self.vdc_atual = self.adj_dc
         # inicializa arrays de resultados
-        std_readings = []
-        dut_readings = []
+        readings = {'std_readings':[], 'dut_readings':[], 'std_u':[], 'dut_u':[], 'tempos':[], 'instantes':[]}
         # configuração da fonte AC
-        self.fonte_ac.gpib.write("OUT {:.6f} V".format(self.vac_atual))
-        self.fonte_ac.gpib.write("OUT "+str(freq)+" HZ")
+        self.fonte_ac.gpib.saida(self.vac_atual, freq)
         # configuração da fonte DC
-        self.fonte_dc.gpib.write("OUT +{:.6f} V".format(self.vdc_atual))
-        self.fonte_dc.gpib.write("OUT 0 HZ")
+        self.fonte_dc.gpib.saida(self.vdc_atual, 0)
         # Iniciar medição
         espera(2); # esperar 2 segundos
         # Ciclo AC
         # testa se existem dados do último ciclo AC da medição anterior
-        if (ciclo_ac == []):
+        if not ciclo_ac:
             # caso negativo, medir AC normalmente
             self.chave.gpib.write_raw(ac)
             print("Ciclo AC")
-            espera(wait_time);
-            # leituras
-            std_readings.append(self.medidor_std.ler_dados())
-            dut_readings.append(self.medidor_dut.ler_dados())
-            self.medidor_std.imprimir_dados(std_readings)
-            self.medidor_dut.imprimir_dados(dut_readings)
+            self.ler_etapa(readings, self.estabilizar(wait_time))
 
         else:
             # caso positivo, aproveitar as medições do ciclo anterior
             print("Ciclo AC")
-            std_readings.append(ciclo_ac[0])
-            dut_readings.append(ciclo_ac[1])
-            self.medidor_std.imprimir_dados(std_readings)
-            self.medidor_dut.imprimir_dados(dut_readings)
+            for chave in readings:
+                readings[chave].append(ciclo_ac[chave])
+            self.medidor_std.imprimir_dados(readings['std_readings'])
+            self.medidor_dut.imprimir_dados(readings['dut_readings'])
 
         # Ciclo DC
         self.chave.gpib.write_raw(dc);
         print("Ciclo +DC")
-        espera(wait_time);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
+        self.ler_etapa(readings, self.estabilizar(wait_time))
 
         # Ciclo AC
         self.chave.gpib.write_raw(ac);
         print("Ciclo AC")
-        espera(wait_time/2);
-        # Mudar fonte DC para -DC
+        espera(2); # esperar 2 segundos
+        # Mudar fonte DC para -DC (a chave isola a fonte DC durante o ciclo AC)
         self.fonte_dc.gpib.write("OUT -{:.6f} V".format(self.vdc_atual));
-        espera(wait_time/2);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
+        self.ler_etapa(readings, 2 + self.estabilizar(wait_time - 2))
 
         # Ciclo -DC
         self.chave.gpib.write_raw(dc);
         print("Ciclo -DC")
-        espera(wait_time);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
+        self.ler_etapa(readings, self.estabilizar(wait_time))
 
         # Ciclo AC
         self.chave.gpib.write_raw(ac);
         print("Ciclo AC")
-        espera(wait_time/2);
-        # Mudar fonte DC para +DC
+        espera(2); # esperar 2 segundos
+        # Mudar fonte DC para +DC (a chave isola a fonte DC durante o ciclo AC)
         self.fonte_dc.gpib.write("OUT +{:.6f} V".format(self.vdc_atual));
-        espera(wait_time/2);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
+        self.ler_etapa(readings, 2 + self.estabilizar(wait_time - 2))
 
-        # retorna as leituras obtidas para o objeto e para o padrão
-        self.measurements = {'std_readings':std_readings, 'dut_readings':dut_readings}
+        # retorna as leituras obtidas para o objeto e para o padrão, as
+        # incertezas das leituras, os tempos de estabilização e os instantes
+        self.measurements = readings
         return
 
     def calcular(self):
         # x -> padrao; y -> objeto
         print("Calculando diferença ac-dc...")
 
-        if self.medidor_std.modelo == '182A':
-            self.x = numpy.array([float(a.replace('NDCV','').strip()) for a in self.measurements['std_readings']]);
-        else:
-            self.x = numpy.array([float(a.strip()) for a in self.measurements['std_readings']]);
+        self.x = self.medidor_std.driver.converter_lote(self.measurements['std_readings']);
         # extrai os dados de leitura do objeto
-
-        if self.medidor_dut.modelo == '182A':
-            self.y = numpy.array([float(a.replace('NDCV','').strip()) for a in self.measurements['dut_readings']])
-        else:
-            self.y = numpy.array([float(a.strip()) for a in self.measurements['dut_readings']])
+        self.y = self.medidor_dut.driver.converter_lote(self.measurements['dut_readings'])
+        self.tempos = self.measurements['tempos']
         # calcula Xac, Xdc, Yac e Ydc a partir das leituras brutas    
         Xac = numpy.mean(numpy.array([self.x[0], self.x[2], self.x[4]]));     # AC médio padrão
         Xdc = numpy.mean(numpy.array([self.x[1], self.x[3]]));           # DC médio padrão
@@ -544,23 +629,22 @@ class Medicao(object):
         Y = Yac/Ydc - 1;
         # diferença AC-DC medida:
         self.delta_m = 1e6 * ((X/self.nX_media - Y/self.nY_media)/(1 + Y/self.nY_media));
+        # incerteza padrão do ciclo (aquisição em rajada; nan para single-shot)
+        self.u_dif = aquisicao.incerteza_ciclo(self.x, numpy.array(self.measurements['std_u']), self.nX_media,
+                                               self.y, numpy.array(self.measurements['dut_u']), self.nY_media)
         # critério para repetir a medição - diferença entre Yac e Ydc
 
-        if self.medidor_dut.modelo == '53132A':
-            self.Delta = Yac - Ydc;
-        elif self.medidor_dut.modelo == '3458A':
-            self.Delta = Yac - Ydc;
-        else:
-            self.Delta = 1e6 * (Yac - Ydc);
+        # (em ppm para medidores de tensão)
+        self.Delta = self.medidor_dut.driver.escala_delta * (Yac - Ydc);
 
-        # ajuste da tensão DC para o próximo ciclo
-        self.adj_dc = self.vdc_atual * (1 + (Yac - Ydc)/(self.nY_media * Ydc));
+        # ajuste da tensão DC para o próximo ciclo (controle do balanço)
+        self.adj_dc = self.controle.atualizar(self.vdc_atual, Yac, Ydc);
         
         if self.adj_dc > 1.1*v_nominal:
             raise NameError('Tensão DC ajustada perigosamente alta!') 
 
         # timestamp de cada medição
-        date = datetime.datetime.now();
+        date = relogio.agora();
         self.timestamp = datetime.datetime.strftime(date, '%d/%m/%Y %H:%M:%S');
         return
 
@@ -569,77 +653,87 @@ class Medicao(object):
         espera(1)
         self.fonte_ac.gpib.write("STBY");
         self.fonte_dc.gpib.write("STBY");
+        # fecha o registro de medição (gravação das linhas pendentes)
+        if self.registro is not None:
+            self.registro.fechar()
         return
 
+    def comandos_suprimidos(self):
+        # quantidade de comandos GPIB não enviados às fontes e à chave por
+        # não alterarem o seu estado
+        return self.fonte_ac.gpib.suprimidos + self.fonte_dc.gpib.suprimidos + self.chave.gpib.suprimidos
+
     def criar_registro(self):
-        date = datetime.datetime.now();
+        date = relogio.agora();
         timestamp_file = datetime.datetime.strftime(date, '%d-%m-%Y_%Hh%Mm');
         timestamp_registro = datetime.datetime.strftime(date, '%d/%m/%Y %H:%M:%S');
         # o nome do registro é criado de forma automática, a partir da data e hora atuais
         self.registro_filename = "registro_"+timestamp_file+".csv"
-        
-        with open(self.registro_filename,"w") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow(['pyAC-DC '+versao]);
-            registro.writerow(['Registro de Medições']);
-            registro.writerow([' ']);
-            registro.writerow(['Início da medição',timestamp_registro]);
-            registro.writerow(['Tempo de aquecimento [s]',config['Measurement Config']['aquecimento']]);
-            registro.writerow(['Tempo de estabilização [s]',config['Measurement Config']['wait_time']]);
-            registro.writerow(['Repetições',config['Measurement Config']['repeticoes']]);
-            registro.writerow(['Observações',config['Misc']['observacoes']]);
-            registro.writerow([' ']);
-            registro.writerow([' ']);
-        
-        csvfile.close();
+        # o arquivo permanece aberto até o final da medição
+        self.registro = registro_csv.registro_config(config, self.registro_filename)
+        registro = self.registro
+        registro.writerow(['pyAC-DC '+versao]);
+        registro.writerow(['Registro de Medições']);
+        registro.writerow([' ']);
+        registro.writerow(['Início da medição',timestamp_registro]);
+        registro.writerow(['Tempo de aquecimento [s]',config['Measurement Config']['aquecimento']]);
+        registro.writerow(['Tempo de estabilização [s]',config['Measurement Config']['wait_time']]);
+        registro.writerow(['Repetições',parar.maximo]);
+        registro.writerow(['Regra de parada',parar.descrever()]);
+        registro.writerow(['Observações',config['Misc']['observacoes']]);
+        registro.writerow([' ']);
+        registro.writerow([' ']);
         return
 
     def registrar_frequencia(self):
-        with open(self.registro_filename,"a") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow(['Tensão [V]',str(v_nominal).replace('.',',')]);
-            registro.writerow(['Frequência [kHz]',str(freq / 1000).replace('.',',')]);
-            registro.writerow([' ']); 
-            registro.writerow(['X0',str(self.X0).replace('.',',')]); 
-            registro.writerow(['Xi'] + [str(i).replace('.',',') for i in self.Xi]); 
-            registro.writerow(['k'] + [str(i).replace('.',',') for i in self.k]); 
-            registro.writerow(['nX'] + [str(i).replace('.',',') for i in self.nX_array]); 
-            registro.writerow(['nX (média)',str(self.nX_media).replace('.',',')]); 
-            registro.writerow(['nX (desvio padrão)',str(self.nX_desvio).replace('.',',')]); 
-            registro.writerow([' ']); 
-            registro.writerow(['Y0',str(self.Y0).replace('.',',')]); 
-            registro.writerow(['Yi'] + [str(i).replace('.',',') for i in self.Yi]); 
-            registro.writerow(['k'] + [str(i).replace('.',',') for i in self.k]); 
-            registro.writerow(['nY'] + [str(i).replace('.',',') for i in self.nY_array]); 
-            registro.writerow(['nY (média)',str(self.nY_media).replace('.',',')]); 
-            registro.writerow(['nY (desvio padrão)',str(self.nY_desvio).replace('.',',')]); 
-            registro.writerow([' ']); 
-            registro.writerow(['Vac equilíbrio [V]',str(self.vac_atual).replace('.',',')]);
-            registro.writerow([' ']); 
-            # cabeçalho da tabela de medicao
-            registro.writerow(['Data / hora','AC (STD)','AC (DUT)','DC+ (STD)','DC+ (DUT)','AC (STD)','AC (DUT)','DC- (STD)','DC- (DUT)','AC (STD)','AC (DUT)', 'Diferença', 'Delta', 'Tensão DC Aplicada']);
-        csvfile.close();
+        registro = self.registro
+        registro.writerow(['Tensão [V]',v_nominal]);
+        registro.writerow(['Frequência [kHz]',freq / 1000]);
+        registro.writerow([' ']); 
+        registro.writerow(['X0',self.X0]); 
+        registro.writerow(['Xi'] + list(self.Xi)); 
+        registro.writerow(['k'] + list(self.k)); 
+        registro.writerow(['nX'] + list(self.nX_array)); 
+        registro.writerow(['nX (média)',self.nX_media]); 
+        registro.writerow(['nX (desvio padrão)',self.nX_desvio]); 
+        registro.writerow([' ']); 
+        registro.writerow(['Y0',self.Y0]); 
+        registro.writerow(['Yi'] + list(self.Yi)); 
+        registro.writerow(['k'] + list(self.k)); 
+        registro.writerow(['nY'] + list(self.nY_array)); 
+        registro.writerow(['nY (média)',self.nY_media]); 
+        registro.writerow(['nY (desvio padrão)',self.nY_desvio]); 
+        registro.writerow(['Origem do n',self.n_origem]); 
+        registro.writerow(['n medido em',datetime.datetime.strftime(self.n_horario, '%d/%m/%Y %H:%M:%S')]); 
+        registro.writerow([' ']); 
+        registro.writerow(['Vac equilíbrio [V]',self.vac_atual]);
+        registro.writerow(['Método do equilíbrio',self.metodo_equilibrio]);
+        registro.writerow([' ']); 
+        # cabeçalho da tabela de medicao
+        registro.writerow(['Data / hora','AC (STD)','AC (DUT)','DC+ (STD)','DC+ (DUT)','AC (STD)','AC (DUT)','DC- (STD)','DC- (DUT)','AC (STD)','AC (DUT)', 'Diferença', 'Delta', 'Tensão DC Aplicada','Estabilização AC [s]','Estabilização DC+ [s]','Estabilização AC [s]','Estabilização DC- [s]','Estabilização AC [s]','Incerteza do ciclo']);
         return
 
     def registrar_linha(self):
 
-        with open(self.registro_filename,"a") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow([self.timestamp,str(self.x[0]).replace('.',','),str(self.y[0]).replace('.',','),str(self.x[1]).replace('.',','),str(self.y[1]).replace('.',','),str(self.x[2]).replace('.',','),str(self.y[2]).replace('.',','),str(self.x[3]).replace('.',','),str(self.y[3]).replace('.',','),str(self.x[4]).replace('.',','),str(self.y[4]).replace('.',','),str(self.delta_m).replace('.',','),str(self.Delta).replace('.',','),str(self.vdc_atual).replace('.',',')]);
-
-        csvfile.close();
+        registro = self.registro
+        registro.writerow([self.timestamp,self.x[0],self.y[0],self.x[1],self.y[1],self.x[2],self.y[2],self.x[3],self.y[3],self.x[4],self.y[4],self.delta_m,self.Delta,self.vdc_atual] + [round(t,1) for t in self.tempos] + [self.u_dif]);
         return
 
-    def registrar_media(self,diferenca):
-
-        with open(self.registro_filename,"a") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow([' ']);
-            registro.writerow(['Média',str(numpy.mean(diferenca)).replace('.',',')]);
-            registro.writerow(['Desvio-padrão',str(numpy.std(diferenca, ddof=1)).replace('.',',')]);
-            registro.writerow([' ']);
-            registro.writerow([' ']);
-        csvfile.close();
+    def registrar_media(self,diferenca,parar):
+        # parar: objeto parada.ParadaSequencial da frequência (erro padrão da
+        # média e motivo da parada das repetições)
+        registro = self.registro
+        registro.writerow([' ']);
+        registro.writerow(['Média',numpy.mean(diferenca)]);
+        registro.writerow(['Desvio-padrão',numpy.std(diferenca, ddof=1)]);
+        registro.writerow(['Desvio-padrão da média',parar.estatisticas.erro_padrao()]);
+        registro.writerow(['Pontos aceitos',parar.estatisticas.n]);
+        registro.writerow(['Critério de parada',parar.motivo]);
+        registro.writerow(['Ciclos descartados',self.controle.descartados]);
+        registro.writerow(['Taxa de descarte [%]',self.controle.taxa_descarte()]);
+        registro.writerow([' ']);
+        registro.writerow([' ']);
+        registro.frequencia();  # final da frequência (gravação em disco)
         return
     
 #-------------------------------------------------------------------------------
@@ -674,6 +768,7 @@ def main():
         print("Tempo de aquecimento: "+str(heating_time)+" s")
         print("Iniciando o aquecimento.")
         setup.aquecimento(heating_time)  # inicia o aquecimento
+        setup.registrar_aquecimento()    # curva de deriva do aquecimento
         
         # fazer loop para cada valor de frequencia
         for value in freq_array:
@@ -683,7 +778,9 @@ def main():
             print("V nominal: {:5.2f} V, f nominal: {:5.2f} Hz".format(v_nominal,freq));
 
             print("Medindo o N...")
-            setup.medir_n(4)       # 4 repetições para o cálculo do N
+            setup.obter_n(4)       # 4 repetições para o cálculo do N (ou n do cache)
+            if setup.n_origem == 'cache':
+                print("N do cache, medido em "+datetime.datetime.strftime(setup.n_horario, '%d/%m/%Y %H:%M:%S'))
             
             print("N STD (média): {:5.2f}".format(setup.nX_media))
             print("N STD (desvio padrão): {:5.2f}".format(setup.nX_desvio))
@@ -691,7 +788,11 @@ def main():
             print("N DUT (desvio padrão): {:5.2f}".format(setup.nY_desvio))   
 
             print("Equilibrio AC...")
-            setup.equilibrio()
+            setup.calcular_equilibrio()
+            if not setup.verificar_n(4):   # mede o N novamente se houver deriva em relação ao cache
+                print("Equilibrio AC...")
+                setup.calcular_equilibrio()
+                setup.verificar_n(4)
             
             print("Vac aplicado: {:5.6f} V".format(setup.vac_atual))
             
@@ -703,8 +804,9 @@ def main():
             diff_acdc = [];
             Delta = [];
             
-            i = 0;
-            while (i < repeticoes):  # inicia as repetições da medição
+            parar.iniciar();
+            setup.controle.iniciar(setup.nY_media);
+            while parar.continuar():  # inicia as repetições da medição
 
                 print ("Vdc aplicado: {:5.6f} V".format(setup.adj_dc))
 
@@ -712,7 +814,7 @@ def main():
                     ciclo_ac = [];
                     first_measure = False
                 else:
-                    ciclo_ac = [setup.measurements['std_readings'][4], setup.measurements['dut_readings'][4]];  # caso não seja, aproveitar o último ciclo AC
+                    ciclo_ac = {chave: setup.measurements[chave][4] for chave in setup.measurements};  # caso não seja, aproveitar o último ciclo AC
 
                 setup.medir_acdc(ciclo_ac)       # ciclo de medicao
                 setup.calcular()                 # calcula da diferenca ac-dc
@@ -723,21 +825,25 @@ def main():
 
                 if abs(setup.Delta) > 1:               # se o ponto não passa no critério de descarte, repetir medição
                     print("Delta > 1. Ponto descartado!")
+                    setup.controle.descartar()
                 else:
                     diff_acdc.append(setup.delta_m)
                     Delta.append(setup.Delta)
                     setup.registrar_linha()
-                    i += 1;
+                    parar.adicionar(setup.delta_m)   # avalia o critério de parada
                     
-            print("Medição concluída.")                      
+            print("Medição concluída ("+parar.motivo+").")                      
         
             print("Resultados:")
             print("Média: {:5.2f}".format(numpy.mean(diff_acdc)))
             print("Desvio padrão: {:5.2f}".format(numpy.std(diff_acdc, ddof=1)))
+            print("Desvio padrão da média: {:5.2f}".format(parar.estatisticas.erro_padrao()))
+            print("Ciclos descartados: {:d} de {:d} ({:5.1f} %)".format(setup.controle.descartados, setup.controle.ciclos, setup.controle.taxa_descarte()))
             print("Salvando arquivo...")
-            registrar_media(diff_acdc)
+            setup.registrar_media(diff_acdc, parar)
 
         setup.interromper()
+        print("Comandos GPIB suprimidos (fontes e chave): {:d}".format(setup.comandos_suprimidos()))
         print("Concluído.")
                 
     except:
@@ -2,17 +2,30 @@
 
 import visa
 import datetime
-import time
 import numpy
-import csv
+import math
+import threading
+import traceback
 
-from PyQt5.QtCore import QDir, Qt
+from PyQt5.QtCore import QDir, Qt, QObject, QThread, pyqtSignal
 from PyQt5.QtWidgets import (QApplication, QCheckBox, QFileDialog, QGridLayout,
         QGroupBox, QHBoxLayout, QLabel, QPushButton, QSizePolicy, QSpinBox,
         QVBoxLayout, QWidget, QComboBox, QLineEdit, QMessageBox, QSpacerItem)
 from abc import ABCMeta, abstractmethod
 from functools import partial
 
+import estabilizacao
+import aquisicao
+import medidores
+import estado
+import relogio
+import cache_n
+import equilibrio_n
+import parada
+import balanco
+# escrita do registro de medição
+import registro_csv
+
 # Constantes e variáveis globais
 # comandos da chave (em ASCII puro)
 reset = chr(2)
@@ -37,12 +50,53 @@ repeticoes = None
 wait_time = None
 heating_time = None
 
+# medição em execução numa thread separada (TrabalhadorMedicao): o pedido de
+# parada (botão "Parar") é sinalizado pelo evento interrupcao, que
+# interrompe imediatamente a espera em curso (relogio.Cancelada) ou é
+# atendido no próximo comando GPIB
+interrupcao = threading.Event()
+# trabalhador em execução (publica leituras, n e andamento na interface)
+trabalhador = None
+
+def verificar_interrupcao():
+    if interrupcao.is_set():
+        raise relogio.Cancelada('Medição interrompida pelo usuário')
+    return
+
 def espera(segundos):
-    for i in range(int(segundos * 10)):
-        time.sleep(0.1)
-        app.processEvents()
+    # espera com prazo no relógio monotônico; o tempo restante é publicado na
+    # interface a cada segundo
+    prazo = relogio.tempo() + segundos
+    restante = segundos
+    while restante > 0:
+        if trabalhador is not None:
+            trabalhador.espera.emit(math.ceil(restante))
+        relogio.esperar(min(restante, 1), interrupcao)
+        restante = prazo - relogio.tempo()
+    verificar_interrupcao()
     return
 
+class BarramentoInterrompivel(object):
+    """ Objeto pyVISA em que cada comando (write, query, read, ...) verifica
+    antes o pedido de parada da medição
+    Atributos:
+    gpib: objeto pyVISA do instrumento
+    """
+
+    def __init__(self, gpib):
+        self.gpib = gpib
+
+    def __getattr__(self, nome):
+        atributo = getattr(self.gpib, nome)
+        if not callable(atributo):
+            return atributo
+        def comando(*args, **kwargs):
+            verificar_interrupcao()
+            return atributo(*args, **kwargs)
+        return comando
+
+#-------------------------------------------------------------------------------
+
 class Instrumento(object):
     """ Classe genérica para os instrumentos
     Atributos:
@@ -55,7 +109,7 @@ class Instrumento(object):
     def __init__(self, bus, endereco, modelo):
         self.endereco = endereco
         self.bus = bus
-        self.gpib = rm.open_resource("GPIB"+self.bus+"::"+self.endereco+"::INSTR")
+        self.gpib = BarramentoInterrompivel(rm.open_resource("GPIB"+self.bus+"::"+self.endereco+"::INSTR"))
         self.modelo = modelo
 
 #-------------------------------------------------------------------------------
@@ -69,6 +123,7 @@ class Chave(Instrumento):
 
     def __init__(self,bus,endereco,modelo):
         Instrumento.__init__(self, bus, endereco,modelo)
+        self.gpib = estado.EstadoChave(self.gpib, reset)
         self.idn = "METAS AC/DC Switch"
     
     def print_idn(self):
@@ -89,6 +144,8 @@ class Fonte(Instrumento):
     """
     def __init__(self, bus, endereco, modelo, tipo):
         Instrumento.__init__(self, bus, endereco, modelo)
+        # comandos que não alteram o estado da fonte não são enviados
+        self.gpib = estado.EstadoFonte(self.gpib)
         if (tipo != 'AC') & (tipo != 'DC'):
             raise NameError('tipo deve ser AC ou DC')
         
@@ -117,55 +174,10 @@ class Medidor(Instrumento):
             raise NameError('tipo deve ser STD ou DUT')
 
         self.tipo = tipo
-
-        if self.modelo == 'Agilent 3458A':
-            self.gpib.write("OFORMAT ASCII")
-            self.gpib.write("END ALWAYS")
-            self.gpib.write("NPLC 8")
-            self.idn = self.gpib.query("ID?");
-            
-        elif self.modelo == 'Keithley 182A':
-            #self.gpib.write("R0I0B1X")
-            #self.gpib.write("S2N1X")
-            #self.gpib.write("O1P2X")
-            self.idn = "Keithley 182A"
-
-        elif self.modelo == 'Agilent 53132A':
-            self.idn = self.gpib.query("*IDN?");
-            self.gpib.write("*RST")
-            self.gpib.write("*CLS")
-            self.gpib.write("*SRE 0")
-            self.gpib.write("*ESE 0")
-            self.gpib.write(":STAT:PRES")
-            # comandos para throughput máximo
-            self.gpib.write(":FORMAT ASCII")
-            self.gpib.write(":FUNC 'FREQ 1'")
-            self.gpib.write(":EVENT1:LEVEL 0")
-            # configura o gate size (1 s)
-            self.gpib.write(":FREQ:ARM:STAR:SOUR IMM")
-            self.gpib.write(":FREQ:ARM:STOP:SOUR TIM")
-            self.gpib.write(":FREQ:ARM:STOP:TIM 1")
-            # configura para utilizar oscilador interno
-            self.gpib.write(":ROSC:SOUR INT")
-            # desativa interpolador automatico
-            self.gpib.write(":DIAG:CAL:INT:AUTO OFF")
-            # desativa todo o pós-processamento
-            self.gpib.write(":CALC:MATH:STATE OFF")
-            self.gpib.write(":CALC2:LIM:STATE OFF")
-            self.gpib.write(":CALC3:AVER:STATE OFF")
-            self.gpib.write(":HCOPY:CONT OFF")
-            self.gpib.write("*DDT #15FETC?")
-            self.gpib.write(":INIT:CONT ON")
-
-        elif self.modelo == 'Keithley 2182A':
-            self.gpib.write("SENS:CHAN 2")
-            self.gpib.write(":SENS:VOLT:CHAN2:RANG:AUTO ON")
-            self.gpib.write(":SENS:VOLT:NPLC 18")
-            self.gpib.write(":SENS:VOLT:DIG 8")
-            self.idn = self.gpib.query("*IDN?");
-            
-        else:
-            self.idn = self.gpib.query("*IDN?");
+        # driver do modelo, escolhido uma única vez
+        # 182A sem comandos de configuração; 2182A no canal 2
+        self.driver = medidores.criar_driver(self.modelo, self.gpib, comandos=[], canal=2)
+        self.idn = self.driver.inicializar()
         
     def print_idn(self):
         if self.tipo == 'STD':
@@ -180,48 +192,16 @@ class Medidor(Instrumento):
         return
 
     def ler_dados(self):
-        if self.modelo == 'Keithley 182A':
-            x = self.gpib.query("X")
-        elif self.modelo == 'Keithley 2182A':
-            x = self.gpib.query(":FETCH?")
-        elif self.modelo == 'Agilent 53132A':
-            x = self.gpib.query(":FETCH:FREQ?")
-        elif self.modelo == 'Agilent 3458A':
-            x = self.gpib.query("OHM 100E3")
-        return x
+        return self.driver.ler()
 
     def imprimir_dados(self, readings):
-        if self.modelo == 'Keithley 182A':
-            print(self.tipo+" [mV] {:5.6f}".format(float(readings[-1].replace('NDCV','').strip())*1000))
-        elif self.modelo == 'Keithley 2182A':
-            print(self.tipo+" [mV] {:5.6f}".format(float(readings[-1].strip())*1000))
-        elif self.modelo == 'Agilent 53132A':
-            print(self.tipo+" [Hz] {:5.8f}".format(float(readings[-1].strip())))
-        elif self.modelo == 'Agilent 3458A':
-            print(self.tipo+" [ohms] {:5.8f}".format(float(readings[-1].strip())))
+        print(self.tipo+" ["+self.driver.unidade+"] "+self.driver.exibir(readings[-1]))
         return
 
     def mostrar_leituras(self, readings, ciclo):
-        if self.modelo == 'Keithley 182A':
-            if self.tipo == 'STD':
-                self.leiturasPadrao[ciclo].setText("{:5.6f}".format(float(readings[-1].replace('NDCV','').strip())*1000))
-            else:
-                self.leiturasObjeto[ciclo].setText("{:5.6f}".format(float(readings[-1].replace('NDCV','').strip())*1000))
-        elif self.modelo == 'Keithley 2182A':
-            if self.tipo == 'STD':
-                self.leiturasPadrao[ciclo].setText("{:5.6f}".format(float(readings[-1].strip())*1000))
-            else:
-                self.leiturasObjeto[ciclo].setText("{:5.6f}".format(float(readings[-1].strip())*1000))
-        elif self.modelo == 'Agilent 53132A':
-            if self.tipo == 'STD':
-                self.leiturasPadrao[ciclo].setText("{:5.8f}".format(float(readings[-1].strip())))
-            else:
-                self.leiturasObjeto[ciclo].setText("{:5.8f}".format(float(readings[-1].strip())))
-        elif self.modelo == 'Agilent 3458A':
-            if self.tipo == 'STD':
-                self.leiturasPadrao[ciclo].setText("{:5.8f}".format(float(readings[-1].strip())))
-            else:
-                self.leiturasObjeto[ciclo].setText("{:5.8f}".format(float(readings[-1].strip())))
+        # publicada pelo trabalhador (sinal) em leiturasPadrao / leiturasObjeto
+        if trabalhador is not None:
+            trabalhador.leitura.emit(self.tipo, ciclo, self.driver.exibir(readings[-1]))
         return
 
 class Medicao(object):
@@ -233,6 +213,9 @@ class Medicao(object):
     medidor_dut: objeto pyVISA do medidor do objeto
     chave: objeto pyVISA da chave
     """
+    # resultados da medição do n guardados no cache
+    atributos_n = ['X0', 'Xi', 'Y0', 'Yi', 'k', 'nX_array', 'nY_array',
+                   'nX_media', 'nX_desvio', 'nY_media', 'nY_desvio']
 
     def __init__(self, fonte_ac, fonte_dc, medidor_std, medidor_dut, chave):
         # checar se os instrumentos estao inicializados
@@ -247,15 +230,20 @@ class Medicao(object):
         self.medidor_std = medidor_std
         self.medidor_dut = medidor_dut
         self.chave = chave
+        self.estabilizacao = estabilizacao.Estabilizacao()
+        self.aquec = estabilizacao.Aquecimento()
+        self.aquisicao = aquisicao.AquisicaoPareada()
+        self.cache_n = cache_n.CacheN()
+        self.equil = equilibrio_n.EquilibrioN()
+        self.controle = balanco.ControleDC()
+        self.registro = None
 
     def inicializar(self):
         
         # configuração da fonte AC
-        self.fonte_ac.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_ac.gpib.write("OUT 1000 HZ");
+        self.fonte_ac.gpib.saida(v_nominal, 1000);
         # configuração da fonte DC
-        self.fonte_dc.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_dc.gpib.write("OUT 0 HZ");
+        self.fonte_dc.gpib.saida(v_nominal, 0);
         # Entrar em OPERATE
         espera(2); # esperar 2 segundos
         self.fonte_ac.gpib.write("*CLS");
@@ -271,17 +259,45 @@ class Medicao(object):
     # executa o aquecimento, mantendo a tensão nominal aplicada pelo tempo
     # (em segundos) definido na variavel "tempo", alternando entre AC e DC
     # a cada 60 segundos
+    # as saídas são lidas ao final de cada etapa DC; o aquecimento termina
+    # antes se a deriva de padrão e objeto ficar abaixo do limite
         rep = int(tempo / 120);
-        self.fonte_dc.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_dc.gpib.write("OUT 0 HZ");
-        self.fonte_ac.gpib.write("OUT +{:.6f} V".format(v_nominal));
-        self.fonte_ac.gpib.write("OUT 1000 HZ");
+        self.fonte_dc.gpib.saida(v_nominal, 0);
+        self.fonte_ac.gpib.saida(v_nominal, 1000);
+        self.aquec.iniciar()
+        self.aquecimento_estavel = False
+        inicio = relogio.tempo()
 
         for i in range(0,rep):
             self.chave.gpib.write_raw(dc);
             espera(60);
+            if self.aquec.habilitado:
+                par = self.ler_par()
+                valores = [self.medidor_std.driver.converter(par['std']), self.medidor_dut.driver.converter(par['dut'])]
+                if self.aquec.adicionar(relogio.tempo() - inicio, valores):
+                    self.aquecimento_estavel = True
+                    break
             self.chave.gpib.write_raw(ac);
             espera(60);
+        self.tempo_aquecimento = relogio.tempo() - inicio
+        if self.aquecimento_estavel:
+            print("Aquecimento concluído por deriva em {:5.0f} s".format(self.tempo_aquecimento))
+        return
+
+    def registrar_aquecimento(self):
+        # término do aquecimento e curva de deriva (leituras ao final das
+        # etapas DC)
+        registro = self.registro
+        registro.writerow(['Aquecimento']);
+        registro.writerow(['Término do aquecimento','deriva abaixo do limite' if self.aquecimento_estavel else 'tempo configurado']);
+        registro.writerow(['Tempo de aquecimento efetivo [s]',self.tempo_aquecimento]);
+        registro.writerow(['Deriva máxima [ppm/min]',self.aquec.deriva_max]);
+        registro.writerow(['Tempo [s]','STD','DUT','Deriva STD [ppm/min]','Deriva DUT [ppm/min]']);
+        for ponto in self.aquec.curva:
+            derivas = ponto['derivas'] if ponto['derivas'] is not None else ['','']
+            registro.writerow([ponto['tempo']] + ponto['leituras'] + derivas);
+        registro.writerow([' ']);
+        registro.writerow([' ']);
         return
 
     def medir_n(self, M):
@@ -294,8 +310,7 @@ class Medicao(object):
         # variavel da constante V0 / (Vi-V0)
         self.k = []
         # aplica o valor nominal de tensão
-        self.fonte_ac.gpib.write("OUT {:.6f} V".format(v_nominal));
-        self.fonte_ac.gpib.write("OUT "+str(freq)+" HZ");
+        self.fonte_ac.gpib.saida(v_nominal, freq);
         self.fonte_dc.gpib.write("OUT +{:.6f} V".format(v_nominal));
         espera(2); # espera 2 segundos
         self.chave.gpib.write_raw(dc);
@@ -304,8 +319,9 @@ class Medicao(object):
         espera(wait_time);
         # lê as saídas de padrão e objeto, e armazena na variável std_readings e
         # dut_readings
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
+        par = self.ler_ciclo()
+        std_readings.append(par['std'])
+        dut_readings.append(par['dut'])
         self.medidor_std.imprimir_dados(std_readings)
         self.medidor_dut.imprimir_dados(dut_readings)
 
@@ -330,36 +346,23 @@ class Medicao(object):
             espera(wait_time);
             # lê as saídas de padrão e objeto, e armazena na variável std_readings e
             # dut_readings
-            std_readings.append(self.medidor_std.ler_dados())
-            dut_readings.append(self.medidor_dut.ler_dados())
+            par = self.ler_ciclo()
+            std_readings.append(par['std'])
+            dut_readings.append(par['dut'])
             self.medidor_std.imprimir_dados(std_readings)
             self.medidor_dut.imprimir_dados(dut_readings)
                 
         # cálculo do n
         self.chave.gpib.write_raw(ac); # mantém chave em ac durante cálculo
         
-        if self.medidor_std.modelo == '182A':
-            self.X0 = float(std_readings[0].replace('NDCV','').strip())
-        else:
-            self.X0 = float(std_readings[0].strip())
-            
-        if self.medidor_dut.modelo == '182A':
-            self.Y0 = float(dut_readings[0].replace('NDCV','').strip())
-        else:
-            self.Y0 = float(dut_readings[0].strip())
+        self.X0 = self.medidor_std.driver.converter(std_readings[0])
+        self.Y0 = self.medidor_dut.driver.converter(dut_readings[0])
         
         del std_readings[0]
         del dut_readings[0]
 
-        if self.medidor_std.modelo == '182A':
-            self.Xi = numpy.array([float(a.replace('NDCV','').strip()) for a in std_readings]);
-        else:
-            self.Xi = numpy.array([float(a.strip()) for a in std_readings]);
-            
-        if self.medidor_dut.modelo == '182A':    
-            self.Yi = numpy.array([float(a.replace('NDCV','').strip()) for a in dut_readings]);
-        else:
-            self.Yi = numpy.array([float(a.strip()) for a in dut_readings]);
+        self.Xi = self.medidor_std.driver.converter_lote(std_readings);
+        self.Yi = self.medidor_dut.driver.converter_lote(dut_readings);
             
         self.nX_array = (self.Xi/self.X0 - 1) * self.k;
         self.nY_array = (self.Yi/self.Y0 - 1) * self.k;
@@ -371,6 +374,37 @@ class Medicao(object):
         
         return
 
+    def par_conversores(self):
+        # identifica o par de conversores (medidores e endereços) no cache do n
+        return (self.medidor_std.modelo+'@'+self.medidor_std.endereco+'/'+
+                self.medidor_dut.modelo+'@'+self.medidor_dut.endereco)
+
+    def obter_n(self, M):
+        # utiliza o n do cache, se válido; caso contrário, mede o n e guarda
+        # o resultado. A origem do n ('medido' ou 'cache') e o horário da
+        # medição ficam em n_origem e n_horario
+        entrada = self.cache_n.obter(v_nominal, self.par_conversores())
+        if entrada is None:
+            self.medir_n(M)
+            dados = {a: getattr(self, a) for a in self.atributos_n}
+            entrada = self.cache_n.guardar(v_nominal, self.par_conversores(), dados)
+            self.n_origem = 'medido'
+        else:
+            for a in self.atributos_n:
+                setattr(self, a, entrada['dados'][a])
+            self.n_origem = 'cache'
+        self.n_horario = entrada['horario']
+        return
+
+    def verificar_n(self, M):
+        # após o equilíbrio: se a leitura DC do objeto derivou em relação à
+        # frequência em que o n foi medido, o n é medido novamente
+        if not self.cache_n.verificar(v_nominal, self.par_conversores(), self.Ydc_equilibrio):
+            print("Deriva acima do limite em relação ao N do cache. Medindo o N...")
+            self.obter_n(M)
+            return False
+        return True
+
     def equilibrio(self):
         dut_readings = []
         self.fonte_ac.gpib.write("OUT "+str(freq)+" HZ");
@@ -405,12 +439,10 @@ class Medicao(object):
         # cálculo do equilíbrio
         yp = [0.999*v_nominal, 1.001*v_nominal]
 
-        if self.medidor_dut.modelo == '182A':
-            xp = [float(dut_readings[1].replace('NDCV','').strip()), float(dut_readings[2].replace('NDCV','').strip())]
-            xi = float(dut_readings[0].replace('NDCV','').strip())
-        else:
-            xp = [float(dut_readings[1].strip()), float(dut_readings[2].strip())]
-            xi = float(dut_readings[0].strip())
+        xp = [self.medidor_dut.driver.converter(dut_readings[1]), self.medidor_dut.driver.converter(dut_readings[2])]
+        xi = self.medidor_dut.driver.converter(dut_readings[0])
+        # leitura DC do objeto na tensão nominal (deriva em relação ao n do cache)
+        self.Ydc_equilibrio = xi
         # calcula o valor de equilíbrio através de interpolação linear    
         self.vac_atual = numpy.interp(xi,xp,yp);
         self.adj_dc = v_nominal
@@ -420,116 +452,168 @@ class Medicao(object):
         
         return
 
+    def equilibrio_n(self):
+        # equilíbrio a partir do nY do objeto: uma leitura DC e uma leitura AC
+        # (e um passo de Newton, se a correção for grande). Se o n acabou de
+        # ser medido, a leitura DC é a leitura Y0 de medir_n
+        dut_readings = []
+        self.fonte_ac.gpib.saida(v_nominal, freq)
+        self.fonte_dc.gpib.saida(v_nominal, 0)
+        if self.n_origem == 'medido':
+            ydc = self.Y0
+            print("Vdc nominal: leitura Y0 da medição do N")
+        else:
+            self.chave.gpib.write_raw(dc);
+            print("Vdc nominal: +{:.6f} V".format(v_nominal))
+            espera(wait_time);
+            dut_readings.append(self.medidor_dut.ler_dados())
+            self.medidor_dut.imprimir_dados(dut_readings)
+            ydc = self.medidor_dut.driver.converter(dut_readings[-1])
+        self.Ydc_equilibrio = ydc
+        # Aplica Vac nominal
+        vac = v_nominal
+        print("Vac nominal: +{:.6f} V".format(vac))
+        self.chave.gpib.write_raw(ac);
+        espera(wait_time)
+        dut_readings.append(self.medidor_dut.ler_dados())
+        self.medidor_dut.imprimir_dados(dut_readings)
+        self.vac_atual = self.equil.tensao(vac, ydc, self.medidor_dut.driver.converter(dut_readings[-1]), self.nY_media)
+        if self.equil.refinar(vac, self.vac_atual):
+            # passo de Newton: aplica a tensão calculada e repete o cálculo
+            vac = self.vac_atual
+            self.fonte_ac.gpib.saida(vac, freq)
+            print("Vac calculado: +{:.6f} V".format(vac))
+            espera(wait_time)
+            dut_readings.append(self.medidor_dut.ler_dados())
+            self.medidor_dut.imprimir_dados(dut_readings)
+            self.vac_atual = self.equil.tensao(vac, ydc, self.medidor_dut.driver.converter(dut_readings[-1]), self.nY_media)
+        self.chave.gpib.write_raw(dc);
+        self.adj_dc = v_nominal
+
+        if self.vac_atual > 1.1*v_nominal:  # verifica se a tensão AC de equilíbrio não é muito elevada
+            raise NameError('Tensão AC ajustada perigosamente alta!')
+
+        return
+
+    def calcular_equilibrio(self):
+        # equilíbrio a partir do n, se o nY do objeto for confiável; caso
+        # contrário, equilíbrio por interpolação
+        if self.equil.confiavel(self.nY_media, self.nY_desvio):
+            self.metodo_equilibrio = 'n'
+            print("Equilíbrio a partir do N do objeto")
+            self.equilibrio_n()
+        else:
+            self.metodo_equilibrio = 'interpolação'
+            self.equilibrio()
+        return
+
+    def ler_par(self):
+        # leitura pareada: os dois medidores são disparados juntos e as
+        # respostas buscadas em paralelo
+        # retorna {'std', 'dut', 't_std', 't_dut'} (leituras e instantes de disparo)
+        return self.aquisicao.ler(self.medidor_std.driver, self.medidor_dut.driver)
+
+    def ler_ciclo(self):
+        # leitura pareada de uma etapa do ciclo de medição: em rajada se
+        # configurada (amostras > 1), retornando também as incertezas padrão
+        # das médias ('std_u' e 'dut_u')
+        return self.aquisicao.ler_etapa(self.medidor_std.driver, self.medidor_dut.driver)
+
+    def estabilizar(self, tempo_max):
+        # aguarda a estabilização das saídas do padrão e do objeto, limitada
+        # a tempo_max; retorna o tempo de estabilização, em segundos
+        def ler():
+            par = self.ler_par()
+            return [self.medidor_std.driver.converter(par['std']), self.medidor_dut.driver.converter(par['dut'])]
+        resultado = self.estabilizacao.aguardar(tempo_max, ler, espera)
+        if resultado['estavel']:
+            print("Estabilizado em {:5.1f} s".format(resultado['tempo']))
+        return resultado['tempo']
+
+    def ler_etapa(self, readings, tempo, ciclo):
+        # lê padrão e objeto ao final de uma etapa do ciclo de medição e
+        # acrescenta ao dicionário readings as leituras, as incertezas padrão
+        # das médias, o tempo de estabilização e os instantes de disparo
+        par = self.ler_ciclo()
+        readings['std_readings'].append(par['std'])
+        readings['dut_readings'].append(par['dut'])
+        readings['std_u'].append(par['std_u'])
+        readings['dut_u'].append(par['dut_u'])
+        readings['tempos'].append(tempo)
+        readings['instantes'].append([par['t_std'], par['t_dut']])
+        self.medidor_std.imprimir_dados(readings['std_readings'])
+        self.medidor_dut.imprimir_dados(readings['dut_readings'])
+        self.medidor_std.mostrar_leituras(readings['std_readings'],ciclo)
+        self.medidor_dut.mostrar_leituras(readings['dut_readings'],ciclo)
+        return
+
     def medir_acdc(self, ciclo_ac):
         self.vdc_atual = self.adj_dc
         # inicializa arrays de resultados
-        std_readings = []
-        dut_readings = []
+        readings = {'std_readings':[], 'dut_readings':[], 'std_u':[], 'dut_u':[], 'tempos':[], 'instantes':[]}
         # configuração da fonte AC
-        self.fonte_ac.gpib.write("OUT {:.6f} V".format(self.vac_atual))
-        self.fonte_ac.gpib.write("OUT "+str(freq)+" HZ")
+        self.fonte_ac.gpib.saida(self.vac_atual, freq)
         # configuração da fonte DC
-        self.fonte_dc.gpib.write("OUT +{:.6f} V".format(self.vdc_atual))
-        self.fonte_dc.gpib.write("OUT 0 HZ")
+        self.fonte_dc.gpib.saida(self.vdc_atual, 0)
         # Iniciar medição
         espera(2); # esperar 2 segundos
         # Ciclo AC
         # testa se existem dados do último ciclo AC da medição anterior
-        if (ciclo_ac == []):
+        if not ciclo_ac:
             # caso negativo, medir AC normalmente
             self.chave.gpib.write_raw(ac)
             print("Ciclo AC")
-            espera(wait_time);
-            # leituras
-            std_readings.append(self.medidor_std.ler_dados())
-            dut_readings.append(self.medidor_dut.ler_dados())
-            self.medidor_std.imprimir_dados(std_readings)
-            self.medidor_dut.imprimir_dados(dut_readings)
-            self.medidor_std.mostrar_leituras(std_readings,'Ac1')
-            self.medidor_dut.mostrar_leituras(dut_readings,'Ac1')
+            self.ler_etapa(readings, self.estabilizar(wait_time), 'Ac1')
 
         else:
             # caso positivo, aproveitar as medições do ciclo anterior
             print("Ciclo AC")
-            std_readings.append(ciclo_ac[0])
-            dut_readings.append(ciclo_ac[1])
-            self.medidor_std.imprimir_dados(std_readings)
-            self.medidor_dut.imprimir_dados(dut_readings)
-            self.medidor_std.mostrar_leituras(std_readings,'Ac1')
-            self.medidor_dut.mostrar_leituras(dut_readings,'Ac1')
+            for chave in readings:
+                readings[chave].append(ciclo_ac[chave])
+            self.medidor_std.imprimir_dados(readings['std_readings'])
+            self.medidor_dut.imprimir_dados(readings['dut_readings'])
+            self.medidor_std.mostrar_leituras(readings['std_readings'],'Ac1')
+            self.medidor_dut.mostrar_leituras(readings['dut_readings'],'Ac1')
 
         # Ciclo DC
         self.chave.gpib.write_raw(dc);
         print("Ciclo +DC")
-        espera(wait_time);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
-        self.medidor_std.mostrar_leituras(std_readings,'Dcp')
-        self.medidor_dut.mostrar_leituras(dut_readings,'Dcp')
+        self.ler_etapa(readings, self.estabilizar(wait_time), 'Dcp')
 
         # Ciclo AC
         self.chave.gpib.write_raw(ac);
         print("Ciclo AC")
-        espera(wait_time/2);
-        # Mudar fonte DC para -DC
+        espera(2); # esperar 2 segundos
+        # Mudar fonte DC para -DC (a chave isola a fonte DC durante o ciclo AC)
         self.fonte_dc.gpib.write("OUT -{:.6f} V".format(self.vdc_atual));
-        espera(wait_time/2);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
-        self.medidor_std.mostrar_leituras(std_readings,'Ac2')
-        self.medidor_dut.mostrar_leituras(dut_readings,'Ac2')
+        self.ler_etapa(readings, 2 + self.estabilizar(wait_time - 2), 'Ac2')
 
         # Ciclo -DC
         self.chave.gpib.write_raw(dc);
         print("Ciclo -DC")
-        espera(wait_time);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
-        self.medidor_std.mostrar_leituras(std_readings,'Dcm')
-        self.medidor_dut.mostrar_leituras(dut_readings,'Dcm')
+        self.ler_etapa(readings, self.estabilizar(wait_time), 'Dcm')
 
         # Ciclo AC
         self.chave.gpib.write_raw(ac);
         print("Ciclo AC")
-        espera(wait_time/2);
-        # Mudar fonte DC para +DC
+        espera(2); # esperar 2 segundos
+        # Mudar fonte DC para +DC (a chave isola a fonte DC durante o ciclo AC)
         self.fonte_dc.gpib.write("OUT +{:.6f} V".format(self.vdc_atual));
-        espera(wait_time/2);
-
-        std_readings.append(self.medidor_std.ler_dados())
-        dut_readings.append(self.medidor_dut.ler_dados())
-        self.medidor_std.imprimir_dados(std_readings)
-        self.medidor_dut.imprimir_dados(dut_readings)
-        self.medidor_std.mostrar_leituras(std_readings,'Ac3')
-        self.medidor_dut.mostrar_leituras(dut_readings,'Ac3')
+        self.ler_etapa(readings, 2 + self.estabilizar(wait_time - 2), 'Ac3')
 
-        # retorna as leituras obtidas para o objeto e para o padrão
-        self.measurements = {'std_readings':std_readings, 'dut_readings':dut_readings}
+        # retorna as leituras obtidas para o objeto e para o padrão, as
+        # incertezas das leituras, os tempos de estabilização e os instantes
+        self.measurements = readings
         return
 
     def calcular(self):
         # x -> padrao; y -> objeto
         print("Calculando diferença ac-dc...")
 
-        if self.medidor_std.modelo == '182A':
-            self.x = numpy.array([float(a.replace('NDCV','').strip()) for a in self.measurements['std_readings']]);
-        else:
-            self.x = numpy.array([float(a.strip()) for a in self.measurements['std_readings']]);
+        self.x = self.medidor_std.driver.converter_lote(self.measurements['std_readings']);
         # extrai os dados de leitura do objeto
-
-        if self.medidor_dut.modelo == '182A':
-            self.y = numpy.array([float(a.replace('NDCV','').strip()) for a in self.measurements['dut_readings']])
-        else:
-            self.y = numpy.array([float(a.strip()) for a in self.measurements['dut_readings']])
+        self.y = self.medidor_dut.driver.converter_lote(self.measurements['dut_readings'])
+        self.tempos = self.measurements['tempos']
         # calcula Xac, Xdc, Yac e Ydc a partir das leituras brutas    
         Xac = numpy.mean(numpy.array([self.x[0], self.x[2], self.x[4]]));     # AC médio padrão
         Xdc = numpy.mean(numpy.array([self.x[1], self.x[3]]));           # DC médio padrão
@@ -540,23 +624,22 @@ class Medicao(object):
         Y = Yac/Ydc - 1;
         # diferença AC-DC medida:
         self.delta_m = 1e6 * ((X/self.nX_media - Y/self.nY_media)/(1 + Y/self.nY_media));
+        # incerteza padrão do ciclo (aquisição em rajada; nan para single-shot)
+        self.u_dif = aquisicao.incerteza_ciclo(self.x, numpy.array(self.measurements['std_u']), self.nX_media,
+                                               self.y, numpy.array(self.measurements['dut_u']), self.nY_media)
         # critério para repetir a medição - diferença entre Yac e Ydc
 
-        if self.medidor_dut.modelo == '53132A':
-            self.Delta = Yac - Ydc;
-        elif self.medidor_dut.modelo == '3458A':
-            self.Delta = Yac - Ydc;
-        else:
-            self.Delta = 1e6 * (Yac - Ydc);
+        # (em ppm para medidores de tensão)
+        self.Delta = self.medidor_dut.driver.escala_delta * (Yac - Ydc);
 
-        # ajuste da tensão DC para o próximo ciclo
-        self.adj_dc = self.vdc_atual * (1 + (Yac - Ydc)/(self.nY_media * Ydc));
+        # ajuste da tensão DC para o próximo ciclo (controle do balanço)
+        self.adj_dc = self.controle.atualizar(self.vdc_atual, Yac, Ydc);
         
         if self.adj_dc > 1.1*v_nominal:
             raise NameError('Tensão DC ajustada perigosamente alta!') 
 
         # timestamp de cada medição
-        date = datetime.datetime.now();
+        date = relogio.agora();
         self.timestamp = datetime.datetime.strftime(date, '%d/%m/%Y %H:%M:%S');
         return
 
@@ -565,79 +648,234 @@ class Medicao(object):
         espera(1)
         self.fonte_ac.gpib.write("STBY");
         self.fonte_dc.gpib.write("STBY");
+        # fecha o registro de medição (gravação das linhas pendentes)
+        if self.registro is not None:
+            self.registro.fechar()
         return
 
+    def comandos_suprimidos(self):
+        # quantidade de comandos GPIB não enviados às fontes e à chave por
+        # não alterarem o seu estado
+        return self.fonte_ac.gpib.suprimidos + self.fonte_dc.gpib.suprimidos + self.chave.gpib.suprimidos
+
     def criar_registro(self):
-        date = datetime.datetime.now();
+        date = relogio.agora();
         timestamp_file = datetime.datetime.strftime(date, '%d-%m-%Y_%Hh%Mm');
         timestamp_registro = datetime.datetime.strftime(date, '%d/%m/%Y %H:%M:%S');
         # o nome do registro é criado de forma automática, a partir da data e hora atuais
         self.registro_filename = "registro_"+timestamp_file+".csv"
-        
-        with open(self.registro_filename,"w") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow(['pyAC-DC '+versao]);
-            registro.writerow(['Registro de Medições']);
-            registro.writerow([' ']);
-            registro.writerow(['Início da medição',timestamp_registro]);
-            registro.writerow(['Tempo de aquecimento [s]',config['Measurement Config']['aquecimento']]);
-            registro.writerow(['Tempo de estabilização [s]',config['Measurement Config']['wait_time']]);
-            registro.writerow(['Repetições',config['Measurement Config']['repeticoes']]);
-            registro.writerow(['Observações',config['Misc']['observacoes']]);
-            registro.writerow([' ']);
-            registro.writerow([' ']);
-        
-        csvfile.close();
+        # o arquivo permanece aberto até o final da medição
+        self.registro = registro_csv.Registro(self.registro_filename)
+        registro = self.registro
+        registro.writerow(['pyAC-DC '+versao]);
+        registro.writerow(['Registro de Medições']);
+        registro.writerow([' ']);
+        registro.writerow(['Início da medição',timestamp_registro]);
+        registro.writerow(['Tempo de aquecimento [s]',config['Measurement Config']['aquecimento']]);
+        registro.writerow(['Tempo de estabilização [s]',config['Measurement Config']['wait_time']]);
+        registro.writerow(['Repetições',config['Measurement Config']['repeticoes']]);
+        registro.writerow(['Observações',config['Misc']['observacoes']]);
+        registro.writerow([' ']);
+        registro.writerow([' ']);
         return
 
     def registrar_frequencia(self):
-        with open(self.registro_filename,"a") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow(['Tensão [V]',str(v_nominal).replace('.',',')]);
-            registro.writerow(['Frequência [kHz]',str(freq / 1000).replace('.',',')]);
-            registro.writerow([' ']); 
-            registro.writerow(['X0',str(self.X0).replace('.',',')]); 
-            registro.writerow(['Xi'] + [str(i).replace('.',',') for i in self.Xi]); 
-            registro.writerow(['k'] + [str(i).replace('.',',') for i in self.k]); 
-            registro.writerow(['nX'] + [str(i).replace('.',',') for i in self.nX_array]); 
-            registro.writerow(['nX (média)',str(self.nX_media).replace('.',',')]); 
-            registro.writerow(['nX (desvio padrão)',str(self.nX_desvio).replace('.',',')]); 
-            registro.writerow([' ']); 
-            registro.writerow(['Y0',str(self.Y0).replace('.',',')]); 
-            registro.writerow(['Yi'] + [str(i).replace('.',',') for i in self.Yi]); 
-            registro.writerow(['k'] + [str(i).replace('.',',') for i in self.k]); 
-            registro.writerow(['nY'] + [str(i).replace('.',',') for i in self.nY_array]); 
-            registro.writerow(['nY (média)',str(self.nY_media).replace('.',',')]); 
-            registro.writerow(['nY (desvio padrão)',str(self.nY_desvio).replace('.',',')]); 
-            registro.writerow([' ']); 
-            registro.writerow(['Vac equilíbrio [V]',str(self.vac_atual).replace('.',',')]);
-            registro.writerow([' ']); 
-            # cabeçalho da tabela de medicao
-            registro.writerow(['Data / hora','AC (STD)','AC (DUT)','DC+ (STD)','DC+ (DUT)','AC (STD)','AC (DUT)','DC- (STD)','DC- (DUT)','AC (STD)','AC (DUT)', 'Diferença', 'Delta', 'Tensão DC Aplicada']);
-        csvfile.close();
+        registro = self.registro
+        registro.writerow(['Tensão [V]',v_nominal]);
+        registro.writerow(['Frequência [kHz]',freq / 1000]);
+        registro.writerow([' ']); 
+        registro.writerow(['X0',self.X0]); 
+        registro.writerow(['Xi'] + list(self.Xi)); 
+        registro.writerow(['k'] + list(self.k)); 
+        registro.writerow(['nX'] + list(self.nX_array)); 
+        registro.writerow(['nX (média)',self.nX_media]); 
+        registro.writerow(['nX (desvio padrão)',self.nX_desvio]); 
+        registro.writerow([' ']); 
+        registro.writerow(['Y0',self.Y0]); 
+        registro.writerow(['Yi'] + list(self.Yi)); 
+        registro.writerow(['k'] + list(self.k)); 
+        registro.writerow(['nY'] + list(self.nY_array)); 
+        registro.writerow(['nY (média)',self.nY_media]); 
+        registro.writerow(['nY (desvio padrão)',self.nY_desvio]); 
+        registro.writerow(['Origem do n',self.n_origem]); 
+        registro.writerow(['n medido em',datetime.datetime.strftime(self.n_horario, '%d/%m/%Y %H:%M:%S')]); 
+        registro.writerow([' ']); 
+        registro.writerow(['Vac equilíbrio [V]',self.vac_atual]);
+        registro.writerow(['Método do equilíbrio',self.metodo_equilibrio]);
+        registro.writerow([' ']); 
+        # cabeçalho da tabela de medicao
+        registro.writerow(['Data / hora','AC (STD)','AC (DUT)','DC+ (STD)','DC+ (DUT)','AC (STD)','AC (DUT)','DC- (STD)','DC- (DUT)','AC (STD)','AC (DUT)', 'Diferença', 'Delta', 'Tensão DC Aplicada','Estabilização AC [s]','Estabilização DC+ [s]','Estabilização AC [s]','Estabilização DC- [s]','Estabilização AC [s]','Incerteza do ciclo']);
         return
 
     def registrar_linha(self):
 
-        with open(self.registro_filename,"a") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow([self.timestamp,str(self.x[0]).replace('.',','),str(self.y[0]).replace('.',','),str(self.x[1]).replace('.',','),str(self.y[1]).replace('.',','),str(self.x[2]).replace('.',','),str(self.y[2]).replace('.',','),str(self.x[3]).replace('.',','),str(self.y[3]).replace('.',','),str(self.x[4]).replace('.',','),str(self.y[4]).replace('.',','),str(self.delta_m).replace('.',','),str(self.Delta).replace('.',','),str(self.vdc_atual).replace('.',',')]);
+        registro = self.registro
+        registro.writerow([self.timestamp,self.x[0],self.y[0],self.x[1],self.y[1],self.x[2],self.y[2],self.x[3],self.y[3],self.x[4],self.y[4],self.delta_m,self.Delta,self.vdc_atual] + [round(t,1) for t in self.tempos] + [self.u_dif]);
+        return
 
-        csvfile.close();
+    def registrar_media(self,diferenca,parar):
+        # parar: objeto parada.ParadaSequencial da frequência (erro padrão da
+        # média e motivo da parada das repetições)
+        registro = self.registro
+        registro.writerow([' ']);
+        registro.writerow(['Média',numpy.mean(diferenca)]);
+        registro.writerow(['Desvio-padrão',numpy.std(diferenca, ddof=1)]);
+        registro.writerow(['Desvio-padrão da média',parar.estatisticas.erro_padrao()]);
+        registro.writerow(['Pontos aceitos',parar.estatisticas.n]);
+        registro.writerow(['Critério de parada',parar.motivo]);
+        registro.writerow(['Ciclos descartados',self.controle.descartados]);
+        registro.writerow(['Taxa de descarte [%]',self.controle.taxa_descarte()]);
+        registro.writerow([' ']);
+        registro.writerow([' ']);
+        registro.frequencia();  # final da frequência (gravação em disco)
         return
+    
+
+class TrabalhadorMedicao(QObject):
+    """ Sequência de medição, executada numa QThread
+    Os resultados são publicados na interface por sinais (conexões
+    enfileiradas, executadas na thread da interface).
+    Sinais:
+    leitura: tipo ('STD' ou 'DUT'), etapa ('Ac1', 'Dcp', ...) e leitura
+    limpar: final de um ciclo (limpa as leituras)
+    n: nX e nY médios da frequência
+    repeticao: número do ciclo na frequência
+    espera: tempo de espera restante, em segundos
+    erro: mensagem de erro da medição
+    finalizada: final da medição (concluída, interrompida ou com erro)
+    """
+    leitura = pyqtSignal(str, str, str)
+    limpar = pyqtSignal()
+    n = pyqtSignal(float, float)
+    repeticao = pyqtSignal(int)
+    espera = pyqtSignal(int)
+    erro = pyqtSignal(str)
+    finalizada = pyqtSignal()
+
+    def executar(self):
+        setup = None
+        try:
+            setup = Medicao(AC, DC, STD, DUT, SW)
+            self.medir(setup)
+        except relogio.Cancelada:
+            print("Medição interrompida.")
+        except Exception as e:
+            traceback.print_exc()
+            self.erro.emit(str(e))
+        finally:
+            # instrumentos em estado seguro (os comandos não são mais
+            # interrompidos) e fechamento do registro
+            interrupcao.clear()
+            if setup is not None:
+                try:
+                    setup.interromper()
+                except Exception:
+                    traceback.print_exc()
+            self.finalizada.emit()
+        return
+
+    def medir(self, setup):
+        # variaveis globais - parametros
+        global freq
+        # repetições configuradas (parada sequencial desabilitada, como em
+        # parada_config sem a seção [Parada]): sempre 'repeticoes' pontos
+        parar = parada.ParadaSequencial(habilitada=False, minimo=1, maximo=repeticoes)
+
+        print("Colocando fontes em OPERATE...")
+
+        setup.inicializar()
+        print("Criando arquivo de registro...")
+        setup.criar_registro()
+
+        print("Arquivo "+setup.registro_filename+" criado com sucesso!")
+
+        print("Tempo de aquecimento: "+str(heating_time)+" s")
+        print("Iniciando o aquecimento.")
+        setup.aquecimento(heating_time)  # inicia o aquecimento
+        setup.registrar_aquecimento()    # curva de deriva do aquecimento
+
+        # fazer loop para cada valor de frequencia
+        for value in freq_array:
+            freq = float(value) * 1000;
+
+            print("Iniciando a medição...")
+            print("V nominal: {:5.2f} V, f nominal: {:5.2f} Hz".format(v_nominal,freq));
+
+            print("Medindo o N...")
+            setup.obter_n(4)       # 4 repetições para o cálculo do N (ou n do cache)
+            if setup.n_origem == 'cache':
+                print("N do cache, medido em "+datetime.datetime.strftime(setup.n_horario, '%d/%m/%Y %H:%M:%S'))
 
-    def registrar_media(self,diferenca):
+            print("N STD (média): {:5.2f}".format(setup.nX_media))
+            print("N STD (desvio padrão): {:5.2f}".format(setup.nX_desvio))
+            print("N DUT (média): {:5.2f}".format(setup.nY_media))
+            print("N DUT (desvio padrão): {:5.2f}".format(setup.nY_desvio))
 
-        with open(self.registro_filename,"a") as csvfile:
-            registro = csv.writer(csvfile, delimiter=';',lineterminator='\n')
-            registro.writerow([' ']);
-            registro.writerow(['Média',str(numpy.mean(diferenca)).replace('.',',')]);
-            registro.writerow(['Desvio-padrão',str(numpy.std(diferenca, ddof=1)).replace('.',',')]);
-            registro.writerow([' ']);
-            registro.writerow([' ']);
-        csvfile.close();
+            # mostrar o valor do n na interface
+            self.n.emit(setup.nX_media, setup.nY_media)
+
+            print("Equilibrio AC...")
+            setup.calcular_equilibrio()
+            if not setup.verificar_n(4):   # mede o N novamente se houver deriva em relação ao cache
+                print("Equilibrio AC...")
+                setup.calcular_equilibrio()
+                setup.verificar_n(4)
+                self.n.emit(setup.nX_media, setup.nY_media)
+
+            print("Vac aplicado: {:5.6f} V".format(setup.vac_atual))
+
+            setup.registrar_frequencia()     # inicia o registro para a frequencia atual
+
+            print("Iniciando medição...");
+            first_measure = True;            # flag primeira repeticao
+            diff_acdc = [];
+            Delta = [];
+
+            parar.iniciar();
+            setup.controle.iniciar(setup.nY_media);
+            while parar.continuar():  # inicia as repetições da medição
+
+                print ("Vdc aplicado: {:5.6f} V".format(setup.adj_dc))
+                self.repeticao.emit(setup.controle.ciclos + 1)
+
+                if first_measure:    # testa se é a primeira medição
+                    ciclo_ac = [];
+                    first_measure = False
+                else:
+                    ciclo_ac = {chave: setup.measurements[chave][4] for chave in setup.measurements};  # caso não seja, aproveitar o último ciclo AC
+
+                setup.medir_acdc(ciclo_ac)       # ciclo de medicao
+                setup.calcular()                 # calcula da diferenca ac-dc
+
+                print("Diferença ac-dc: {:5.2f}".format(setup.delta_m))
+                print("Delta: {:5.2f}".format(setup.Delta))
+                print("Data / hora: "+setup.timestamp);
+
+                if abs(setup.Delta) > 1:               # se o ponto não passa no critério de descarte, repetir medição
+                    print("Delta > 1. Ponto descartado!")
+                    setup.controle.descartar()
+                else:
+                    diff_acdc.append(setup.delta_m)
+                    Delta.append(setup.Delta)
+                    setup.registrar_linha()
+                    parar.adicionar(setup.delta_m)   # avalia o critério de parada
+
+                self.limpar.emit()
+
+            print("Medição concluída ("+parar.motivo+").")
+
+            print("Resultados:")
+            print("Média: {:5.2f}".format(numpy.mean(diff_acdc)))
+            print("Desvio padrão: {:5.2f}".format(numpy.std(diff_acdc, ddof=1)))
+            print("Desvio padrão da média: {:5.2f}".format(parar.estatisticas.erro_padrao()))
+            print("Ciclos descartados: {:d} de {:d} ({:5.1f} %)".format(setup.controle.descartados, setup.controle.ciclos, setup.controle.taxa_descarte()))
+            print("Salvando arquivo...")
+            setup.registrar_media(diff_acdc, parar)
+
+        print("Comandos GPIB suprimidos (fontes e chave): {:d}".format(setup.comandos_suprimidos()))
+        print("Concluído.")
         return
-    
+
 
 class Configuracoes(QWidget):
     def __init__(self):
@@ -683,6 +921,10 @@ class Configuracoes(QWidget):
         self.medidorDutEndereco.setValue(12)
         self.chaveEndereco.setValue(10)
 
+        # medição em execução (QThread e TrabalhadorMedicao)
+        self.thread = None
+        self.trabalhador = None
+
         self.setWindowTitle("Configurações")
         self.resize(800, 400)
 
@@ -919,7 +1161,7 @@ class Configuracoes(QWidget):
         self.medidorStdModelo = QComboBox()
         self.medidorStdModelo.addItem("Keithley 182A")
         self.medidorStdModelo.addItem("Keithley 2182A")
-        self.medidorStdModelo.addItem("Agilent 3548A")
+        self.medidorStdModelo.addItem("Agilent 3458A")
         self.medidorStdModelo.addItem("Agilent 53132A")
         self.medidorStdEndereco = QSpinBox()
         self.medidorStdEndereco.setMaximum(30)
@@ -934,7 +1176,7 @@ class Configuracoes(QWidget):
         self.medidorDutModelo = QComboBox()
         self.medidorDutModelo.addItem("Keithley 182A")
         self.medidorDutModelo.addItem("Keithley 2182A")
-        self.medidorDutModelo.addItem("Agilent 3548A")
+        self.medidorDutModelo.addItem("Agilent 3458A")
         self.medidorDutModelo.addItem("Agilent 53132A")
         self.medidorDutEndereco = QSpinBox()
         self.medidorDutEndereco.setMaximum(30)
@@ -1076,29 +1318,26 @@ class Configuracoes(QWidget):
         return button
 
     def pararMedicao(self):
-        try:
-                self.setup.interromper()
-                import traceback
-                traceback.print_exc()
-        except:
-                QMessageBox.critical(self, "Erro",
-                "A medição não foi iniciada!",
-                QMessageBox.Abort)
-        
+        # pedido de parada: atendido pelo trabalhador na próxima espera ou no
+        # próximo comando GPIB
+        if (self.thread is None) or not self.thread.isRunning():
+            QMessageBox.critical(self, "Erro",
+            "A medição não foi iniciada!",
+            QMessageBox.Abort)
+            return
+        print("Parando a medição...")
+        interrupcao.set()
+
     def iniciarMedicao(self):
-        # variaveis globais - instrumentos
-        global AC
-        global DC
-        global STD
-        global DUT
-        global SW
         # variaveis globais - parametros
-        global freq
         global freq_array
         global v_nominal
         global repeticoes
         global wait_time
         global heating_time
+        global trabalhador
+        if (self.thread is not None) and self.thread.isRunning():
+            return
         # associar valores aos parametros
         freq_array = self.frequency.text().split(',')
         v_nominal = float(self.voltage.text().strip())
@@ -1110,98 +1349,56 @@ class Configuracoes(QWidget):
         self.repeticoesTotal.setText(str(repeticoes))
         self.esperaTotal.setText(str(wait_time))
 
-        try:
-
-            setup = Medicao(AC, DC, STD, DUT, SW)
-
-            print("Colocando fontes em OPERATE...")
+        # a medição é executada numa thread separada; leituras, n e andamento
+        # chegam à interface pelos sinais do trabalhador
+        interrupcao.clear()
+        self.thread = QThread()
+        trabalhador = TrabalhadorMedicao()
+        trabalhador.moveToThread(self.thread)
+        self.thread.started.connect(trabalhador.executar)
+        trabalhador.leitura.connect(self.mostrarLeitura)
+        trabalhador.limpar.connect(self.limparLeituras)
+        trabalhador.n.connect(self.mostrarN)
+        trabalhador.repeticao.connect(self.mostrarRepeticao)
+        trabalhador.espera.connect(self.mostrarEspera)
+        trabalhador.erro.connect(self.mostrarErro)
+        trabalhador.finalizada.connect(self.thread.quit)
+        self.thread.finished.connect(self.medicaoFinalizada)
+        self.trabalhador = trabalhador
+        self.medir.setEnabled(False)
+        self.thread.start()
+        return
 
-            setup.inicializar()
-            print("Criando arquivo de registro...")
-            setup.criar_registro()
+    def mostrarLeitura(self, tipo, etapa, texto):
+        if tipo == 'STD':
+            self.leiturasPadrao[etapa].setText(texto)
+        else:
+            self.leiturasObjeto[etapa].setText(texto)
 
-            print("Arquivo "+setup.registro_filename+" criado com sucesso!")
+    def limparLeituras(self):
+        for etapa in ['Ac1','Dcp','Ac2','Dcm','Ac3']:
+            self.leiturasPadrao[etapa].setText("")
+            self.leiturasObjeto[etapa].setText("")
 
-            print("Tempo de aquecimento: "+str(heating_time)+" s")
-            print("Iniciando o aquecimento.")
-            setup.aquecimento(heating_time)  # inicia o aquecimento
-                    
-            # fazer loop para cada valor de frequencia
-            for value in freq_array:
-                freq = float(value) * 1000;
+    def mostrarN(self, nX, nY):
+        self.nPadrao.setText("{:5.2f}".format(nX))
+        self.nObjeto.setText("{:5.2f}".format(nY))
 
-                print("Iniciando a medição...")
-                print("V nominal: {:5.2f} V, f nominal: {:5.2f} Hz".format(v_nominal,freq));
+    def mostrarRepeticao(self, repeticao):
+        self.repeticoesCounter.setText(str(repeticao))
 
-                print("Medindo o N...")
-                setup.medir_n(4)       # 4 repetições para o cálculo do N
-                        
-                print("N STD (média): {:5.2f}".format(setup.nX_media))
-                print("N STD (desvio padrão): {:5.2f}".format(setup.nX_desvio))
-                print("N DUT (média): {:5.2f}".format(setup.nY_media))
-                print("N DUT (desvio padrão): {:5.2f}".format(setup.nY_desvio))
+    def mostrarEspera(self, segundos):
+        self.esperaCounter.setText(str(segundos))
 
-                # mostrar o valor do n na interface
-                self.nPadrao.setText("{:5.2f}".format(setup.nX_media))
-                self.nObjeto.setText("{:5.2f}".format(setup.nY_media))
+    def mostrarErro(self, mensagem):
+        QMessageBox.critical(self, "Erro", mensagem, QMessageBox.Abort)
 
-                print("Equilibrio AC...")
-                setup.equilibrio()
-                        
-                print("Vac aplicado: {:5.6f} V".format(setup.vac_atual))
-                        
-                setup.registrar_frequencia()     # inicia o registro para a frequencia atual
-                        
-                print("Iniciando medição...");
-                first_measure = True;            # flag primeira repeticao
-                diff_acdc = [];
-                Delta = [];
-                        
-                i = 0;
-                while (i < repeticoes):  # inicia as repetições da medição
-
-                    print ("Vdc aplicado: {:5.6f} V".format(setup.adj_dc))
-
-                    if first_measure:    # testa se é a primeira medição
-                        ciclo_ac = [];
-                        first_measure = False
-                    else:
-                        ciclo_ac = [setup.measurements['std_readings'][4], setup.measurements['dut_readings'][4]];  # caso não seja, aproveitar o último ciclo AC
-
-                    setup.medir_acdc(ciclo_ac)       # ciclo de medicao
-                    setup.calcular()                 # calcula da diferenca ac-dc
-
-                    print("Diferença ac-dc: {:5.2f}".format(setup.delta_m))               
-                    print("Delta: {:5.2f}".format(setup.Delta))
-                    print("Data / hora: "+setup.timestamp);
-
-                    if abs(setup.Delta) > 1:               # se o ponto não passa no critério de descarte, repetir medição
-                        print("Delta > 1. Ponto descartado!")
-                    else:
-                        diff_acdc.append(setup.delta_m)
-                        Delta.append(setup.Delta)
-                        setup.registrar_linha()
-                        i += 1;
-
-                    for i in ['Ac1','Dcp','Ac2','Dcm','Ac3']:
-                        self.leiturasPadrao[i].setText("")
-                        self.leiturasObjeto[i].setText("")
-                                
-                print("Medição concluída.")                      
-                        
-                print("Resultados:")
-                print("Média: {:5.2f}".format(numpy.mean(diff_acdc)))
-                print("Desvio padrão: {:5.2f}".format(numpy.std(diff_acdc, ddof=1)))
-                print("Salvando arquivo...")
-                registrar_media(diff_acdc)
-
-                setup.interromper()
-                print("Concluído.")
-                    
-        except:
-            self.pararMedicao()
-
-        return
+    def medicaoFinalizada(self):
+        global trabalhador
+        trabalhador = None
+        self.trabalhador = None
+        self.medir.setEnabled(True)
+        self.esperaCounter.setText("")
  
 
 if __name__ == '__main__':
@@ -0,0 +1,171 @@
+# recalculo.py
+# Recálculo offline (vetorizado) da diferença ac-dc a partir das leituras
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# acdc_calc() / Medicao.calcular() calculam um ciclo de cada vez, com o n, o
+# critério de descarte e a ponderação fixados durante a medição.
+#
+# recalcular(dados, ...) recebe todos os ciclos de uma medição (ou de
+# centenas de medições) como arrays - os arrays da exportação (.npz,
+# exportacao.py) ou da importação dos registros (importacao.py) - e calcula
+# numa única passagem vetorizada:
+#
+#     Xac, Xdc, Yac, Ydc - médias ponderadas das etapas AC e DC do ciclo
+#     dif = 1e6 . (X/nX - Y/nY) / (1 + Y/nY),  X = Xac/Xdc - 1, Y = Yac/Ydc - 1
+#     Delta = escala_delta . (Yac - Ydc)
+#     adj_dc = Vdc . (1 + (Yac - Ydc) / (nY . Ydc))  (correção proporcional)
+#
+# e as estatísticas de cada frequência (média, desvio padrão, erro padrão da
+# média e pontos aceitos).
+#
+# Alternativas:
+# nX, nY - escalar, um valor por frequência ou um valor por ciclo (padrão:
+#          o n medido de cada frequência)
+# limite - limite de |Delta| do critério de descarte (None: sem descarte)
+# pesos - pesos das etapas (AC, DC+, AC, DC-, AC): 'media' (média simples,
+#         como na medição), 'simetrico' (AC 1/4, 1/2, 1/4 - o AC central tem o
+#         mesmo peso dos extremos somados) ou uma sequência de 5 pesos
+# maximo - usa somente os primeiros 'maximo' pontos aceitos de cada
+#          frequência
+# ponderacao - 'uniforme' ou 'incerteza' (média ponderada por 1/u_dif^2,
+#              com a aquisição em rajada)
+#
+# O controle do balanço DC (balanco.py) e o critério de parada sequencial
+# (parada.py) dependem da ordem dos ciclos e não são recalculados: adj_dc é
+# a correção proporcional original.
+#-------------------------------------------------------------------------------
+import numpy
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# pesos das etapas do ciclo (AC, DC+, AC, DC-, AC)
+modelos_pesos = {
+    'media': [1/3, 1/2, 1/3, 1/2, 1/3],
+    'simetrico': [1/4, 1/2, 1/2, 1/2, 1/4],
+}
+etapas_ac = [0, 2, 4]
+etapas_dc = [1, 3]
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função por_ciclo(valor, indice, padrao)
+# valor por ciclo a partir de um escalar, de um array por frequência ou de
+# um array por ciclo (None: padrao, por frequência)
+def por_ciclo(valor, indice, padrao):
+    if valor is None:
+        valor = padrao
+    valor = numpy.asarray(valor, dtype=float)
+    if valor.ndim == 0:
+        return numpy.full(len(indice), float(valor))
+    if len(valor) == len(indice):
+        return valor
+    return valor[indice]
+#-------------------------------------------------------------------------------
+# função medias_etapas(leituras, pesos)
+# médias ponderadas das etapas AC e DC de cada ciclo (array ciclos x 5)
+def medias_etapas(leituras, pesos):
+    pesos = numpy.asarray(modelos_pesos.get(pesos, pesos) if isinstance(pesos, str) else pesos, dtype=float)
+    p_ac = pesos[etapas_ac] / numpy.sum(pesos[etapas_ac])
+    p_dc = pesos[etapas_dc] / numpy.sum(pesos[etapas_dc])
+    return leituras[:, etapas_ac] @ p_ac, leituras[:, etapas_dc] @ p_dc
+#-------------------------------------------------------------------------------
+# função posicao_no_grupo(indice, mascara)
+# posição (1, 2, ...) de cada ciclo marcado na sua frequência, na ordem dos
+# ciclos (0 para os ciclos não marcados)
+def posicao_no_grupo(indice, mascara):
+    if len(indice) == 0:
+        return numpy.zeros(0, dtype=int)
+    ordem = numpy.argsort(indice, kind='stable')
+    marcados = mascara[ordem].astype(int)
+    acumulado = numpy.cumsum(marcados)
+    # total acumulado antes do início de cada frequência
+    inicio = numpy.r_[True, indice[ordem][1:] != indice[ordem][:-1]]
+    base = numpy.maximum.accumulate(numpy.where(inicio, acumulado - marcados, 0))
+    posicao = numpy.zeros(len(indice), dtype=int)
+    posicao[ordem] = (acumulado - base) * marcados
+    return posicao
+#-------------------------------------------------------------------------------
+# função estatisticas(indice, valores, mascara, grupos, pesos)
+# média, desvio padrão, erro padrão da média e pontos de cada frequência
+def estatisticas(indice, valores, mascara, grupos, pesos=None):
+    w = mascara.astype(float) if pesos is None else numpy.where(mascara, pesos, 0.0)
+    v = numpy.where(mascara, valores, 0.0)
+    pontos = numpy.bincount(indice, weights=mascara.astype(float), minlength=grupos)
+    soma_w = numpy.bincount(indice, weights=w, minlength=grupos)
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        media = numpy.bincount(indice, weights=w*v, minlength=grupos) / soma_w
+        residuos = numpy.where(mascara, valores - media[indice], 0.0)
+        desvio = numpy.sqrt(numpy.bincount(indice, weights=residuos**2, minlength=grupos) / (pontos - 1))
+        if pesos is None:
+            erro_padrao = desvio / numpy.sqrt(pontos)
+        else:
+            erro_padrao = 1 / numpy.sqrt(soma_w)
+    desvio[pontos < 2] = numpy.nan
+    erro_padrao[pontos < 2] = numpy.nan
+    return {'media':media, 'desvio':desvio, 'erro_padrao':erro_padrao, 'pontos':pontos.astype(int)}
+#-------------------------------------------------------------------------------
+# função recalcular(dados, nX, nY, limite, pesos, escala_delta, maximo, ponderacao)
+# recálculo vetorizado de todos os ciclos
+# dados - dicionário (ou numpy.load) com 'std', 'dut', 'vdc', 'ciclo_indice'
+#         e, para o n padrão, 'n'
+# retorna um dicionário com os arrays por ciclo (Xac, Xdc, Yac, Ydc, dif,
+# Delta, adj_dc, aceito, usado) e por frequência (media, desvio,
+# erro_padrao, pontos)
+def recalcular(dados, nX=None, nY=None, limite=50, pesos='media', escala_delta=1e6, maximo=None,
+               ponderacao='uniforme'):
+    x = numpy.asarray(dados['std'], dtype=float)
+    y = numpy.asarray(dados['dut'], dtype=float)
+    indice = numpy.asarray(dados['ciclo_indice'], dtype=int)
+    grupos = len(dados['n']) if 'n' in dados else (len(indice) and (indice.max() + 1))
+    n_medido = numpy.asarray(dados['n'], dtype=float) if 'n' in dados else numpy.full((grupos, 4), numpy.nan)
+    n_X = por_ciclo(nX, indice, n_medido[:, 0])
+    n_Y = por_ciclo(nY, indice, n_medido[:, 2])
+    Xac, Xdc = medias_etapas(x, pesos)
+    Yac, Ydc = medias_etapas(y, pesos)
+    X = Xac/Xdc - 1
+    Y = Yac/Ydc - 1
+    dif = 1e6 * ((X/n_X - Y/n_Y)/(1 + Y/n_Y))
+    Delta = escala_delta * (Yac - Ydc)
+    adj_dc = numpy.asarray(dados['vdc'], dtype=float) * (1 + (Yac - Ydc)/(n_Y * Ydc))
+    aceito = numpy.isfinite(dif)
+    if limite is not None:
+        aceito &= numpy.abs(Delta) <= limite
+    usado = aceito.copy()
+    if maximo is not None:
+        usado &= posicao_no_grupo(indice, aceito) <= maximo
+    pesos_dif = None
+    if ponderacao == 'incerteza':
+        u = numpy.asarray(dados['u_dif'], dtype=float)
+        pesos_dif = numpy.where(numpy.isfinite(u) & (u > 0), 1 / u**2, 0.0)
+        usado &= pesos_dif > 0
+    resultado = {'Xac':Xac, 'Xdc':Xdc, 'Yac':Yac, 'Ydc':Ydc, 'dif':dif, 'Delta':Delta, 'adj_dc':adj_dc,
+                 'aceito':aceito, 'usado':usado}
+    resultado.update(estatisticas(indice, dif, usado, grupos, pesos_dif))
+    return resultado
+#-------------------------------------------------------------------------------
+
+# execução pela linha de comando: recalcula um arquivo .npz (exportação ou
+# importação) e mostra a média de cada frequência
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Recálculo da diferença ac-dc a partir das leituras (.npz)')
+    parser.add_argument('arquivo', help='arquivo .npz (exportacao.py ou importacao.py)')
+    parser.add_argument('--nX', type=float, default=None, help='n do padrão (padrão: n medido)')
+    parser.add_argument('--nY', type=float, default=None, help='n do objeto (padrão: n medido)')
+    parser.add_argument('--limite', type=float, default=50, help='limite de |Delta| (<= 0: sem descarte)')
+    parser.add_argument('--pesos', default='media', choices=sorted(modelos_pesos), help='pesos das etapas')
+    parser.add_argument('--escala-delta', type=float, default=1e6, help='escala do Delta (1e6 para tensão)')
+    parser.add_argument('--maximo', type=int, default=None, help='pontos por frequência')
+    parser.add_argument('--ponderacao', default='uniforme', choices=['uniforme', 'incerteza'])
+    parser.add_argument('--saida', default=None, help='arquivo .npz com os arrays recalculados')
+    args = parser.parse_args()
+    with numpy.load(args.arquivo) as dados:
+        dados = dict(dados)
+    resultado = recalcular(dados, args.nX, args.nY, args.limite if args.limite > 0 else None, args.pesos,
+                           args.escala_delta, args.maximo, args.ponderacao)
+    for i, freq in enumerate(dados['frequencia']):
+        print("{:10.3f} kHz: {:10.3f} ± {:.3f} ({:d} pontos)".format(
+            freq, resultado['media'][i], resultado['desvio'][i], resultado['pontos'][i]))
+    if args.saida is not None:
+        numpy.savez(args.saida, **resultado)
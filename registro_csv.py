@@ -0,0 +1,98 @@
+# registro_csv.py
+# Escrita do registro de medição (CSV)
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# As funções de registro abriam o arquivo (modo append) e criavam um novo
+# csv.writer a cada linha, convertendo cada valor com str(x).replace('.',',').
+#
+# A classe Registro mantém o arquivo aberto durante toda a medição e formata
+# as linhas com a tabela de tradução do separador decimal (calculada uma
+# única vez): valores numéricos são convertidos com str() e o ponto é
+# substituído pela vírgula; textos são escritos sem alteração. O arquivo
+# gerado é idêntico ao anterior (separador ';', fim de linha '\n').
+#
+# Política de gravação em disco (flush + fsync):
+# linha - a cada linha (padrão: nenhuma linha é perdida em uma interrupção)
+# linhas - a cada 'linhas' linhas
+# frequencia - ao final de cada frequência (e no fechamento)
+#-------------------------------------------------------------------------------
+import csv
+import os
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# tabela de tradução do separador decimal
+virgula = str.maketrans('.', ',')
+#-------------------------------------------------------------------------------
+# função decimal(texto)
+# substitui o ponto decimal pela vírgula em um texto (p. ex. valores lidos
+# do arquivo de configuração)
+def decimal(texto):
+    return texto.translate(virgula)
+#-------------------------------------------------------------------------------
+# função formatar(valor)
+# textos sem alteração; demais valores com str() e vírgula decimal
+def formatar(valor):
+    if isinstance(valor, str):
+        return valor
+    return str(valor).translate(virgula)
+#-------------------------------------------------------------------------------
+
+class Registro(object):
+    """ Registro de medição mantido aberto durante a medição
+    Atributos:
+    nome: nome do arquivo
+    politica: 'linha', 'linhas' ou 'frequencia'
+    linhas: quantidade de linhas entre as gravações (politica = 'linhas')
+    fsync: se True, os dados são sincronizados com o disco (os.fsync)
+    pendentes: linhas escritas desde a última gravação
+    """
+
+    def __init__(self, nome, modo="w", politica='linha', linhas=10, fsync=True):
+        self.nome = nome
+        self.politica = politica
+        self.linhas = max(int(linhas), 1)
+        self.fsync = fsync
+        self.pendentes = 0
+        self.arquivo = open(nome, modo)
+        self.escritor = csv.writer(self.arquivo, delimiter=';', lineterminator='\n')
+
+    def writerow(self, valores):
+        # escreve uma linha (mesma interface do csv.writer)
+        self.escritor.writerow([formatar(v) for v in valores])
+        self.pendentes += 1
+        if (self.politica == 'linha') or ((self.politica == 'linhas') and (self.pendentes >= self.linhas)):
+            self.gravar()
+        return
+
+    def gravar(self):
+        # grava em disco as linhas pendentes
+        self.arquivo.flush()
+        if self.fsync:
+            os.fsync(self.arquivo.fileno())
+        self.pendentes = 0
+        return
+
+    def frequencia(self):
+        # final de uma frequência
+        if self.pendentes > 0:
+            self.gravar()
+        return
+
+    def fechar(self):
+        if not self.arquivo.closed:
+            self.gravar()
+            self.arquivo.close()
+        return
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função registro_config(config, nome, modo)
+# cria o objeto Registro a partir da seção [Registro] do arquivo de
+# configuração (modo "a": retomada de uma medição interrompida)
+def registro_config(config, nome, modo="w"):
+    return Registro(nome, modo,
+                    config.get('Registro', 'politica', fallback='linha').strip().lower(),
+                    config.getint('Registro', 'linhas', fallback=10),
+                    config.getboolean('Registro', 'fsync', fallback=True))
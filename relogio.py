@@ -0,0 +1,178 @@
+# relogio.py
+# Relógio utilizado nas esperas, nos tempos e nos horários das medições
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Todas as esperas (espera(), aquecimento, estabilização, aquisição) e todos
+# os horários registrados passam pelas funções deste módulo:
+#
+# tempo() - tempo monotônico, em segundos
+# instante() - horário atual, em segundos desde a época (time.time())
+# agora() - horário atual (datetime)
+# dormir(segundos) - aguarda o tempo indicado
+# esperar(segundos, evento) - espera com prazo (relógio monotônico): o tempo
+#     de espera é exato, sem o acúmulo dos atrasos de várias esperas curtas.
+#     Se o evento (threading.Event) for sinalizado, a espera é interrompida
+#     imediatamente com a exceção Cancelada; sem evento, a espera pode ser
+#     interrompida pelo teclado (Ctrl-C, KeyboardInterrupt)
+#
+# O relógio em uso é o relógio real (Relogio). Com os instrumentos simulados
+# pode ser usado o relógio virtual (RelogioVirtual), em que dormir() apenas
+# avança o tempo, sem esperar: a sequência completa de medição é executada
+# em segundos e os conversores simulados evoluem de forma consistente com o
+# tempo virtual.
+#
+# Esperas concorrentes (motor assíncrono, motor.py): cada tarefa é um ramo
+# com o seu próprio tempo virtual (variável de contexto 'ramo'), que avança
+# com as esperas do ramo; ao final das tarefas em paralelo, o ramo que as
+# iniciou continua no maior dos tempos (sincronizar()). O tempo virtual
+# decorrido é o maior tempo alcançado pelos ramos, e não a soma das esperas.
+#-------------------------------------------------------------------------------
+import time
+import datetime
+import threading
+import contextvars
+#-------------------------------------------------------------------------------
+
+class Cancelada(Exception):
+    """ Espera interrompida pelo evento de cancelamento
+    """
+    pass
+
+#-------------------------------------------------------------------------------
+
+class Relogio(object):
+    """ Relógio real
+    """
+
+    def tempo(self):
+        return time.monotonic()
+
+    def instante(self):
+        return time.time()
+
+    def agora(self):
+        return datetime.datetime.now()
+
+    def dormir(self, segundos):
+        if segundos > 0:
+            time.sleep(segundos)
+        return
+
+    def sincronizar(self, tempo):
+        # com o relógio real, as tarefas em paralelo já compartilham o tempo
+        return
+
+    def esperar(self, segundos, evento=None):
+        # espera até o prazo; sleep / wait podem retornar antes, por isso o
+        # tempo restante é recalculado a partir do prazo
+        prazo = time.monotonic() + segundos
+        while True:
+            if (evento is not None) and evento.is_set():
+                raise Cancelada('espera cancelada')
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                return
+            if evento is None:
+                time.sleep(restante)
+            else:
+                evento.wait(restante)
+
+#-------------------------------------------------------------------------------
+
+class RelogioVirtual(Relogio):
+    """ Relógio virtual: o tempo só avança com dormir()
+    Atributos:
+    decorrido: tempo virtual decorrido (maior tempo alcançado pelos ramos),
+    em segundos
+    inicio: horário real na criação do relógio
+    """
+
+    def __init__(self, inicio=None):
+        self.decorrido = 0.0
+        self.inicio = inicio if inicio is not None else time.time()
+        self.trava = threading.Lock()
+
+    def tempo(self):
+        t = ramo.get()
+        return self.decorrido if t is None else t
+
+    def instante(self):
+        return self.inicio + self.tempo()
+
+    def agora(self):
+        return datetime.datetime.fromtimestamp(self.instante())
+
+    def dormir(self, segundos):
+        if segundos > 0:
+            with self.trava:
+                t = ramo.get()
+                if t is None:
+                    self.decorrido += segundos
+                else:
+                    ramo.set(t + segundos)
+                    self.decorrido = max(self.decorrido, t + segundos)
+        return
+
+    def sincronizar(self, tempo):
+        # o ramo em curso avança até o tempo indicado (final das tarefas em
+        # paralelo ou liberação de um recurso por outro ramo)
+        with self.trava:
+            t = ramo.get()
+            if (t is not None) and (tempo > t):
+                ramo.set(tempo)
+                self.decorrido = max(self.decorrido, tempo)
+        return
+
+    def esperar(self, segundos, evento=None):
+        if (evento is not None) and evento.is_set():
+            raise Cancelada('espera cancelada')
+        self.dormir(segundos)
+        return
+
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# relógio em uso
+atual = Relogio()
+# tempo virtual do ramo em curso (None fora do motor assíncrono)
+ramo = contextvars.ContextVar('ramo', default=None)
+#-------------------------------------------------------------------------------
+# função usar(relogio)
+# substitui o relógio em uso
+def usar(relogio):
+    global atual
+    atual = relogio
+    return
+#-------------------------------------------------------------------------------
+# funções do relógio em uso
+def tempo():
+    return atual.tempo()
+
+def instante():
+    return atual.instante()
+
+def agora():
+    return atual.agora()
+
+def dormir(segundos):
+    return atual.dormir(segundos)
+
+def esperar(segundos, evento=None):
+    return atual.esperar(segundos, evento)
+
+def sincronizar(tempo):
+    return atual.sincronizar(tempo)
+#-------------------------------------------------------------------------------
+# função iniciar_ramo()
+# inicia o ramo de execução concorrente no tempo atual; retorna o token de
+# encerrar_ramo()
+def iniciar_ramo():
+    return ramo.set(atual.tempo())
+#-------------------------------------------------------------------------------
+# função encerrar_ramo(token)
+# encerra o ramo (o tempo volta a ser o decorrido, o maior tempo dos ramos)
+def encerrar_ramo(token):
+    ramo.reset(token)
+    return
+#-------------------------------------------------------------------------------
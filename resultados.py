@@ -0,0 +1,208 @@
+# resultados.py
+# Banco de dados (SQLite) com o histórico dos resultados de calibração
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# Os resultados de cada frequência (registro_media) ficam espalhados pelos
+# registros CSV, e a identificação dos conversores só aparece no texto livre
+# das observações.
+#
+# O banco guarda, a cada frequência concluída, a média e o desvio padrão da
+# diferença ac-dc, o n e a tensão AC de equilíbrio, identificados pelos
+# conversores padrão e objeto ([Conversores] no arquivo de configuração), pela
+# tensão, pela frequência e pela data. As consultas usam os índices
+# (objeto, tensão, frequência, data) e (padrão, tensão, frequência, data):
+#
+#     banco.consultar(objeto='RST-19', tensao=10, frequencia=100, desde='2020-01-01')
+#
+# Tabelas:
+# medicoes - uma linha por medição (registro CSV)
+# resultados - uma linha por frequência
+# n - n medido (dicionário de n_measure, em JSON), indexado pela tensão e
+#     pelo par de conversores; é a persistência do cache do n (cache_n.py),
+#     de forma que o n continua válido após reiniciar o programa (tempo -
+#     horário da medição, em segundos desde a época)
+#-------------------------------------------------------------------------------
+import datetime
+import json
+import sqlite3
+import diario_medicao
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# estrutura do banco
+esquema = '''
+CREATE TABLE IF NOT EXISTS medicoes (
+    id INTEGER PRIMARY KEY,
+    registro TEXT UNIQUE,
+    inicio TEXT,
+    versao TEXT,
+    padrao TEXT,
+    objeto TEXT,
+    observacoes TEXT
+);
+CREATE TABLE IF NOT EXISTS resultados (
+    id INTEGER PRIMARY KEY,
+    medicao INTEGER REFERENCES medicoes(id),
+    padrao TEXT,
+    objeto TEXT,
+    tensao REAL,
+    frequencia REAL,
+    data TEXT,
+    media REAL,
+    desvio REAL,
+    desvio_media REAL,
+    pontos INTEGER,
+    motivo TEXT,
+    nX REAL,
+    nX_desvio REAL,
+    nY REAL,
+    nY_desvio REAL,
+    vac_equilibrio REAL,
+    metodo_equilibrio TEXT
+);
+CREATE INDEX IF NOT EXISTS resultados_objeto ON resultados (objeto, tensao, frequencia, data);
+CREATE INDEX IF NOT EXISTS resultados_padrao ON resultados (padrao, tensao, frequencia, data);
+CREATE TABLE IF NOT EXISTS n (
+    id INTEGER PRIMARY KEY,
+    tensao REAL,
+    par TEXT,
+    tempo REAL,
+    dados TEXT
+);
+CREATE INDEX IF NOT EXISTS n_par ON n (tensao, par, tempo);
+'''
+#-------------------------------------------------------------------------------
+# função data_texto(valor)
+# data (datetime ou texto 'AAAA-MM-DD...') no formato do banco
+def data_texto(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.isoformat(timespec='seconds')
+    if isinstance(valor, datetime.date):
+        return valor.isoformat()
+    return str(valor)
+#-------------------------------------------------------------------------------
+
+class Resultados(object):
+    """ Banco de dados dos resultados
+    Atributos:
+    arquivo: arquivo do banco (SQLite)
+    habilitado: se False, nada é gravado e as consultas retornam []
+    padrao, objeto: identificação dos conversores da medição atual
+    """
+
+    def __init__(self, arquivo='resultados.db', habilitado=True, padrao='', objeto=''):
+        self.arquivo = arquivo
+        self.habilitado = habilitado
+        self.padrao = padrao
+        self.objeto = objeto
+        self.conexao = None
+        if habilitado:
+            self.conexao = sqlite3.connect(arquivo)
+            self.conexao.row_factory = sqlite3.Row
+            self.conexao.executescript(esquema)
+
+    def iniciar_medicao(self, registro, inicio, versao, observacoes):
+        # registra a medição (ou a encontra, na retomada) e retorna o seu id
+        if not self.habilitado:
+            return None
+        with self.conexao:
+            self.conexao.execute('INSERT OR IGNORE INTO medicoes (registro, inicio, versao, padrao, objeto, observacoes) '
+                                 'VALUES (?, ?, ?, ?, ?, ?)',
+                                 (registro, data_texto(inicio), versao, self.padrao, self.objeto, observacoes))
+        return self.conexao.execute('SELECT id FROM medicoes WHERE registro = ?', (registro,)).fetchone()['id']
+
+    def adicionar(self, medicao, tensao, frequencia, data, diferenca, desvio_media, pontos, motivo,
+                  n_value, vac_equilibrio, metodo):
+        # resultado de uma frequência (gravado imediatamente)
+        # diferenca - (média, desvio padrão) da diferença ac-dc
+        # n_value - média e desvio padrão de nX e nY
+        if not self.habilitado:
+            return
+        with self.conexao:
+            self.conexao.execute('INSERT INTO resultados (medicao, padrao, objeto, tensao, frequencia, data, media, '
+                                 'desvio, desvio_media, pontos, motivo, nX, nX_desvio, nY, nY_desvio, '
+                                 'vac_equilibrio, metodo_equilibrio) '
+                                 'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                 (medicao, self.padrao, self.objeto, float(tensao), float(frequencia),
+                                  data_texto(data), float(diferenca[0]), float(diferenca[1]), float(desvio_media),
+                                  int(pontos), motivo) + tuple(float(v) for v in n_value) +
+                                 (float(vac_equilibrio), metodo))
+        return
+
+    def consultar(self, objeto=None, padrao=None, tensao=None, frequencia=None, desde=None, ate=None):
+        # resultados com os critérios informados (None: qualquer valor), em
+        # ordem cronológica; frequência em kHz
+        if not self.habilitado:
+            return []
+        condicoes = []
+        valores = []
+        for coluna, valor in [('objeto', objeto), ('padrao', padrao), ('tensao', tensao), ('frequencia', frequencia)]:
+            if valor is not None:
+                condicoes.append(coluna + ' = ?')
+                valores.append(valor)
+        if desde is not None:
+            condicoes.append('data >= ?')
+            valores.append(data_texto(desde))
+        if ate is not None:
+            condicoes.append('data <= ?')
+            valores.append(data_texto(ate))
+        sql = 'SELECT * FROM resultados'
+        if condicoes:
+            sql += ' WHERE ' + ' AND '.join(condicoes)
+        return [dict(linha) for linha in self.conexao.execute(sql + ' ORDER BY data', valores)]
+
+    def equilibrio(self, tensao, frequencia):
+        # última tensão AC de equilíbrio do par de conversores atual (ou None)
+        if not self.habilitado:
+            return None
+        linha = self.conexao.execute('SELECT vac_equilibrio FROM resultados WHERE objeto = ? AND tensao = ? AND '
+                                     'frequencia = ? AND padrao = ? ORDER BY data DESC LIMIT 1',
+                                     (self.objeto, float(tensao), float(frequencia), self.padrao)).fetchone()
+        return None if linha is None else linha['vac_equilibrio']
+
+    def guardar_n(self, tensao, par, tempo, dados):
+        # n medido (persistência do cache do n); dados inclui o horário da
+        # medição ('horario')
+        if not self.habilitado:
+            return
+        with self.conexao:
+            self.conexao.execute('INSERT INTO n (tensao, par, tempo, dados) VALUES (?, ?, ?, ?)',
+                                 (float(tensao), par, tempo, json.dumps(dados, default=diario_medicao.serializar)))
+        return
+
+    def ultimo_n(self, tensao, par, tempo_min, tempo_max):
+        # n mais recente medido entre tempo_min e tempo_max (horários, em
+        # segundos desde a época): (tempo, dados) ou None
+        if not self.habilitado:
+            return None
+        linha = self.conexao.execute('SELECT tempo, dados FROM n WHERE tensao = ? AND par = ? AND tempo >= ? '
+                                     'AND tempo <= ? ORDER BY tempo DESC LIMIT 1',
+                                     (float(tensao), par, tempo_min, tempo_max)).fetchone()
+        if linha is None:
+            return None
+        return linha['tempo'], diario_medicao.ler_n(json.loads(linha['dados']))
+
+    def fechar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+            self.conexao = None
+        return
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função resultados_config(config)
+# cria o objeto Resultados a partir das seções [Resultados] e [Conversores]
+# do arquivo de configuração. Sem a seção [Resultados], nenhum banco é criado.
+# Com os instrumentos simulados ([Simulacao] habilitar = true), os resultados
+# vão para um banco separado (arquivo_simulacao): o banco real alimenta a
+# tensão inicial do equilíbrio e o cache do n.
+def resultados_config(config):
+    if config.getboolean('Simulacao', 'habilitar', fallback=False):
+        arquivo = config.get('Resultados', 'arquivo_simulacao', fallback='resultados_simulacao.db')
+    else:
+        arquivo = config.get('Resultados', 'arquivo', fallback='resultados.db')
+    return Resultados(arquivo.strip(),
+                      config.getboolean('Resultados', 'habilitar', fallback=False),
+                      config.get('Conversores', 'padrao', fallback='').strip(),
+                      config.get('Conversores', 'objeto', fallback='').strip())
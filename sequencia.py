@@ -0,0 +1,323 @@
+# sequencia.py
+# Sequências de medição declaradas na configuração e o seu plano temporizado
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# A sequência do ciclo de medição (AC, +DC, AC, -DC, AC) era fixa em
+# measure(), com o aproveitamento da última leitura AC (ciclo_ac) e a troca
+# da polaridade da fonte DC durante as etapas AC escritos caso a caso.
+#
+# Uma sequência é uma lista de etapas (seção [Sequencia] do arquivo de
+# configuração), por exemplo 'AC, DC+, AC, DC-, AC':
+#
+# AC - fonte AC na tensão e frequência do ponto, chave em AC
+# DC+ / DC- - fonte DC com a polaridade indicada, chave em DC
+# ACR - fonte DC em AC, na frequência de referência (transferência AC-AC),
+#       chave em DC
+# sufixo :fator - multiplica a tensão nominal (p. ex. DC+:1.01, medição do n)
+#
+# A medição do n é uma sequência DC sem repetição e com espera fixa, iniciada
+# na tensão nominal ('n', 'n_invertida' ou a lista de etapas em [Sequencia] n).
+#
+# compilar() transforma a sequência num plano temporizado (Plano):
+#
+# - no início de cada ciclo as fontes são programadas com a primeira
+#   condição utilizada no ciclo, seguida da guarda;
+# - uma mudança de condição de uma fonte é antecipada para a etapa anterior,
+#   se nela a chave isola a fonte (executada após a guarda da comutação,
+#   durante a estabilização); a mudança para o primeiro uso do ciclo
+#   seguinte é antecipada para a última etapa do ciclo;
+# - se a fonte está conectada na etapa anterior, a mudança é feita num
+#   transitório: a chave é comutada para a outra fonte, a fonte é programada
+#   entre duas guardas e a chave volta à posição da etapa;
+# - nos ciclos seguintes, a fonte conectada pela chave na última etapa do
+#   ciclo anterior não é reprogramada no início do ciclo: a mudança é
+#   antecipada ou, se o ciclo inicia com a mesma fonte (p. ex. DC+, AC,
+#   DC-), feita num transitório no primeiro passo;
+# - se a primeira e a última etapas são iguais (e reaproveitar = true), a
+#   última leitura de um ciclo é a primeira do ciclo seguinte.
+#
+# Plano.duracao() estima a duração de um ciclo, e duracao_frequencia() a de
+# uma frequência (com a estabilização adaptativa, o tempo de espera é o
+# limite superior de cada etapa).
+#-------------------------------------------------------------------------------
+import re
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# sequências padrão
+sequencias_padrao = {
+    'acdc': 'AC, DC+, AC, DC-, AC',
+    'acdc_invertida': 'AC, DC-, AC, DC+, AC',
+    'acac': 'AC, ACR, AC, ACR, AC',
+    'n': 'DC+, DC+:1.01, DC+:0.99, DC+:1.01, DC+:0.99',
+    'n_invertida': 'DC-, DC-:1.01, DC-:0.99, DC-:1.01, DC-:0.99',
+}
+# condição das fontes não utilizadas na sequência (tensão nominal)
+etapas_nominais = {'fonte_ac': 'AC', 'fonte_dc': 'DC+'}
+# texto de uma etapa
+formato_etapa = re.compile(r'^(AC|ACR|DC\+|DC-)(?::([-+]?[0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?))?$', re.IGNORECASE)
+#-------------------------------------------------------------------------------
+
+class Etapa(object):
+    """ Etapa de uma sequência de medição
+    Atributos:
+    nome: texto da etapa ('AC', 'DC+', 'DC-:1.01', ...)
+    posicao: posição da chave ('AC' ou 'DC')
+    fonte: fonte conectada pela chave ('fonte_ac' ou 'fonte_dc')
+    sinal: polaridade da tensão (+1 ou -1)
+    fator: fator da tensão nominal
+    frequencia: 'ponto' (frequência do ponto de medição), 'referencia' ou
+    'dc'
+    teste: True nas etapas da grandeza em teste (AC na frequência do ponto)
+    """
+
+    def __init__(self, nome):
+        m = formato_etapa.match(nome.strip())
+        if m is None:
+            raise ValueError('etapa desconhecida: '+nome)
+        tipo = m.group(1).upper()
+        self.nome = nome.strip().upper()
+        self.tipo = tipo
+        self.fator = float(m.group(2)) if m.group(2) is not None else 1.0
+        self.sinal = -1 if tipo == 'DC-' else 1
+        if tipo == 'AC':
+            self.posicao = 'AC'
+            self.fonte = 'fonte_ac'
+            self.frequencia = 'ponto'
+        else:
+            self.posicao = 'DC'
+            self.fonte = 'fonte_dc'
+            self.frequencia = 'referencia' if tipo == 'ACR' else 'dc'
+        self.teste = (tipo == 'AC')
+
+    def condicao(self):
+        # condição da fonte (comparação entre etapas)
+        return (self.sinal, self.fator, self.frequencia)
+
+    def ajuste(self, tensao, frequencia, referencia):
+        # tensão e frequência da fonte na etapa
+        # tensao - tensão nominal da fonte; frequencia - frequência do ponto
+        # (Hz); referencia - frequência de referência (Hz)
+        f = {'ponto':frequencia, 'referencia':referencia, 'dc':0}[self.frequencia]
+        return self.sinal * self.fator * tensao, f
+
+    def rotulo(self):
+        # texto exibido na tela ('AC', '+DC', '-DC', ...)
+        texto = {'AC':'AC', 'ACR':'AC (referência)', 'DC+':'+DC', 'DC-':'-DC'}[self.tipo]
+        if self.fator != 1.0:
+            texto += ' ({:g} x nominal)'.format(self.fator)
+        return texto
+
+    def coluna(self):
+        # texto da etapa no cabeçalho do registro ('AC', 'DC+', ...)
+        return self.tipo if self.fator == 1.0 else self.tipo + ':{:g}'.format(self.fator)
+
+    def constante_n(self):
+        # constante V0 / (Vi - V0) da medição do n (100 para +1 %)
+        k = round(1 / (self.fator - 1), 6)
+        return int(k) if k == int(k) else k
+
+#-------------------------------------------------------------------------------
+
+class Passo(object):
+    """ Execução de uma etapa no plano
+    Atributos:
+    indice: índice da etapa na sequência
+    etapa: objeto Etapa
+    transitorio: True se a fonte da etapa é reprogramada com a chave na
+    outra posição antes da etapa
+    antecipados: lista de (fonte, índice da etapa) programadas durante a
+    estabilização desta etapa (fonte isolada pela chave)
+    """
+
+    def __init__(self, indice, etapa):
+        self.indice = indice
+        self.etapa = etapa
+        self.transitorio = False
+        self.antecipados = []
+
+#-------------------------------------------------------------------------------
+
+class Plano(object):
+    """ Plano temporizado de uma sequência de medição
+    Atributos:
+    etapas: lista de objetos Etapa
+    guarda: intervalo entre a comutação da chave e a programação de uma
+    fonte, em segundos
+    reaproveitar: True se a última leitura de um ciclo é a primeira do ciclo
+    seguinte
+    estabilizar: True se as etapas aguardam a estabilização (False: espera
+    fixa)
+    primeiro, seguinte: listas de Passo do primeiro ciclo e dos ciclos
+    seguintes
+    inicio_primeiro, inicio_seguinte: dicionários fonte -> índice da etapa
+    com a condição programada no início do ciclo
+    """
+
+    def __init__(self, etapas, guarda, reaproveitar, estabilizar):
+        self.etapas = etapas
+        self.guarda = guarda
+        self.reaproveitar = reaproveitar
+        self.estabilizar = estabilizar
+        self.primeiro = []
+        self.seguinte = []
+        self.inicio_primeiro = {}
+        self.inicio_seguinte = {}
+
+    def indices_teste(self):
+        return [i for i, etapa in enumerate(self.etapas) if etapa.teste]
+
+    def indices_referencia(self):
+        return [i for i, etapa in enumerate(self.etapas) if not etapa.teste]
+
+    def passos(self, primeiro):
+        return self.primeiro if primeiro else self.seguinte
+
+    def inicio(self, primeiro):
+        return self.inicio_primeiro if primeiro else self.inicio_seguinte
+
+    def programacao_inicial(self, primeiro):
+        # lista de (fonte, Etapa) programadas no início do ciclo (fonte AC e
+        # depois fonte DC)
+        inicio = self.inicio(primeiro)
+        return [(fonte, self.etapas[inicio[fonte]] if fonte in inicio else Etapa(etapas_nominais[fonte]))
+                for fonte in ['fonte_ac', 'fonte_dc']]
+
+    def duracao(self, espera, primeiro=True):
+        # duração estimada de um ciclo, em segundos (espera - tempo de
+        # espera de cada etapa)
+        passos = self.passos(primeiro)
+        return self.guarda + sum(espera + 2*self.guarda*p.transitorio for p in passos)
+
+    def duracao_frequencia(self, espera, ciclos):
+        # duração estimada de uma frequência com a quantidade de ciclos
+        if ciclos < 1:
+            return 0.0
+        return self.duracao(espera, True) + (ciclos - 1) * self.duracao(espera, False)
+
+    def descrever(self):
+        # texto do plano (um passo por linha)
+        linhas = []
+        for titulo, passos, inicio in [('Primeiro ciclo', self.primeiro, self.inicio_primeiro),
+                                       ('Ciclos seguintes', self.seguinte, self.inicio_seguinte)]:
+            linhas.append(titulo+': início '+', '.join(f+' = '+self.etapas[i].nome for f, i in sorted(inicio.items())))
+            for p in passos:
+                texto = '  '+p.etapa.nome
+                if p.transitorio:
+                    texto += ' (transitório)'
+                if p.antecipados:
+                    texto += ' [antecipa '+', '.join(f+' = '+self.etapas[i].nome for f, i in p.antecipados)+']'
+                linhas.append(texto)
+        return '\n'.join(linhas)
+
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função etapas(texto)
+# lista de objetos Etapa a partir do nome de uma sequência padrão ou da
+# lista de etapas separadas por vírgulas
+def etapas(texto):
+    texto = sequencias_padrao.get(texto.strip().lower(), texto)
+    lista = [Etapa(nome) for nome in texto.split(',') if nome.strip()]
+    if not lista:
+        raise ValueError('sequência vazia')
+    return lista
+#-------------------------------------------------------------------------------
+# função sequencia_n(M, polaridade)
+# sequência da medição do n: tensão nominal e M etapas alternadas em +1 % e
+# -1 % (M par)
+def sequencia_n(M, polaridade='DC+'):
+    if int(M) % 2 != 0:
+        M += 1
+    return polaridade+', ' + ', '.join(polaridade+(':1.01' if i % 2 else ':0.99') for i in range(1, M+1))
+#-------------------------------------------------------------------------------
+# função ordem_execucao(lista, primeiro, reaproveitar)
+# índices das etapas executadas num ciclo
+def ordem_execucao(lista, primeiro, reaproveitar):
+    if reaproveitar and not primeiro:
+        return list(range(1, len(lista)))
+    return list(range(len(lista)))
+#-------------------------------------------------------------------------------
+# função compilar(lista, guarda, reaproveitar, ciclico, estabilizar)
+# compila a sequência (lista de Etapa) no plano temporizado
+# ciclico - True se a sequência é repetida (as mudanças para o ciclo
+#           seguinte são antecipadas para o final do ciclo)
+def compilar(lista, guarda=2, reaproveitar=True, ciclico=True, estabilizar=True):
+    reaproveitar = (reaproveitar and ciclico and (len(lista) > 1) and
+                    (lista[0].nome == lista[-1].nome))
+    plano = Plano(lista, guarda, reaproveitar, estabilizar)
+    for primeiro in [True, False]:
+        ordem = ordem_execucao(lista, primeiro, reaproveitar)
+        passos = [Passo(i, lista[i]) for i in ordem]
+        # condições programadas no início do ciclo: primeiro uso de cada fonte
+        # (fontes não utilizadas: condição nominal, conectada nos transitórios)
+        inicio = {}
+        for i in ordem:
+            inicio.setdefault(lista[i].fonte, i)
+        # sequência no tempo: no primeiro ciclo, o ciclo e, se repetido, o
+        # primeiro passo do ciclo seguinte; nos ciclos seguintes, o ciclo
+        # precedido do ciclo anterior (condições das fontes e posição da chave
+        # no início do ciclo)
+        tempo = list(ordem)
+        inicial = 1
+        conectada = None
+        if ciclico and not primeiro:
+            tempo = ordem + ordem
+            inicial = len(ordem)
+            # a fonte conectada pela chave no início do ciclo não é
+            # reprogramada: a mudança é feita no ciclo (antecipada ou num
+            # transitório)
+            conectada = lista[ordem[-1]].fonte
+            if lista[inicio[conectada]].condicao() != lista[ordem[-1]].condicao():
+                inicio[conectada] = ordem[-1]
+        elif ciclico:
+            tempo.append(ordem_execucao(lista, False, reaproveitar)[0])
+        for k in range(inicial, len(tempo)):
+            etapa = lista[tempo[k]]
+            anteriores = [lista[i] for i in tempo[:k] if lista[i].fonte == etapa.fonte]
+            if (not anteriores) or (anteriores[-1].condicao() == etapa.condicao()):
+                continue
+            if (not primeiro) and (k > inicial) and (etapa.fonte != conectada) and all(lista[i].fonte != etapa.fonte for i in tempo[inicial:k]):
+                # primeiro uso da fonte isolada, programado no início do ciclo
+                continue
+            if lista[tempo[k-1]].posicao != etapa.posicao:
+                # fonte isolada na etapa anterior: mudança antecipada
+                passos[(k-1) % len(passos)].antecipados.append((etapa.fonte, tempo[k]))
+            elif (k < len(ordem)) or not primeiro:
+                # no primeiro ciclo, o transitório do primeiro passo do ciclo
+                # seguinte pertence ao plano dos ciclos seguintes
+                passos[k % len(passos)].transitorio = True
+        if primeiro:
+            plano.primeiro = passos
+            plano.inicio_primeiro = inicio
+        else:
+            plano.seguinte = passos
+            plano.inicio_seguinte = inicio
+    return plano
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função sequencia_config(config, guarda)
+# plano do ciclo de medição a partir da seção [Sequencia] do arquivo de
+# configuração (padrão: AC, DC+, AC, DC-, AC)
+def sequencia_config(config, guarda=2):
+    lista = etapas(config.get('Sequencia', 'ciclo', fallback='acdc'))
+    if all(etapa.teste for etapa in lista) or not any(etapa.teste for etapa in lista):
+        raise ValueError('a sequência do ciclo deve ter etapas AC e etapas de referência (DC ou ACR)')
+    return compilar(lista, guarda, config.getboolean('Sequencia', 'reaproveitar', fallback=True))
+#-------------------------------------------------------------------------------
+# função sequencia_n_config(config, M, guarda)
+# plano da medição do n (etapas DC, espera fixa, sem repetição); a seção
+# [Sequencia] pode definir a lista de etapas em 'n'
+def sequencia_n_config(config, M, guarda=2):
+    texto = config.get('Sequencia', 'n', fallback='').strip()
+    lista = etapas(texto if texto else sequencia_n(M))
+    if (lista[0].fator != 1.0) or any(etapa.fator == 1.0 for etapa in lista[1:]):
+        raise ValueError('a sequência do n deve iniciar na tensão nominal, seguida de etapas com fator')
+    return compilar(lista, guarda, reaproveitar=False, ciclico=False, estabilizar=False)
+#-------------------------------------------------------------------------------
+# função referencia_config(config)
+# frequência de referência das etapas ACR, em Hz
+def referencia_config(config):
+    return 1000 * config.getfloat('Sequencia', 'referencia', fallback=1)
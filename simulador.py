@@ -0,0 +1,463 @@
+# simulador.py
+# Instrumentos simulados para executar o pyAC-DC sem barramento GPIB
+#-------------------------------------------------------------------------------
+# Versão inicial:      16-Oct-2026
+#-------------------------------------------------------------------------------
+# O ResourceManager simulado substitui o do pyVISA: open_resource() devolve
+# objetos com write, read, query, write_raw, read_raw e read_bytes, que
+# respondem aos mesmos comandos enviados pelo programa:
+#
+# 5720A - *IDN?, OUT <V> V, OUT <f> HZ, OUT <V> V, <f> HZ, OPER, STBY
+# chave METAS - chr(2) (reset), chr(4) (ac), chr(6) (dc)
+# 182A - leitura a cada endereçamento para falar (NDCV+x.xxxxxxxE-03)
+# 2182A - :FETCH?, buffer TRACe, :FORM:DATA REAL,32
+# 53132A - :FETCH:FREQ?, estatística :CALC3:AVER
+# 3458A - OHM 100E3, MEM FIFO / NRDGS / TRIG SGL / MCOUNT? / RMEM, OFORMAT
+#
+# Os conversores térmicos do padrão e do objeto são modelados por
+#
+#   E = k * Veff^n, com k tal que E(V nominal) = saida
+#
+# Veff = V / (1 + dif(f)*1e-6) em AC e Veff = |V| * (1 +- reversao/2*1e-6)
+# em DC. A saída tende exponencialmente (constante de tempo tau) ao valor de
+# regime, deriva linearmente no tempo (ppm/min) e as leituras têm ruído
+# gaussiano (ppm). O contador (53132A) e o multímetro (3458A) leem saídas
+# proporcionais a E (TCs com saída em frequência e em resistência).
+#
+# A constante de tempo padrão (3 s) é pequena em relação ao tempo de espera
+# (wait_time = 60 s): o resíduo dos degraus de 1 % da medição do n e do
+# equilíbrio fica abaixo de 0,1 ppm, e a simulação não apresenta erros de
+# estabilização como resultado.
+#
+# Os parâmetros ficam na seção [Simulacao] do arquivo de configuração. Com
+# relogio_virtual = true a simulação usa o relógio virtual (relogio.py).
+#-------------------------------------------------------------------------------
+import re
+import threading
+import numpy
+import estado
+import relogio
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# comandos da chave (em ASCII puro)
+reset = chr(2)
+ac = chr(4)
+dc = chr(6)
+# escala das saídas em frequência [Hz/V] e em resistência [ohm/V]
+escala_frequencia = 1e6
+escala_resistencia = 1e7
+#-------------------------------------------------------------------------------
+
+class Conversor(object):
+    """ Modelo de um conversor térmico (TC)
+    Atributos:
+    n: coeficiente de linearidade
+    tau: constante de tempo, em segundos
+    frequencias: frequências da curva de diferença ac-dc, em Hz
+    diferencas: diferença ac-dc em cada frequência, em ppm
+    saida: saída na tensão nominal, em V
+    reversao: diferença entre as saídas em +DC e -DC, em ppm
+    deriva: deriva da saída, em ppm/min
+    ruido: ruído das leituras, em ppm
+    """
+
+    def __init__(self, v_nominal, n=1.8, tau=3, frequencias=(1000,), diferencas=(0,),
+                 saida=0.007, reversao=0, deriva=0, ruido=0):
+        self.n = n
+        self.tau = tau
+        self.frequencias = numpy.array(frequencias, dtype=float)
+        self.diferencas = numpy.array(diferencas, dtype=float)
+        self.saida = saida
+        self.reversao = reversao
+        self.deriva = deriva
+        self.ruido = ruido
+        self.k = saida / v_nominal**n
+        self.E = 0.0
+        self.t = None
+
+    def diferenca(self, frequencia):
+        # diferença ac-dc na frequência, em ppm (interpolação linear)
+        return numpy.interp(frequencia, self.frequencias, self.diferencas)
+
+    def regime(self, tensao, frequencia):
+        # saída em regime para a tensão aplicada (frequencia = 0 em DC)
+        if tensao == 0:
+            return 0.0
+        if frequencia > 0:
+            veff = abs(tensao) / (1 + self.diferenca(frequencia)*1e-6)
+        else:
+            veff = abs(tensao) * (1 + numpy.sign(tensao)*self.reversao*0.5e-6)
+        return self.k * veff**self.n
+
+    def evoluir(self, t, alvo):
+        # aproxima a saída do valor de regime alvo até o instante t
+        # (com o motor assíncrono, um ramo do relógio virtual pode chegar com
+        # um instante anterior ao da última atualização: a saída não recua)
+        if self.t is not None:
+            self.E = alvo + (self.E - alvo) * numpy.exp(-max(t - self.t, 0) / self.tau)
+        self.t = t if self.t is None else max(t, self.t)
+        return
+
+    def ler(self, t, gerador):
+        # leitura da saída no instante t, com deriva e ruído
+        return self.E * (1 + self.deriva*1e-6*t/60 + self.ruido*1e-6*gerador.standard_normal())
+
+#-------------------------------------------------------------------------------
+
+class Bancada(object):
+    """ Estado do sistema simulado: fontes, chave e conversores
+    Atributos:
+    fontes: dicionário com o estado das fontes 'ac' e 'dc'
+    posicao: posição da chave (reset, ac ou dc)
+    conversores: dicionário com os conversores 'std' e 'dut'
+    relogio: função que retorna o tempo atual, em segundos
+    gerador: gerador de números aleatórios do ruído
+    """
+
+    def __init__(self, conversores, relogio=relogio.tempo, semente=None):
+        self.fontes = {'ac':{'tensao':0.0, 'frequencia':0.0, 'operate':False},
+                       'dc':{'tensao':0.0, 'frequencia':0.0, 'operate':False}}
+        self.posicao = reset
+        self.conversores = conversores
+        self.relogio = relogio
+        self.gerador = numpy.random.default_rng(semente)
+        self.trava = threading.RLock()
+        self.t0 = relogio()
+
+    def tempo(self):
+        return self.relogio() - self.t0
+
+    def aplicada(self):
+        # tensão e frequência aplicadas aos conversores pela chave
+        if self.posicao == ac:
+            fonte = self.fontes['ac']
+        elif self.posicao == dc:
+            fonte = self.fontes['dc']
+        else:
+            return 0.0, 0.0
+        if not fonte['operate']:
+            return 0.0, 0.0
+        return fonte['tensao'], fonte['frequencia']
+
+    def evoluir(self):
+        # atualiza os conversores até o instante atual; chamada antes de
+        # qualquer mudança de estado e de cada leitura
+        t = self.tempo()
+        tensao, frequencia = self.aplicada()
+        for conversor in self.conversores.values():
+            conversor.evoluir(t, conversor.regime(tensao, frequencia))
+        return t
+
+    def alterar_fonte(self, nome, **valores):
+        with self.trava:
+            self.evoluir()
+            self.fontes[nome].update(valores)
+        return
+
+    def alterar_chave(self, posicao):
+        with self.trava:
+            self.evoluir()
+            self.posicao = posicao
+        return
+
+    def ler(self, nome, n=1):
+        # n leituras da saída do conversor nome ('std' ou 'dut')
+        with self.trava:
+            t = self.evoluir()
+            conversor = self.conversores[nome]
+            return numpy.array([conversor.ler(t, self.gerador) for i in range(n)])
+
+#-------------------------------------------------------------------------------
+
+class RecursoSimulado(object):
+    """ Classe base dos instrumentos simulados (interface do pyVISA)
+    Atributos:
+    bancada: objeto Bancada
+    resposta: resposta pendente para a próxima leitura
+    """
+
+    def __init__(self, bancada):
+        self.bancada = bancada
+        self.resposta = ''
+        self.timeout = 10000
+
+    def write(self, comando):
+        for parte in comando.strip().split(';'):
+            resposta = self.comando(parte.strip())
+            if resposta is not None:
+                self.resposta = resposta
+        return
+
+    def comando(self, comando):
+        # interpreta um comando; retorna a resposta, se houver
+        return None
+
+    def read(self):
+        resposta = self.resposta
+        self.resposta = ''
+        if isinstance(resposta, bytes):
+            return resposta.decode('ascii', 'replace')
+        return resposta + '\n'
+
+    def query(self, comando):
+        self.write(comando)
+        return self.read()
+
+    def read_raw(self):
+        resposta = self.resposta
+        self.resposta = ''
+        if isinstance(resposta, bytes):
+            return resposta
+        return (resposta + '\n').encode('ascii')
+
+    def read_bytes(self, n):
+        resposta = self.read_raw()
+        self.resposta = resposta[n:]
+        return resposta[:n]
+
+    def write_raw(self, comando):
+        if isinstance(comando, bytes):
+            comando = comando.decode('ascii')
+        return self.write(comando)
+
+    def control_ren(self, modo):
+        return
+
+    def clear(self):
+        self.resposta = ''
+        return
+
+    def close(self):
+        return
+
+#-------------------------------------------------------------------------------
+
+class FonteSimulada(RecursoSimulado):
+    """ Calibrador Fluke 5720A simulado
+    Atributos:
+    nome: 'ac' ou 'dc'
+    """
+
+    def __init__(self, bancada, nome):
+        RecursoSimulado.__init__(self, bancada)
+        self.nome = nome
+
+    def comando(self, comando):
+        m = estado.cmd_composto.match(comando)
+        if m:
+            self.bancada.alterar_fonte(self.nome, tensao=float(m.group(1)), frequencia=float(m.group(2)))
+            return None
+        m = estado.cmd_tensao.match(comando)
+        if m:
+            self.bancada.alterar_fonte(self.nome, tensao=float(m.group(1)))
+            return None
+        m = estado.cmd_frequencia.match(comando)
+        if m:
+            self.bancada.alterar_fonte(self.nome, frequencia=float(m.group(1)))
+            return None
+        comando = comando.upper()
+        if comando == '*IDN?':
+            return 'FLUKE,5720A,0,SIMULADO'
+        elif comando == 'OPER':
+            self.bancada.alterar_fonte(self.nome, operate=True)
+        elif comando in ('STBY', '*RST'):
+            self.bancada.alterar_fonte(self.nome, operate=False)
+        return None
+
+#-------------------------------------------------------------------------------
+
+class ChaveSimulada(RecursoSimulado):
+    """ Chave AC-DC METAS simulada
+    """
+
+    def write(self, comando):
+        if comando in (reset, ac, dc):
+            self.bancada.alterar_chave(comando)
+        return
+
+#-------------------------------------------------------------------------------
+
+class MedidorSimulado(RecursoSimulado):
+    """ Medidor simulado (182A, 2182A, 53132A ou 3458A)
+    Atributos:
+    modelo: modelo do medidor, sem o fabricante
+    conversor: conversor lido ('std' ou 'dut')
+    escala: fator entre a saída do conversor e a leitura
+    pontos: quantidade de leituras da rajada
+    memoria: leituras armazenadas na rajada
+    binario: formato binário de transferência (None = ASCII)
+    """
+
+    def __init__(self, bancada, modelo, conversor):
+        RecursoSimulado.__init__(self, bancada)
+        self.modelo = modelo.split()[-1]
+        self.conversor = conversor
+        if self.modelo == '53132A':
+            self.escala = escala_frequencia
+        elif self.modelo == '3458A':
+            self.escala = escala_resistencia
+        else:
+            self.escala = 1
+        self.pontos = 1
+        self.memoria = numpy.array([])
+        self.binario = None
+        self.estatistica = False
+
+    def leituras(self, n=1):
+        return self.escala * self.bancada.ler(self.conversor, n)
+
+    def ascii(self, valores):
+        return ','.join(['{:+.9E}'.format(v) for v in valores])
+
+    def read(self):
+        # o 182A fornece uma nova leitura a cada endereçamento para falar
+        if (self.modelo == '182A') and not self.resposta:
+            return 'NDCV{:+.7E}\n'.format(self.leituras()[0])
+        return RecursoSimulado.read(self)
+
+    def comando(self, comando):
+        comando_upper = comando.upper()
+        if comando_upper == '*IDN?':
+            return 'SIMULADO,'+self.modelo+',0,0'
+        if self.modelo == '2182A':
+            return self.comando_2182A(comando_upper)
+        elif self.modelo == '53132A':
+            return self.comando_53132A(comando_upper)
+        elif self.modelo == '3458A':
+            return self.comando_3458A(comando_upper)
+        return None
+
+    def comando_2182A(self, comando):
+        if comando == ':FETCH?':
+            return self.ascii(self.leituras())
+        elif comando.startswith(':TRAC:POIN'):
+            self.pontos = int(comando.split()[-1])
+        elif comando == ':TRAC:FEED:CONT NEXT':
+            self.memoria = self.leituras(self.pontos)
+        elif comando == ':TRAC:FEED:CONT?':
+            return 'NEV'
+        elif comando.startswith(':FORM:DATA'):
+            self.binario = '<f4' if 'REAL' in comando else None
+        elif comando == ':TRAC:DATA?':
+            if self.binario:
+                dados = self.memoria.astype(self.binario).tobytes()
+                comprimento = str(len(dados))
+                return b'#' + str(len(comprimento)).encode('ascii') + comprimento.encode('ascii') + dados + b'\n'
+            return self.ascii(self.memoria)
+        return None
+
+    def comando_53132A(self, comando):
+        if comando == ':FETCH:FREQ?':
+            return '{:+.15E}'.format(self.leituras()[0])
+        elif comando.startswith(':CALC3:AVER:COUN'):
+            self.pontos = int(comando.split()[-1])
+        elif comando == ':CALC3:AVER:STAT ON':
+            self.estatistica = True
+        elif comando == ':CALC3:AVER:STAT OFF':
+            self.estatistica = False
+        elif (comando == ':INIT') and self.estatistica:
+            self.memoria = self.leituras(self.pontos)
+        elif comando == ':CALC3:AVER:ALL?':
+            valores = self.memoria
+            desvio = numpy.std(valores, ddof=1) if len(valores) > 1 else 0.0
+            return ','.join(['{:+.15E}'.format(v) for v in
+                             [numpy.mean(valores), desvio, numpy.min(valores), numpy.max(valores)]])
+        return None
+
+    def comando_3458A(self, comando):
+        if comando == 'ID?':
+            return 'HP3458A'
+        elif comando.startswith('OHM'):
+            return '{:+.9E}'.format(self.leituras()[0])
+        elif comando.startswith('NRDGS'):
+            self.pontos = int(comando.split()[-1].split(',')[0])
+        elif comando == 'TRIG SGL':
+            self.memoria = self.leituras(self.pontos)
+        elif comando == 'MCOUNT?':
+            return str(len(self.memoria))
+        elif comando == 'MEM OFF':
+            self.memoria = numpy.array([])
+        elif comando.startswith('OFORMAT'):
+            self.binario = {'SREAL':'>f4', 'DREAL':'>f8'}.get(comando.split()[-1])
+        elif comando.startswith('RMEM'):
+            primeira, n = [int(a) for a in comando.split()[-1].split(',')[:2]]
+            valores = self.memoria[primeira-1:primeira-1+n]
+            if self.binario:
+                return valores.astype(self.binario).tobytes()
+            return self.ascii(valores)
+        return None
+
+#-------------------------------------------------------------------------------
+
+class ResourceManager(object):
+    """ ResourceManager simulado
+    Atributos:
+    bancada: objeto Bancada compartilhado pelos instrumentos
+    enderecos: dicionário endereço GPIB -> função que cria o instrumento
+    """
+
+    def __init__(self, bancada, enderecos):
+        self.bancada = bancada
+        self.enderecos = enderecos
+
+    def open_resource(self, nome):
+        m = re.match(r'^GPIB\d*::(\d+)::INSTR$', nome.strip(), re.IGNORECASE)
+        if (m is None) or (m.group(1) not in self.enderecos):
+            raise NameError('instrumento simulado não encontrado: '+nome)
+        return self.enderecos[m.group(1)](self.bancada)
+
+    def list_resources(self):
+        return tuple(['GPIB0::'+endereco+'::INSTR' for endereco in self.enderecos])
+
+    def close(self):
+        return
+
+#-------------------------------------------------------------------------------
+
+#-------------------------------------------------------------------------------
+# função ler_curva(texto)
+# converte a curva de diferença ac-dc 'kHz:ppm, kHz:ppm, ...' em dois arrays
+# (frequências em Hz e diferenças em ppm)
+def ler_curva(texto):
+    pontos = [a.split(':') for a in texto.split(',') if a.strip()]
+    frequencias = [1000*float(a[0]) for a in pontos]
+    diferencas = [float(a[1]) for a in pontos]
+    return frequencias, diferencas
+#-------------------------------------------------------------------------------
+# função simulador_config(config)
+# cria o ResourceManager simulado a partir das seções [Simulacao], [GPIB] e
+# [Instruments] do arquivo de configuração. Retorna None se a simulação não
+# estiver habilitada.
+def simulador_config(config):
+    if not config.has_section('Simulacao'):
+        return None
+    secao = config['Simulacao']
+    if not secao.getboolean('habilitar', False):
+        return None
+    v_nominal = float(config['Measurement Config']['voltage'])
+    conversores = {}
+    for nome in ('std', 'dut'):
+        frequencias, diferencas = ler_curva(secao.get('dif_'+nome, '1:0'))
+        conversores[nome] = Conversor(v_nominal,
+                                      n=secao.getfloat('n_'+nome, 1.8),
+                                      tau=secao.getfloat('tau_'+nome, 3),
+                                      frequencias=frequencias,
+                                      diferencas=diferencas,
+                                      saida=secao.getfloat('saida_'+nome, 0.007),
+                                      reversao=secao.getfloat('reversao_'+nome, 0),
+                                      deriva=secao.getfloat('deriva', 0),
+                                      ruido=secao.getfloat('ruido', 0))
+    # relógio virtual: as esperas apenas avançam o tempo da simulação
+    if secao.getboolean('relogio_virtual', True):
+        relogio.usar(relogio.RelogioVirtual())
+    semente = secao.get('semente', '').strip()
+    bancada = Bancada(conversores, semente=int(semente) if semente else None)
+    gpib = config['GPIB']
+    modelos = config['Instruments']
+    enderecos = {gpib['ac_source'].strip(): lambda b: FonteSimulada(b, 'ac'),
+                 gpib['dc_source'].strip(): lambda b: FonteSimulada(b, 'dc'),
+                 gpib['sw'].strip(): ChaveSimulada,
+                 gpib['std'].strip(): lambda b: MedidorSimulado(b, modelos['std'], 'std'),
+                 gpib['dut'].strip(): lambda b: MedidorSimulado(b, modelos['dut'], 'dut')}
+    return ResourceManager(bancada, enderecos)